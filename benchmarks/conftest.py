@@ -0,0 +1,280 @@
+# This module is part of Hypatia and is released under the
+# MIT license: http://opensource.org/licenses/MIT
+
+"""py.test plumbing for the hot path benchmarks.
+
+Each benchmark times a function with the bench fixture and fails if
+it got slower than its stored baseline (baseline.json) by more than
+the tolerance: the baseline file's, or the one it has for that
+benchmark in particular, e.g., for a noisy one. Baselines are scaled
+by how fast this machine runs a fixed calibration workload, compared
+to the machine which recorded them, so they roughly hold across
+machines.
+
+Example:
+  Use from project root like so:
+
+  $ py.test benchmarks
+  $ py.test benchmarks --benchmark-tolerance=0.25
+  $ py.test benchmarks --benchmark-update
+
+"""
+
+import os
+import json
+
+import pygame
+import pytest
+
+from hypatia import render
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'baseline.json')
+
+# each timing runs the function enough times to take at least this
+# long, and the best of REPEATS timings is kept
+MIN_SECONDS = 0.02
+REPEATS = 9
+
+# the calibration is the median of this many best times, so a burst
+# of speed (or slowness) doesn't skew every benchmark's limit
+CALIBRATIONS = 7
+
+DEFAULT_TOLERANCE = 0.5
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmark-tolerance', type=float, default=None,
+                     help='fail benchmarks slower than their baseline by '
+                          'more than this fraction (default: the '
+                          'baseline file\'s, for all benchmarks or '
+                          'per benchmark, or %s)' % DEFAULT_TOLERANCE)
+    parser.addoption('--benchmark-update', action='store_true',
+                     help='record the timings as the new baseline')
+
+
+def best_time(function):
+    """The best time, in seconds, of one call to function.
+
+    Like timeit: function is called enough times for a timing to
+    take at least MIN_SECONDS, REPEATS times.
+
+    """
+
+    function()
+    number = 1
+
+    while True:
+        start = render.timer()
+
+        for __ in range(number):
+            function()
+
+        seconds = render.timer() - start
+
+        if seconds >= MIN_SECONDS:
+            break
+
+        number *= 2
+
+    timings = [seconds]
+
+    for __ in range(REPEATS - 1):
+        start = render.timer()
+
+        for __ in range(number):
+            function()
+
+        timings.append(render.timer() - start)
+
+    return min(timings) / number
+
+
+def calibration_workload():
+    """A fixed mix of Python and pygame work, to compare machines."""
+
+    numbers = sorted((i * 7919) % 1009 for i in range(2000))
+    surface = pygame.Surface((64, 64))
+    target = pygame.Surface((64, 64))
+
+    for __ in range(10):
+        target.blit(surface, (0, 0))
+
+    return sum(numbers)
+
+
+def calibrate():
+    """Seconds calibration_workload() takes on this machine."""
+
+    timings = sorted(best_time(calibration_workload)
+                     for __ in range(CALIBRATIONS))
+
+    return timings[len(timings) // 2]
+
+
+class Benchmarks(object):
+    """The baseline, and this session's timings.
+
+    Attributes:
+        baseline (dict): benchmark name -> seconds.
+        calibration (float): seconds calibration_workload() takes
+            on this machine.
+        scale (float): how much slower this machine is than the one
+            which recorded the baseline.
+        tolerance (float): --
+        tolerances (dict): benchmark name -> its own tolerance,
+            instead of tolerance, unless one was given on the
+            command line.
+        update (bool): record timings as the new baseline.
+        results (dict): benchmark name -> seconds, this session.
+
+    """
+
+    def __init__(self, config):
+        try:
+
+            with open(BASELINE_PATH) as baseline_file:
+                stored = json.load(baseline_file)
+
+        except (IOError, ValueError):
+            stored = {}
+
+        self.baseline = stored.get('benchmarks', {})
+        self.calibration = calibrate()
+        stored_calibration = stored.get('calibration')
+
+        if stored_calibration:
+            self.scale = self.calibration / stored_calibration
+        else:
+            self.scale = 1.0
+
+        tolerance = config.getoption('benchmark_tolerance')
+        self.tolerances = stored.get('tolerances', {})
+
+        # a tolerance from the command line is for every benchmark
+        self.tolerance_given = tolerance is not None
+
+        if tolerance is None:
+            tolerance = stored.get('tolerance', DEFAULT_TOLERANCE)
+
+        self.tolerance = tolerance
+        self.update = config.getoption('benchmark_update')
+        self.results = {}
+
+    def tolerance_of(self, name):
+        """The fraction name may be slower than its baseline."""
+
+        if self.tolerance_given:
+
+            return self.tolerance
+
+        return self.tolerances.get(name, self.tolerance)
+
+    def limit(self, name):
+        """The slowest name may be before failing, or None if it
+        has no baseline.
+
+        """
+
+        if name not in self.baseline:
+
+            return None
+
+        return (self.baseline[name] * self.scale *
+                (1 + self.tolerance_of(name)))
+
+    def save(self):
+        """Write the results as the new baseline."""
+
+        baseline = dict(self.baseline)
+        baseline.update(self.results)
+        stored = {
+                  'calibration': self.calibration,
+                  'tolerance': self.tolerance,
+                  'tolerances': self.tolerances,
+                  'benchmarks': baseline,
+                 }
+
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump(stored, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+
+
+def pytest_configure(config):
+    config._hypatia_benchmarks = None
+
+    # everything runs headless, even on machines with a display
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+
+@pytest.fixture(scope='session')
+def benchmarks(request):
+    config = request.config
+
+    if config._hypatia_benchmarks is None:
+        os.chdir(os.path.join(os.path.dirname(BASELINE_PATH), '..', 'demo'))
+        pygame.init()
+        pygame.display.set_mode((1, 1))
+        config._hypatia_benchmarks = Benchmarks(config)
+
+    return config._hypatia_benchmarks
+
+
+@pytest.fixture
+def bench(request, benchmarks):
+    """Time a function (with no arguments) as the benchmark named
+    after the test, failing if it's too slow.
+
+    """
+
+    name = request.node.name
+
+    def bench(function):
+        seconds = best_time(function)
+        benchmarks.results[name] = seconds
+        limit = benchmarks.limit(name)
+
+        if limit is not None and not benchmarks.update and seconds > limit:
+            pytest.fail('%s took %.3f ms; the limit is %.3f ms '
+                        '(baseline %.3f ms, scaled by %.2f, plus %d%%)'
+                        % (name, seconds * 1000, limit * 1000,
+                           benchmarks.baseline[name] * 1000,
+                           benchmarks.scale,
+                           benchmarks.tolerance_of(name) * 100))
+
+        return seconds
+
+    return bench
+
+
+def pytest_sessionfinish(session):
+    benchmarks = session.config._hypatia_benchmarks
+
+    if benchmarks is not None and benchmarks.update:
+        benchmarks.save()
+
+
+def pytest_terminal_summary(terminalreporter):
+    benchmarks = terminalreporter.config._hypatia_benchmarks
+
+    if benchmarks is None or not benchmarks.results:
+
+        return None
+
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line('machine speed: %.2fx the baseline '
+                                "machine's time" % benchmarks.scale)
+
+    for name in sorted(benchmarks.results):
+        seconds = benchmarks.results[name]
+        limit = benchmarks.limit(name)
+
+        if limit is None:
+            line = '%-32s %10.3f ms   (no baseline)' % (name, seconds * 1000)
+        else:
+            baseline = benchmarks.baseline[name] * benchmarks.scale
+            line = ('%-32s %10.3f ms   %+6.1f%% vs baseline'
+                    % (name, seconds * 1000,
+                       (seconds / baseline - 1) * 100))
+
+        terminalreporter.write_line(line)
@@ -0,0 +1,242 @@
+# This module is part of Hypatia and is released under the
+# MIT license: http://opensource.org/licenses/MIT
+
+"""Benchmarks of Hypatia's hot paths; see conftest.py.
+
+Scenes are generated (see hypatia.scenegen), so they're big enough
+for slowdowns to show, and the same every run.
+
+Where a hot path was rewritten for speed, the original version is
+benchmarked too (the *_reference benchmarks), so the speedup can be
+reproduced.
+
+"""
+
+import io
+import copy
+import itertools
+import collections
+
+import pygame
+import pytest
+
+from hypatia import game
+from hypatia import tiles
+from hypatia import render
+from hypatia import sprites
+from hypatia import scenegen
+from hypatia import constants
+from hypatia import resources
+from hypatia import animatedsprite
+
+
+@pytest.fixture(scope='module')
+def synthetic(benchmarks):
+    return scenegen.generate(128, 128, layers=3, npc_count=200)
+
+
+@pytest.fixture(scope='module')
+def scene(synthetic):
+    return synthetic.to_scene()
+
+
+def test_tilesheet_from_resources(bench):
+    bench(lambda: tiles.Tilesheet.from_resources('debug'))
+
+
+def test_tilemap_init(bench, synthetic):
+    tile_ids = synthetic.tile_ids
+    bench(lambda: tiles.TileMap('debug', tile_ids))
+
+
+def test_tilemap_to_string(bench, scene):
+    bench(scene.tilemap.to_string)
+
+
+def test_tilemap_from_string(bench, scene):
+    tilemap_string = scene.tilemap.to_string()
+    bench(lambda: tiles.TileMap.from_string(tilemap_string))
+
+
+def test_resource_zip_loading(bench):
+
+    def load():
+        resource = resources.Resource('walkabouts', 'slime')
+
+        return [resource[file_name] for file_name in resource.raw_files]
+
+    bench(load)
+
+
+def test_frames_from_gif(bench):
+    resource = resources.Resource('walkabouts', 'slime')
+    gif = resource.raw_files['walk_east.gif']
+    anchors = resource['walk_east.ini']
+    bench(lambda: animatedsprite.AnimatedSprite.frames_from_gif(
+        io.BytesIO(gif), anchors))
+
+
+def reference_palette_cycle(surface):
+    """The original, pixel-by-pixel sprites.palette_cycle(); see
+    tests/test_animations.py.
+
+    """
+
+    width, height = surface.get_size()
+    coordinates = list(itertools.product(range(width), range(height)))
+    ordered_color_list = []
+
+    for coordinate in coordinates:
+        color = tuple(surface.get_at(coordinate))
+
+        if color not in ordered_color_list:
+            ordered_color_list.append(color)
+
+    old_color_list = collections.deque(ordered_color_list)
+    new_surface = surface.copy()
+    frames = []
+
+    for rotation_i in range(len(ordered_color_list)):
+        new_surface = new_surface.copy()
+        new_color_list = copy.copy(old_color_list)
+        new_color_list.rotate(1)
+        color_translations = dict(zip(old_color_list, new_color_list))
+
+        for coordinate in coordinates:
+            color = tuple(new_surface.get_at(coordinate))
+            new_surface.set_at(coordinate, color_translations[color])
+
+        frames.append(new_surface.copy())
+        old_color_list = copy.copy(new_color_list)
+
+    return frames
+
+
+@pytest.fixture(scope='module')
+def palette_surface(benchmarks):
+    tilesheet = tiles.Tilesheet.from_resources('debug')
+
+    return tilesheet.surface.subsurface((0, 0, 40, 40))
+
+
+def test_palette_cycle(bench, palette_surface):
+    bench(lambda: sprites.palette_cycle(palette_surface))
+
+
+def test_palette_cycle_reference(bench, palette_surface):
+    bench(lambda: reference_palette_cycle(palette_surface))
+
+
+def reference_frame_index_at(clip, position):
+    """The original frame lookup of AnimatedSprite.update(), which
+    walked the frames' end times from the first frame.
+
+    """
+
+    position %= clip.total_duration
+    end_times = clip.end_times
+    frame_index = 0
+
+    while position >= end_times[frame_index]:
+        frame_index += 1
+
+    return frame_index
+
+
+# (frames, milliseconds each); the demo's walk animations are two
+# frames of 200 ms
+@pytest.fixture(scope='module', params=[(2, 200), (16, 50)],
+                ids=['demo', 'long'])
+def clip(request, benchmarks):
+    surface = pygame.Surface((16, 16))
+    frames, duration = request.param
+
+    return animatedsprite.AnimationClip.from_surface_duration_list(
+        [(surface, duration)] * frames)
+
+
+# a second of 60 FPS ticks, into a few loops of the clip
+TIMES = [frame * 1000 // 60 + 7 for frame in range(60)]
+
+
+def test_frame_lookup(bench, clip):
+    """The lookup AnimatedSprite.update() does every tick, from the
+    position its player worked out, and the frame shown last tick.
+
+    """
+
+    player = animatedsprite.AnimationPlayer(clip)
+    positions = [player.position(time) for time in TIMES]
+
+    def lookups():
+        frame_indexes = []
+        frame_index = 0
+
+        for position in positions:
+            frame_index = clip.frame_index_at_position(position,
+                                                       frame_index)
+            frame_indexes.append(frame_index)
+
+        return frame_indexes
+
+    assert lookups() == [reference_frame_index_at(clip, time)
+                         for time in TIMES]
+    bench(lookups)
+
+
+def test_frame_lookup_reference(bench, clip):
+
+    def lookups():
+        frame_indexes = []
+
+        for time in TIMES:
+            frame_indexes.append(reference_frame_index_at(clip, time))
+
+        return frame_indexes
+
+    bench(lookups)
+
+
+def test_collide_check(bench, scene):
+    rects = [pygame.Rect(x * 37 % 1270, x * 53 % 1270, 10, 10)
+             for x in range(100)]
+
+    def collide_checks():
+
+        for rect in rects:
+            scene.collide_check(rect)
+
+    bench(collide_checks)
+
+
+def test_human_player_move(bench, scene):
+
+    class Game(object):
+        pass
+
+    fake_game = Game()
+    fake_game.scene = scene
+    fake_game.timestep = game.Timestep()
+    human_player = scene.human_player
+    directions = [constants.Direction.east, constants.Direction.south,
+                  constants.Direction.west, constants.Direction.north]
+
+    def moves():
+
+        for direction in directions:
+            human_player.move(fake_game, direction)
+
+    bench(moves)
+
+
+def test_scene_render(bench, scene):
+    viewport = render.Viewport((320, 240))
+    clock = pygame.time.Clock()
+    frames = [0]
+
+    def render_frame():
+        frames[0] += 1
+        animatedsprite.set_time(frames[0] * 16)
+        scene.render(viewport, clock)
+
+    bench(render_frame)
@@ -35,6 +35,8 @@ See Also:
 
 import enum
 
+import pygame
+
 from hypatia import constants
 from hypatia import physics
 
@@ -175,6 +177,45 @@ class Actor(object):
 
         raise TypeError("Cannot delete the 'direction' of an Actor")
 
+    def move_by(self, collision_world, displacement):
+        """Move this actor's walkabout as far as it can legally go
+        toward displacement, sliding along whatever is in the way.
+
+        Any actor (the human player, an NPC) moves through this, so
+        they all collide with the map and each other the same way.
+
+        Args:
+            collision_world (physics.CollisionWorld): the world which
+                this actor is moving in, e.g., Scene.collision_world.
+                It is updated with this actor's new position.
+            displacement (tuple): (x, y) pixels to move by. Floats
+                are fine; the walkabout keeps a float position.
+
+        Returns:
+            tuple: (x, y) pixels actually moved.
+
+        See Also:
+            :meth:`physics.CollisionWorld.sweep()`
+
+        """
+
+        walkabout = self.walkabout
+        moved = collision_world.sweep(walkabout.topleft_float,
+                                      walkabout.rect.size,
+                                      displacement,
+                                      ignore=self)
+
+        if moved != (0, 0):
+            x, y = walkabout.topleft_float
+            new_topleft = (x + moved[0], y + moved[1])
+            walkabout.topleft_float = new_topleft
+            walkabout.rect = pygame.Rect((int(new_topleft[0]),
+                                          int(new_topleft[1])),
+                                         walkabout.rect.size)
+            collision_world.update_actor(self)
+
+        return moved
+
     def get_response(self, at_direction, dialogbox):
         """Respond to an NPC in the direction of at_direction. Change
         this actor's direction. Display this actor's say_text attribute
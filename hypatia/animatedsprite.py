@@ -8,9 +8,58 @@ and because it avoids circular import issues.
 
 """
 
+import bisect
+
 import pygame
 from PIL import Image
 
+from hypatia import constants
+
+
+# The time, in milliseconds, at which every animation is evaluated
+# during the current tick; see set_time().
+_animation_time = None
+
+# Looking an Enum member up through its class is slow, and
+# AnimationClip.playback_position() runs for every sprite, every
+# tick, so the members it compares against are looked up once.
+_LOOP = constants.PlaybackMode.loop
+_PING_PONG = constants.PlaybackMode.ping_pong
+
+
+def set_time(milliseconds):
+    """Set the time at which every animation is evaluated until
+    this is called again. Called once per tick, so that every
+    animation sampled during a tick shows the same moment.
+
+    Args:
+        milliseconds (int|None): None to fall back to
+            pygame.time.get_ticks().
+
+    See Also:
+        * render.Screen.update()
+
+    """
+
+    global _animation_time
+    _animation_time = milliseconds
+
+
+def get_time():
+    """Return the time, in milliseconds, at which animations
+    are evaluated; see set_time().
+
+    Returns:
+        int: --
+
+    """
+
+    if _animation_time is None:
+
+        return pygame.time.get_ticks()
+
+    return _animation_time
+
 
 class Anchor(object):
     """A coordinate on a surface which is used for pinning to another
@@ -424,6 +473,350 @@ class Frame(object):
         return s % (self.duration, self.start_time, self.end_time)
 
 
+class AnimationClip(object):
+    """The frames of an animation, which never change once
+    created. Any number of AnimationPlayer (or AnimatedSprite)
+    instances may share a clip, each with its own playback state.
+
+    Attributes:
+        frames (tuple[Frame]): --
+        start_times (tuple[int]): The start_time of each frame, in
+            the same order as the frames.
+        end_times (tuple[int]): The end_time of each frame, in
+            the same order as the frames.
+        anchors (tuple[FrameAnchors|None]): The anchors of each
+            frame, in the same order as the frames.
+        total_duration (int): The total duration of this clip
+            in milliseconds.
+
+    Example:
+        >>> surface = pygame.Surface((16, 16))
+        >>> clip = AnimationClip.from_surface_duration_list(
+        ...     [(surface, 100), (surface, 50)]
+        ... )
+        >>> clip.end_times
+        (100, 150)
+        >>> clip.frame_index_at(120)
+        1
+        >>> clip.frame_index_at(160)
+        0
+
+    """
+
+    __slots__ = ('frames', 'start_times', 'end_times', 'anchors',
+                 'total_duration')
+
+    def __init__(self, frames):
+        """Create a clip from a list of Frame instances.
+
+        Args:
+            frames (list[Frame]): A properly assembled list of frames;
+                see AnimatedSprite.__init__().
+
+        """
+
+        frames = tuple(frames)
+        self.frames = frames
+        self.start_times = tuple(frame.start_time for frame in frames)
+        self.end_times = tuple(frame.end_time for frame in frames)
+        self.anchors = tuple(frame.anchors for frame in frames)
+        self.total_duration = sum([frame.duration for frame in frames])
+
+    def __getitem__(self, frame_index):
+
+        return self.frames[frame_index]
+
+    def __len__(self):
+
+        return len(self.frames)
+
+    def __repr__(self):
+
+        return "<AnimationClip frames(%d) total_duration(%s)>" % (
+            len(self.frames), self.total_duration)
+
+    def frame_index_at(self, position, mode=constants.PlaybackMode.loop):
+        """Return the index of the frame which is displayed at
+        a position in the animation.
+
+        The frame is found by bisecting end_times, so the lookup
+        doesn't walk the frames.
+
+        Args:
+            position (int|float): Animation position in milliseconds,
+                since the animation started playing.
+            mode (constants.PlaybackMode): What happens after the
+                last frame; see playback_position().
+
+        Returns:
+            int: --
+
+        Example:
+            >>> surface = pygame.Surface((16, 16))
+            >>> clip = AnimationClip.from_surface_duration_list(
+            ...     [(surface, 100), (surface, 100), (surface, 100)]
+            ... )
+            >>> clip.frame_index_at(350)
+            0
+            >>> clip.frame_index_at(350, constants.PlaybackMode.ping_pong)
+            2
+            >>> clip.frame_index_at(350, constants.PlaybackMode.one_shot)
+            2
+
+        """
+
+        position = self.playback_position(position, mode)
+
+        return self.frame_index_at_position(position)
+
+    def frame_index_at_position(self, position, frame_index=0):
+        """Return the index of the frame which is displayed at
+        a position within this clip, e.g., one playback_position()
+        returned.
+
+        Unlike frame_index_at(), the position isn't mapped into
+        the clip first, so this is the cheaper lookup when the
+        position is already known.
+
+        Args:
+            position (int|float): from 0 up to, but not including,
+                total_duration.
+            frame_index (int): The frame displayed before, e.g.,
+                during the last tick. It's returned without bisecting
+                if it's still displayed, which it usually is.
+
+        Returns:
+            int: --
+
+        Example:
+            >>> surface = pygame.Surface((16, 16))
+            >>> clip = AnimationClip.from_surface_duration_list(
+            ...     [(surface, 100), (surface, 50)]
+            ... )
+            >>> clip.frame_index_at_position(clip.playback_position(260))
+            1
+            >>> clip.frame_index_at_position(120, 1)
+            1
+            >>> clip.frame_index_at_position(20, 1)
+            0
+
+        """
+
+        end_times = self.end_times
+
+        if self.start_times[frame_index] <= position < end_times[frame_index]:
+
+            return frame_index
+
+        return bisect.bisect_right(end_times, position)
+
+    def playback_position(self, position, mode=constants.PlaybackMode.loop):
+        """Map the time since the animation started playing to
+        a position within this clip.
+
+        Args:
+            position (int|float): Milliseconds since the animation
+                started playing.
+            mode (constants.PlaybackMode): loop wraps around to
+                the first frame, ping_pong plays backwards after the
+                last frame (then forwards, and so on), and one_shot
+                stays on the last frame.
+
+        Returns:
+            int|float: from 0 up to, but not including,
+                total_duration.
+
+        """
+
+        total_duration = self.total_duration
+
+        if position < 0 or not total_duration:
+
+            return 0
+
+        elif mode is _LOOP:
+
+            return position % total_duration
+
+        elif mode is _PING_PONG:
+            position %= 2 * total_duration
+
+            if position >= total_duration:
+
+                return 2 * total_duration - 1 - position
+
+            return position
+
+        return min(position, total_duration - 1)
+
+    def largest_frame_size(self):
+        """Return the largest frame's (by area)
+        dimensions as tuple(int x, int y).
+
+        Returns:
+            tuple (x, y): pixel dimensions of the largest
+                frame surface in this clip.
+
+        """
+
+        largest_frame_size = (0, 0)
+        largest_area = 0
+
+        for frame in self.frames:
+            frame_x, frame_y = frame_size = frame.surface.get_size()
+
+            if frame_x * frame_y > largest_area:
+                largest_frame_size = frame_size
+                largest_area = frame_x * frame_y
+
+        return largest_frame_size
+
+    @staticmethod
+    def from_surface_duration_list(surface_duration_list):
+        """Support PygAnimation-style frames; see
+        AnimatedSprite.from_surface_duration_list().
+
+        Args:
+            surface_duration_list (list[tuple]): (surface,
+                duration in milliseconds) tuples.
+
+        Returns:
+            AnimationClip: --
+
+        """
+
+        running_time = 0
+        frames = []
+
+        for surface, duration in surface_duration_list:
+            frame = Frame(surface, running_time, duration)
+            frames.append(frame)
+            running_time += duration
+
+        return AnimationClip(frames)
+
+
+class AnimationPlayer(object):
+    """Playback state of an AnimationClip. Nothing but the clip,
+    when playback started, how fast, and in which mode, so the
+    frame being displayed is evaluated from the time, rather than
+    advanced every update.
+
+    Attributes:
+        clip (AnimationClip): --
+        start_time (int): The time, in milliseconds, when this
+            player started playing the clip. Players with the
+            same start_time (and speed) are in sync.
+        speed (float): Playback speed multiplier, e.g., 2.0 plays
+            the clip twice as fast.
+        mode (constants.PlaybackMode): --
+
+    Example:
+        >>> surface = pygame.Surface((16, 16))
+        >>> clip = AnimationClip.from_surface_duration_list(
+        ...     [(surface, 100), (surface, 50)]
+        ... )
+        >>> player = AnimationPlayer(clip, start_time=1000)
+        >>> player.frame_index(1000)
+        0
+        >>> player.frame_index(1100)
+        1
+        >>> player.frame(1150) is clip[0]
+        True
+        >>> player.speed = 2.0
+        >>> player.frame_index(1050)
+        1
+
+    """
+
+    __slots__ = ('clip', 'start_time', 'speed', 'mode')
+
+    def __init__(self, clip, start_time=0, speed=1.0,
+                 mode=constants.PlaybackMode.loop):
+        """
+
+        Args:
+            clip (AnimationClip): --
+            start_time (int): See the start_time attribute.
+            speed (float): See the speed attribute.
+            mode (constants.PlaybackMode): --
+
+        """
+
+        self.clip = clip
+        self.start_time = start_time
+        self.speed = speed
+        self.mode = mode
+
+    def elapsed(self, time):
+        """Return the milliseconds of the clip which have been
+        played at time, accounting for speed.
+
+        """
+
+        elapsed = time - self.start_time
+
+        if self.speed != 1:
+            elapsed *= self.speed
+
+        return elapsed
+
+    def position(self, time):
+        """Return the position in the clip, in milliseconds,
+        at time.
+
+        Args:
+            time (int): In milliseconds; see get_time().
+
+        Returns:
+            int|float: --
+
+        """
+
+        return self.clip.playback_position(self.elapsed(time), self.mode)
+
+    def frame_index(self, time):
+        """Return the index of the frame displayed at time.
+
+        Args:
+            time (int): In milliseconds; see get_time().
+
+        Returns:
+            int: --
+
+        """
+
+        return self.clip.frame_index_at(self.elapsed(time), self.mode)
+
+    def frame(self, time):
+        """Return the frame displayed at time.
+
+        Args:
+            time (int): In milliseconds; see get_time().
+
+        Returns:
+            Frame: --
+
+        """
+
+        return self.clip.frames[self.frame_index(time)]
+
+    def finished(self, time):
+        """Return True if this is a one-shot player which has
+        played the whole clip at time.
+
+        Args:
+            time (int): In milliseconds; see get_time().
+
+        Returns:
+            bool: --
+
+        """
+
+        return (self.mode is constants.PlaybackMode.one_shot and
+                self.elapsed(time) >= self.clip.total_duration)
+
+
 class AnimatedSprite(pygame.sprite.Sprite):
     """Animated sprite with mask, loaded from GIF.
 
@@ -441,7 +834,13 @@ class AnimatedSprite(pygame.sprite.Sprite):
         should currently be avoided. This is a problem
         for animated tiles...
 
+    The frames belong to an AnimationClip, which may be shared
+    with other AnimatedSprites; the playback state is this
+    AnimatedSprite's own.
+
     Attributes:
+        clip (AnimationClip): --
+        player (AnimationPlayer): --
         total_duration (int): The total duration of of this
             animation in milliseconds.
         image (pygame.Surface): Current surface belonging to
@@ -466,25 +865,34 @@ class AnimatedSprite(pygame.sprite.Sprite):
     See Also:
         * :class:`pygame.sprite.Sprite`
         * :class:`Frame`
+        * :class:`AnimationClip`
 
     """
 
-    def __init__(self, frames):
+    def __init__(self, frames, speed=1.0,
+                 mode=constants.PlaybackMode.loop):
         """Create this AnimatedSprite using
         a list of Frame instances.
 
         Args:
-            frames (list[Frame]): A properly assembled list of frames,
-                which assumes that each Frame's start_time is greater
-                than the previous element and is the previous element's
-                start time + previous element/Frame's duration. Here
-                is an example of aformentioned:
+            frames (list[Frame]|AnimationClip): A properly assembled
+                list of frames, which assumes that each Frame's
+                start_time is greater than the previous element
+                and is the previous element's start time + previous
+                element/Frame's duration. Here is an example of
+                aformentioned:
 
                 >>> frame_one_surface = pygame.Surface((16, 16))
                 >>> frame_one = Frame(frame_one_surface, 0, 100)
                 >>> frame_two_surface = pygame.Surface((16, 16))
                 >>> frame_two = Frame(frame_two_surface, 100, 50)
 
+                An AnimationClip is used as-is, i.e., shared with
+                whatever else uses it, rather than copied.
+            speed (float): Playback speed multiplier.
+            mode (constants.PlaybackMode): What happens after the
+                last frame. Loops by default.
+
         Note:
             In the future I may add a method for verifying the
             validity of Frame start_times and durations.
@@ -492,22 +900,41 @@ class AnimatedSprite(pygame.sprite.Sprite):
         """
 
         super(AnimatedSprite, self).__init__()
-        self.frames = frames
-        self.total_duration = self.get_total_duration(self.frames)
+
+        if not isinstance(frames, AnimationClip):
+            frames = AnimationClip(frames)
+
+        self.clip = frames
+        self.player = AnimationPlayer(self.clip, speed=speed, mode=mode)
         self.active_frame_index = 0
-        self.active_frame = self.frames[self.active_frame_index]
+        self.active_frame = self.clip.frames[self.active_frame_index]
 
         # animation position in milliseconds
         self.animation_position = 0
 
         # this gets updated depending on the frame/time
         # needs to be a surface.
-        self.image = self.frames[0].surface
+        self.image = self.active_frame.surface
 
         # represents the animated sprite's position
         # on screen.
         self.rect = self.image.get_rect()
 
+    @property
+    def frames(self):
+        """tuple[Frame]: the frames of this AnimatedSprite's clip."""
+
+        return self.clip.frames
+
+    @property
+    def total_duration(self):
+        """int: The total duration of this animation in
+        milliseconds.
+
+        """
+
+        return self.clip.total_duration
+
     def __getitem__(self, frame_index):
         """Return the frame corresponding to
         the supplied frame_index.
@@ -535,20 +962,7 @@ class AnimatedSprite(pygame.sprite.Sprite):
 
         """
 
-        largest_frame_size = (0, 0)
-
-        for frame in self.frames:
-            largest_x, largest_y = largest_frame_size
-            largest_area = largest_x * largest_y
-
-            frame_size = frame.surface.get_size()
-            frame_x, frame_y = frame_size
-            frame_area = frame_x * frame_y
-
-            if frame_area > largest_area:
-                largest_frame_size = (frame_size)
-
-        return largest_frame_size
+        return self.clip.largest_frame_size()
 
     @staticmethod
     def from_surface_duration_list(surface_duration_list):
@@ -572,15 +986,9 @@ class AnimatedSprite(pygame.sprite.Sprite):
 
         """
 
-        running_time = 0
-        frames = []
+        clip = AnimationClip.from_surface_duration_list(surface_duration_list)
 
-        for surface, duration in surface_duration_list:
-            frame = Frame(surface, running_time, duration)
-            frames.append(frame)
-            running_time += duration
-
-        return AnimatedSprite(frames)
+        return AnimatedSprite(clip)
 
     @classmethod
     def from_file(cls, path_or_readable, anchors_config=None):
@@ -607,13 +1015,15 @@ class AnimatedSprite(pygame.sprite.Sprite):
     def update(self, clock, absolute_position, viewport):
         """Manipulate the state of this AnimatedSprite, namely
         the on-screen/viewport position (not absolute) and
-        using the clock to do animation manipulations.
+        using the time to select the animation frame.
 
-        Using the game's clock we decipher the animation position,
-        which in turn allows us to locate the correct frame.
+        The frame is evaluated from the global animation time (see
+        get_time()), so updating more than once per tick does not
+        advance the animation more than once.
 
-        Sets the image attribute to the current frame's image. Updates
-        the rect attribute to the new relative position and frame size.
+        Sets the image attribute to the current frame's image. Resizes
+        the rect attribute to the frame size. Nothing is allocated
+        unless the frame changed.
 
         Warning:
             Since we're changing the rect size on-the-fly, this can
@@ -622,7 +1032,8 @@ class AnimatedSprite(pygame.sprite.Sprite):
 
         Args:
             clock (pygame.time.Clock): THE game clock, typically
-                found as the attribute Game.screen.clock.
+                found as the attribute Game.screen.clock. Unused;
+                kept for compatibility.
             absolute_position (tuple[int]): (x, y) pixel position
                 of this AnimatedSprite on the map--absolute
                 position. Meaning this could be outside of the
@@ -630,32 +1041,28 @@ class AnimatedSprite(pygame.sprite.Sprite):
 
         """
 
-        self.animation_position += clock.get_time()
-
-        if self.animation_position >= self.total_duration:
-            self.animation_position = (self.animation_position %
-                                       self.total_duration)
-            self.active_frame_index = 0
-
-        while (self.animation_position >
-               self.frames[self.active_frame_index].end_time):
-
-            self.active_frame_index += 1
+        # the position is worked out once, and the frames are only
+        # bisected once the active frame is over
+        player = self.player
+        clip = player.clip
+        position = player.position(get_time())
+        self.animation_position = position
+        frame_index = clip.frame_index_at_position(position,
+                                                   self.active_frame_index)
 
-        # NOTE: the fact that I'm using -1 here seems sloppy/hacky
-        self.image = self.frames[self.active_frame_index - 1].surface
+        if frame_index == self.active_frame_index:
 
-        image_size = self.image.get_size()
+            return None
 
-        # NOTE: temporarily disabling this until i fully implement
-        # absolute_position... in our current setup we never
-        # touch the rect of frame surfaces, only the walkabout
-        # relative_position = absolute_position.relative(viewport)
-        relative_position = (0, 0)
+        self.active_frame_index = frame_index
+        self.active_frame = clip.frames[frame_index]
+        self.image = self.active_frame.surface
 
-        self.rect = pygame.rect.Rect(relative_position, image_size)
-
-        self.active_frame = self.frames[self.active_frame_index]
+        # NOTE: the rect stays at (0, 0) until absolute_position is
+        # fully implemented... in our current setup we never touch
+        # the rect of frame surfaces, only the walkabout. It is
+        # resized in place, rather than replaced every tick.
+        self.rect.size = self.image.get_size()
 
     @staticmethod
     def get_total_duration(frames):
@@ -755,18 +1162,29 @@ class AnimatedSprite(pygame.sprite.Sprite):
                                        'RGBA'
                                       )
 
-    def convert_alpha(self):
+    def convert_alpha(self, conversion=None):
         """A runtime method for optimizing all of the
         frame surfaces of this animation.
 
         Pygame recommends converting all image data with
         pygame.surface.convert() to speed up game play.
 
-        Convert each frame's surface to an optimized
-        format for pygame gameplay.
+        Replace each frame's surface with one in an optimized
+        format for pygame gameplay. Since frames belong to the
+        clip, this affects every AnimatedSprite sharing it.
+
+        Args:
+            conversion (render.ConversionPass|None): The pass to
+                convert surfaces with. If None, surfaces are simply
+                converted with pygame.Surface.convert_alpha().
 
         """
 
-        for frame in self.frames:
-            frame.surface.convert()
-            frame.surface.convert_alpha()
+        for frame in self.clip.frames:
+
+            if conversion is None:
+                frame.surface = frame.surface.convert_alpha()
+            else:
+                frame.surface = conversion.convert(frame.surface)
+
+        self.image = self.active_frame.surface
@@ -0,0 +1,324 @@
+# This module is part of Hypatia and is released under the
+# MIT License: http://opensource.org/licenses/MIT
+
+"""Benchmark whole frames without a display, e.g., in CI.
+
+A scene is loaded and played for a number of frames with scripted
+input on a headless render.Screen, by the same game loop the game
+runs (see game.Game.run_frame()), timing each phase of every frame
+with the spans of the profiler (see hypatia.profiling). The report
+is JSON, with the 50th, 95th and 99th percentile time of each phase
+in milliseconds.
+
+Run from a directory with a resources directory, e.g., demo:
+
+    $ cd demo
+    $ python -m hypatia.bench --frames 600 --output bench.json
+
+"""
+
+import os
+
+# keep stdout clean for the JSON report; pygame greets on stdout
+# when it's imported
+if 'PYGAME_HIDE_SUPPORT_PROMPT' not in os.environ:
+    os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+import sys
+import json
+import argparse
+
+import pygame
+
+from hypatia import game
+from hypatia import render
+from hypatia import profiling
+from hypatia import constants
+from hypatia import controllers
+from hypatia import animatedsprite
+
+
+# the order of phases in a frame, each of which is a profiler span
+PHASES = ('input', 'movement', 'animation', 'layers', 'actors',
+          'scale', 'flip')
+
+# (direction, number of frames) the player walks, repeated
+SCRIPT = ((constants.Direction.east, 60),
+          (constants.Direction.south, 60),
+          (constants.Direction.west, 60),
+          (constants.Direction.north, 60))
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(milliseconds):
+    """Percentiles of timings.
+
+    Args:
+        milliseconds (list[float]): --
+
+    Returns:
+        dict: {'p50': milliseconds, ...} for each of PERCENTILES,
+            plus 'mean' and 'max'.
+
+    Example:
+        >>> summarize([4.0, 1.0, 3.0, 2.0])['p50']
+        2.0
+
+    """
+
+    summary = {}
+
+    for percent in PERCENTILES:
+        summary['p%d' % percent] = profiling.percentile(milliseconds,
+                                                        percent)
+
+    summary['mean'] = sum(milliseconds) / len(milliseconds)
+    summary['max'] = max(milliseconds)
+
+    return summary
+
+
+def scripted_direction(frame):
+    """The direction the player is walking in at frame.
+
+    Example:
+        >>> scripted_direction(0) is constants.Direction.east
+        True
+        >>> scripted_direction(60) is constants.Direction.south
+        True
+        >>> scripted_direction(240) is constants.Direction.east
+        True
+
+    """
+
+    frame %= sum(frames for __, frames in SCRIPT)
+
+    for direction, frames in SCRIPT:
+
+        if frame < frames:
+
+            return direction
+
+        frame -= frames
+
+
+class ScriptedController(controllers.GameController):
+    """Input for the game loop, in place of the keyboard's
+    controllers.WorldController: the player walks in the direction
+    SCRIPT says, one simulation step at a time.
+
+    Animations are shown the simulated time, rather than the real
+    time, so runs are repeatable.
+
+    Attributes:
+        steps (int): how many simulation steps ran.
+
+    """
+
+    def __init__(self, game):
+        super(ScriptedController, self).__init__(game)
+        self.steps = 0
+
+    def handle_input(self):
+        """Walk the player a step.
+
+        Returns:
+            bool: always True; the script never quits.
+
+        """
+
+        pygame.event.pump()
+        human_player = self.game.scene.human_player
+        direction = scripted_direction(self.steps)
+        step_milliseconds = self.game.timestep.step_milliseconds
+        animatedsprite.set_time(int(self.steps * step_milliseconds))
+
+        with profiling.profiler.span('movement'):
+            human_player.move(self.game, direction)
+
+        self.steps += 1
+
+        return True
+
+
+class FrameBenchmark(object):
+    """Play a scene frame by frame, timing each phase.
+
+    Frames are run by the game's own loop, game.Game.run_frame(),
+    and timed by the profiler spans the engine reports to. The phases
+    are input (not counting movement), player movement (and
+    collision), animation updates (and working out what actors
+    draw), tile layer blits, actor blits, scaling the viewport onto
+    the screen and flipping the display. Every frame is one
+    simulation step, and animations see time pass by exactly one
+    step per frame (see ScriptedController).
+
+    Attributes:
+        game (game.Game): the game being played, which isn't run.
+        controller (ScriptedController): --
+        timings (dict): phase name to a list of milliseconds, one
+            per frame; 'frame' is the whole frame.
+        frame (int): the number of frames run.
+
+    """
+
+    def __init__(self, scene, viewport_size=None, screen=None):
+        """
+
+        Args:
+            scene (game.Scene): --
+            viewport_size (tuple|None): Defaults to (60, 60), like
+                the demo.
+            screen (render.Screen|None): Defaults to a headless one.
+
+        """
+
+        screen = screen or render.Screen(headless=True, fps=0)
+        self.game = game.Game(screen=screen, scene=scene,
+                              viewport_size=viewport_size or (60, 60),
+                              run=False)
+        self.controller = ScriptedController(self.game)
+        self.timings = dict((phase, []) for phase in PHASES + ('frame',))
+        self.frame = 0
+
+    def run_frame(self):
+        """Run and time one frame, one simulation step long.
+
+        The profiler has to be enabled; see run().
+
+        """
+
+        self.game.run_frame(self.controller,
+                            self.game.timestep.step_milliseconds)
+        last_frame = profiling.profiler.last_frame
+        spans = last_frame['spans']
+
+        for phase in PHASES:
+            self.timings[phase].append(spans.get(phase, 0.0))
+
+        # the input span includes moving the player
+        self.timings['input'][-1] -= spans.get('movement', 0.0)
+        self.timings['frame'].append(last_frame['frame'])
+        self.frame += 1
+
+    def run(self, frames):
+        """Run and time some frames, with the profiler enabled.
+
+        Args:
+            frames (int): --
+
+        Returns:
+            dict: report(), afterwards.
+
+        """
+
+        profiler = profiling.profiler
+        was_enabled = profiler.enabled
+        profiler.enabled = True
+
+        try:
+
+            for __ in range(frames):
+                self.run_frame()
+
+        finally:
+            profiler.enabled = was_enabled
+
+        return self.report()
+
+    def report(self):
+        """Summarize the timings so far.
+
+        Returns:
+            dict: JSON serializable; the frame count, viewport and
+                screen sizes, summarize() of each phase and of whole
+                frames, and the formats the tilemap's chunks were
+                stored in, per layer (see tiles.ChunkFormats).
+
+        """
+
+        return {
+                'frames': self.frame,
+                'viewport': list(self.game.viewport.rect.size),
+                'screen': list(self.game.screen.screen_size),
+                'phases': dict((phase, summarize(self.timings[phase]))
+                               for phase in PHASES),
+                'frame': summarize(self.timings['frame']),
+                'chunks': self.game.scene.tilemap.chunk_formats.layers,
+               }
+
+
+def load_scene(scene_name):
+    """Load a scene by name, from its TMX file if there is one,
+    otherwise from its native scene resource, e.g., one written by
+    hypatia.scenegen.
+
+    Returns:
+        game.Scene: --
+
+    """
+
+    tmx_path = os.path.join('resources', 'scenes', scene_name + '.tmx')
+
+    if os.path.exists(tmx_path):
+
+        return game.Scene.from_tmx_resource(scene_name)
+
+    return game.Scene.from_resource(scene_name)
+
+
+def parse_size(text):
+    """Parse a size like 1280x720.
+
+    Example:
+        >>> parse_size('1280x720')
+        (1280, 720)
+
+    """
+
+    width, height = text.lower().split('x')
+
+    return int(width), int(height)
+
+
+def main(argv=None):
+    """Command line entry point; see the module docstring."""
+
+    parser = argparse.ArgumentParser(prog='python -m hypatia.bench',
+                                     description=__doc__.split('\n')[0])
+    parser.add_argument('--scene', default='debug',
+                        help='scene resource name, TMX or native, e.g., '
+                             'from hypatia.scenegen (default: debug)')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--viewport', type=parse_size, default=(60, 60),
+                        help='viewport size (default: 60x60)')
+    parser.add_argument('--screen', type=parse_size,
+                        default=render.Screen.HEADLESS_SIZE,
+                        help='headless screen size (default: 1280x720)')
+    parser.add_argument('--directory', default='.',
+                        help='where the resources directory is')
+    parser.add_argument('--output', help='write JSON here, not stdout')
+    args = parser.parse_args(argv)
+
+    os.chdir(args.directory)
+    screen = render.Screen(headless=True, fps=0, screen_size=args.screen)
+    scene = load_scene(args.scene)
+    benchmark = FrameBenchmark(scene, args.viewport, screen)
+    report = benchmark.run(args.frames)
+    report['scene'] = args.scene
+    text = json.dumps(report, indent=2, sort_keys=True)
+
+    if args.output:
+
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+
+    else:
+        sys.stdout.write(text + '\n')
+
+    return report
+
+
+if __name__ == '__main__':
+    main()
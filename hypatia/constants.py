@@ -395,3 +395,23 @@ class Action(enum.Enum):
         """
 
         return [Action.stand, Action.walk]
+
+
+@enum.unique
+class PlaybackMode(enum.Enum):
+    """How an animation plays once it reaches its last frame.
+
+    Attributes:
+        loop (int): Start over from the first frame.
+        ping_pong (int): Play backwards to the first frame,
+            then forwards again, and so on.
+        one_shot (int): Stay on the last frame.
+
+    See Also:
+        :class:`animatedsprite.AnimationPlayer`
+
+    """
+
+    loop = 1
+    ping_pong = 2
+    one_shot = 3
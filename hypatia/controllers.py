@@ -15,7 +15,9 @@ back to refine it sooner-than-later.
 import pygame
 from pygame.locals import *
 
+from hypatia import hud
 from hypatia import constants
+from hypatia import profiling
 
 
 class GameController(object):
@@ -74,6 +76,10 @@ class WorldController(GameController):
             # in the future.
             #
             # need to trap player in a next loop, release when no next
+            if (event.type == KEYDOWN and
+                    event.key == hud.PerformanceHUD.TOGGLE_KEY):
+                self.game.hud.toggle()
+
             if event.type == KEYDOWN and event.key == K_SPACE:
 
                 # do until
@@ -110,9 +116,12 @@ class WorldController(GameController):
                     K_LEFT: constants.Direction.west,
                    }
 
-        for key, direction in movement.items():
+        with profiling.profiler.span('movement'):
+
+            for key, direction in movement.items():
 
-            if pressed_keys[key]:
-                self.game.scene.human_player.move(self.game, direction)
+                if pressed_keys[key]:
+                    self.game.scene.human_player.move(self.game,
+                                                      direction)
 
         return True
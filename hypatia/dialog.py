@@ -93,6 +93,25 @@ class DialogBox(object):
             self.active = False
             self.reset_viewport_rect()
 
+    def render_state(self):
+        """Return what this dialog box currently looks like, and
+        the area it covers, e.g., for finding out if it has to be
+        redrawn.
+
+        Returns:
+            tuple: (state, pygame.Rect|None); the rect is None if
+                the dialog box isn't shown.
+
+        """
+
+        if not self.active:
+
+            return (None, None)
+
+        state = (id(self.full_surface), tuple(self.viewport_rect))
+
+        return (state, pygame.Rect((0, 0), self.viewport_rect.size))
+
     # incomplete
     def blit(self, to_surface):
         """Blit current viewport of text to_surface.
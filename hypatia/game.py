@@ -31,6 +31,7 @@ except ImportError:
 
 import pygame
 
+from hypatia import hud
 from hypatia import tiles
 from hypatia import dialog
 from hypatia import render
@@ -39,6 +40,7 @@ from hypatia import sprites
 from hypatia import physics
 from hypatia import resources
 from hypatia import constants
+from hypatia import profiling
 from hypatia import controllers
 
 
@@ -144,24 +146,142 @@ class Hypatia(object):
             setattr(self, key, value)
 
 
+class Timestep(object):
+    """Decides how many fixed-length simulation steps to run for
+    the real time which passed, so game logic runs at the same rate
+    no matter how fast frames are rendered.
+
+    Time which isn't a whole step yet carries over to the next
+    frame; alpha is how far into the next step it is, for
+    interpolating positions when rendering. If simulation falls
+    more than max_steps behind, the extra time is dropped, rather
+    than trying (and failing) to catch up forever.
+
+    Attributes:
+        step_milliseconds (float): the length of a simulation step.
+        max_steps (int): the most steps to run per advance().
+        lag_milliseconds (float): time not yet simulated.
+        dropped_milliseconds (float): total time dropped because
+            simulation fell too far behind.
+
+    Example:
+        >>> timestep = Timestep(10, max_steps=3)
+        >>> timestep.advance(25)
+        2
+        >>> timestep.alpha
+        0.5
+        >>> timestep.advance(100)
+        3
+        >>> timestep.dropped_milliseconds
+        70.0
+
+    """
+
+    STEP_MILLISECONDS = 1000.0 / 60
+    MAX_STEPS = 5
+
+    def __init__(self, step_milliseconds=None, max_steps=None):
+        """
+
+        Args:
+            step_milliseconds (float|None): Defaults to
+                STEP_MILLISECONDS, i.e., 60 steps per second.
+            max_steps (int|None): Defaults to MAX_STEPS.
+
+        """
+
+        self.step_milliseconds = float(step_milliseconds or
+                                       Timestep.STEP_MILLISECONDS)
+        self.max_steps = max_steps or Timestep.MAX_STEPS
+        self.lag_milliseconds = 0.0
+        self.dropped_milliseconds = 0.0
+
+    @property
+    def alpha(self):
+        """float: 0 to 1, how far time is between the last step
+        and the next one.
+
+        """
+
+        return self.lag_milliseconds / self.step_milliseconds
+
+    def advance(self, elapsed_milliseconds):
+        """Add real time which passed.
+
+        Args:
+            elapsed_milliseconds (int|float): --
+
+        Returns:
+            int: the number of simulation steps to run now.
+
+        """
+
+        self.lag_milliseconds += elapsed_milliseconds
+        steps = int(self.lag_milliseconds // self.step_milliseconds)
+
+        if steps > self.max_steps:
+            dropped = (steps - self.max_steps) * self.step_milliseconds
+            self.dropped_milliseconds += dropped
+            self.lag_milliseconds -= dropped
+            steps = self.max_steps
+
+        self.lag_milliseconds -= steps * self.step_milliseconds
+
+        return steps
+
+
 class Game(object):
-    """Simulates the interaction between game components."""
+    """Simulates the interaction between game components.
+
+    Game logic (input and movement) runs in fixed steps (see
+    Timestep), while rendering happens as often as the screen
+    allows, e.g., uncapped with render.Screen(fps=0). Actors are
+    drawn interpolated between their last two simulated positions.
+
+    """
 
     def __init__(self, screen=None, scene=None,
-                 viewport_size=None, dialogbox=None):
+                 viewport_size=None, dialogbox=None, dirty_rects=False,
+                 timestep=None, run=True):
+        """
+
+        Args:
+            screen (render.Screen|None): --
+            scene (Scene): --
+            viewport_size (tuple): (x, y) pixel dimensions of the
+                viewport.
+            dialogbox (dialog.DialogBox|None): --
+            dirty_rects (bool): Only redraw, and update the display
+                with, the areas of the viewport which changed since
+                the last frame. See render.DirtyRects.
+            timestep (Timestep|None): how often game logic runs.
+                Defaults to 60 steps per second.
+            run (bool): Start the game loop right away. If False,
+                drive the game yourself, e.g., see hypatia.bench.
+
+        """
 
         self.screen = screen or render.Screen()
         self.viewport = render.Viewport(viewport_size)
         self.dialogbox = dialogbox or dialog.DialogBox(self.viewport.rect.size)
+        self.hud = hud.PerformanceHUD(self.viewport.rect.size)
+
+        if dirty_rects:
+            self.dirty_rects = render.DirtyRects(self.viewport.rect.size)
+        else:
+            self.dirty_rects = None
+
+        self.timestep = timestep or Timestep()
 
         # everything has been added, run runtime_setup() on each
         # relevant item
         self.scene = scene
         self.scene.runtime_setup()
-        self.start_loop()
 
-    # will be removed
-    def old_render(self):
+        if run:
+            self.start_loop()
+
+    def render(self):
         """Drawing behavior for game objects.
 
         Parts of this should go to their respective classes, .e.g,
@@ -169,75 +289,143 @@ class Game(object):
 
         Needs to be updated to use sprite groups.
 
+        Returns:
+            list[pygame.Rect]|None: the areas of the viewport which
+                were redrawn, or None if everything was (i.e., when
+                not using dirty rects).
+
         """
 
-        first_tilemap_layer = self.scene.tilemap.layer_images[0]
-        self.viewport.center_on(self.scene.human_player.walkabout,
-                                first_tilemap_layer.get_rect())
-        self.viewport.blit(first_tilemap_layer)
-        self.scene.tilemap.blit_layer_animated_tiles(self.viewport, 0)
-
-        # render each npc walkabout
-        for npc in self.scene.npcs:
-            npc.walkabout.blit(
-                               self.screen.clock,
-                               self.viewport.surface,
-                               self.viewport.rect.topleft
-                              )
-
-        # finally human and rest map layers last
-        self.scene.human_player.walkabout.blit(
-                                               self.screen.clock,
-                                               self.viewport.surface,
-                                               self.viewport.rect.topleft
-                                              )
-
-        for i, layer in enumerate(self.scene.tilemap.layer_images[1:], 1):
-            self.viewport.blit(layer)
-            self.scene.tilemap.blit_layer_animated_tiles(self.viewport, i)
-
-        self.dialogbox.blit(self.viewport.surface)
+        if self.dirty_rects is None:
+            self.scene.render(self.viewport, self.screen.clock)
+            self.dialogbox.blit(self.viewport.surface)
+            self.hud.blit(self.viewport.surface, self.scene)
 
-    def render(self):
-        """Drawing behavior for game objects.
+            return None
 
-        Parts of this should go to their respective classes, .e.g,
-        scene.
+        # only redraw the areas which changed, e.g., where
+        # actors moved or animated tiles changed frame.
+        with profiling.profiler.span('track'):
+            self.scene.track_changes(self.viewport, self.screen.clock,
+                                     self.dirty_rects)
+        dialog_state, dialog_rect = self.dialogbox.render_state()
+        self.dirty_rects.track(self.dialogbox, dialog_state, dialog_rect)
+        hud_state, hud_rect = self.hud.render_state()
+        self.dirty_rects.track(self.hud, hud_state, hud_rect)
 
-        Needs to be updated to use sprite groups.
+        regions = self.dirty_rects.regions()
+        surface = self.viewport.surface
 
-        """
+        for region in regions:
+            surface.set_clip(region)
+            self.scene.render_area(self.viewport, region)
+            self.dialogbox.blit(surface)
+            self.hud.blit(surface, self.scene)
+
+        surface.set_clip(None)
 
-        self.scene.render(self.viewport, self.screen.clock)
-        self.dialogbox.blit(self.viewport.surface)
+        return regions
 
     def start_loop(self):
+        """Run frames (see run_frame()) as fast as the screen allows,
+        until the player quits.
+
+        """
+
         controller = controllers.WorldController(self)
+        last_ticks = pygame.time.get_ticks()
+        running = True
 
-        while controller.handle_input():
-            controller.handle_input()
-            self.screen.update(self.viewport.surface)
-            self.render()
+        while running:
+            ticks = pygame.time.get_ticks()
+            running = self.run_frame(controller, ticks - last_ticks)
+            last_ticks = ticks
 
         pygame.quit()
         sys.exit()
 
+    def run_frame(self, controller, elapsed_milliseconds):
+        """Simulate in fixed steps and render in between, for one
+        frame of the game loop, profiling each part.
+
+        Input is handled once per simulation step, all steps due are
+        run before rendering (skipping frames when behind), and the
+        frame is rendered before being put on the screen.
+
+        Args:
+            controller (controllers.WorldController): anything with
+                a handle_input() which returns False to quit, e.g.,
+                scripted input; see hypatia.bench.
+            elapsed_milliseconds (int|float): the real time which
+                passed since the last frame.
+
+        Returns:
+            bool: False if the player quit.
+
+        """
+
+        timestep = self.timestep
+        profiler = profiling.profiler
+        profiler.begin_frame()
+        steps = timestep.advance(elapsed_milliseconds)
+        running = True
+
+        with profiler.span('update'):
+
+            for __ in range(steps):
+                self.scene.remember_positions()
+
+                with profiler.span('input'):
+                    running = controller.handle_input()
+
+                if not running:
+                    break
+
+        with profiler.span('render'):
+            self.scene.interpolate(timestep.alpha)
+            regions = self.render()
+            self.scene.restore_positions()
+
+        self.screen.update(self.viewport.surface, regions)
+        profiler.end_frame()
+
+        return running
+
 
 class Scene(object):
     """A map with configuration data/meta, e.g., NPCs.
 
+    Constants:
+        CULL_MARGIN (int): how many pixels outside of the viewport
+            an actor's rect may be and still be drawn, for what
+            hangs off of it (e.g., child walkabouts) and for
+            interpolated movement.
+
     Attributes:
       tilemap (hypatia.tiles.Tilemap): --
       player_start_position (tuple): (x, y); two integer tuple
         denoting the starting position for human player.
       human_player (hypatia.player.Player): the human player object.
       npcs (list): a list of hypatia.player.NPC objects
+      collision_world (physics.CollisionWorld): the tilemap's
+        passability and the position of every actor, used for
+        collision checks.
+      conversion (render.ConversionPass|None): the display format
+        conversion done by runtime_setup(), if it has been run.
+      draw_lists (list): what each walkabout draws, as of the last
+        track_changes(); see sprites.Walkabout.draw_list().
+      previous_positions (dict): each walkabout's topleft_float
+        before the last simulation step, for interpolate().
+      tracked_walkabouts (set): the walkabouts track_changes() last
+        tracked, i.e., the visible ones.
 
     Notes:
         Should have methods for managing npcs, e.g., add/remove.
 
     """
 
+    CULL_MARGIN = 32
+
     def __init__(self, tilemap, player_start_position,
                  human_player, npcs=None):
         """
@@ -261,6 +449,17 @@ class Scene(object):
         npc_walkabouts = [n.walkabout for n in self.npcs]
         self.npc_sprite_group = pygame.sprite.Group(*npc_walkabouts)
 
+        self.collision_world = physics.CollisionWorld(
+            tilemap.passability,
+            actors=[human_player] + self.npcs
+        )
+        self.conversion = None
+        self.draw_lists = []
+        self.previous_positions = {}
+        self.tracked_walkabouts = set()
+        self._simulated_positions = []
+        self._npc_indexes = dict((npc, i) for i, npc in enumerate(self.npcs))
+
     @staticmethod
     def create_human_player(start_position):
         """Currently mostly scaffolding for creating/loading the
@@ -331,14 +530,28 @@ class Scene(object):
         """
 
         # load the scene zip from the scene resource and read
-        # the general scene configuration, first.
-        resource = resources.Resource('scenes', scene_name)
+        # the general scene configuration, first. The resource is
+        # only needed while loading; the asset cache keeps it
+        # around (within budget) for loading the scene again.
+        resource = resources.load_resource('scenes', scene_name)
         scene_ini = resource['scene.ini']
 
-        # Construct a TileMap from the tilemap.txt
-        # contents from the scene resource.
-        tilemap_string = resource['tilemap.txt']
-        tilemap = tiles.TileMap.from_string(tilemap_string)
+        # Construct a TileMap from the scene resource, preferring
+        # the binary tilemap.bin over tilemap.txt. If the resource
+        # is an unpacked directory, tilemap.bin is memory-mapped
+        # from its path, and never read into the resource (or the
+        # asset cache).
+        if 'tilemap.bin' in resource:
+            binary_path = resource.file_path('tilemap.bin')
+
+            if binary_path:
+                tilemap = tiles.TileMap.from_binary_file(binary_path)
+            else:
+                tilemap = tiles.TileMap.from_binary(resource['tilemap.bin'])
+
+        else:
+            tilemap_string = resource['tilemap.txt']
+            tilemap = tiles.TileMap.from_string(tilemap_string)
 
         # Get the player's starting position from the
         # general scene configuration.
@@ -390,6 +603,8 @@ class Scene(object):
             npc = player.Npc(walkabout=npc_walkabout, say_text=say_text)
             npcs.append(npc)
 
+        resources.release_resource('scenes', scene_name)
+
         return Scene(
                      tilemap=tilemap,
                      player_start_position=player_start_position,
@@ -397,40 +612,155 @@ class Scene(object):
                      npcs=npcs
                     )
 
-    def collide_check(self, rect):
-        """Returns True if there are collisions with rect.
+    def release(self):
+        """Release this scene's tilesheet and walkabouts in the
+        process-wide asset cache. Call this once the scene
+        is no longer used.
+
+        See Also:
+            * resources.AssetCache
+
+        """
+
+        self.tilemap.release()
+        self.human_player.walkabout.release()
+
+        for npc in self.npcs:
+            npc.walkabout.release()
+
+    def remember_positions(self):
+        """Remember where every actor is, before a simulation step
+        moves them. See interpolate().
+
+        """
+
+        actors = [self.human_player] + self.npcs
+        self.previous_positions = dict((a.walkabout, a.walkabout.topleft_float)
+                                       for a in actors)
+
+    def interpolate(self, alpha):
+        """Move every actor's walkabout, for rendering, to between
+        where it was before the last simulation step and where it
+        is now. Call restore_positions() once rendered.
 
         Args:
-            rect (pygame.Rect): The area/rectangle which
-                to test for collisions against NPCs and
-                the tilemap's wallmap.
+            alpha (float): 0 is where it was, 1 is where it is;
+                see Timestep.alpha.
+
+        """
+
+        self._simulated_positions = []
+
+        for walkabout, previous in self.previous_positions.items():
+            current = walkabout.topleft_float
+
+            if previous == current:
+
+                continue
 
-        Notes:
-            Should use pygame.sprite.spritecollide()
+            self._simulated_positions.append((walkabout, current,
+                                              walkabout.rect))
+            x = previous[0] + (current[0] - previous[0]) * alpha
+            y = previous[1] + (current[1] - previous[1]) * alpha
+            walkabout.topleft_float = (x, y)
+            walkabout.rect = pygame.Rect((int(x), int(y)),
+                                         walkabout.rect.size)
+
+    def restore_positions(self):
+        """Undo interpolate(), putting every walkabout back where
+        the simulation has it.
 
         """
 
-        possible_collisions = self.tilemap.impassable_rects
+        for walkabout, topleft, rect in self._simulated_positions:
+            walkabout.topleft_float = topleft
+            walkabout.rect = rect
 
-        for npc in self.npcs:
-            possible_collisions.append(npc.walkabout.rect)
+        self._simulated_positions = []
+
+    def collide_check(self, rect, ignore=None):
+        """Returns True if there are collisions with rect.
+
+        Only the tiles and actors which rect overlaps are
+        checked; see physics.CollisionWorld.
+
+        Args:
+            rect (pygame.Rect): The area/rectangle which
+                to test for collisions against actors and
+                the tilemap's passability.
+            ignore (actor.Actor|None): The actor which is never
+                collided with, usually the one which is moving.
+                Defaults to the human player.
+
+        """
 
-        return rect.collidelist(possible_collisions) != -1
+        if ignore is None:
+            ignore = self.human_player
+
+        return self.collision_world.collides(rect, ignore=ignore)
 
     def runtime_setup(self):
         """Initialize all the NPCs, tilemap, etc.
 
-        Is this a horrible way of doing this? I dunno,
-        not the fondest...
+        Every surface is converted to the display format in a single
+        pass, whose report is kept as the conversion attribute.
+
+        Returns:
+            render.ConversionPass: --
 
         """
 
-        npcs_to_setup = tuple(npc.walkabout for npc in self.npcs)
-        objects_to_setup = (self.tilemap, self.human_player.walkabout,)
-        objects_to_setup = objects_to_setup + npcs_to_setup
+        conversion = render.ConversionPass()
+        self.tilemap.runtime_setup(conversion)
+        self.human_player.walkabout.runtime_setup(conversion)
+
+        for npc in self.npcs:
+            npc.walkabout.runtime_setup(conversion)
 
-        for object_to_setup in objects_to_setup + npcs_to_setup:
-            object_to_setup.runtime_setup()
+        self.conversion = conversion
+
+        return conversion
+
+    def visible_walkabouts(self, viewport):
+        """The walkabouts of the actors which are on screen, in the
+        order to draw them: the visible NPCs, then the human player.
+
+        Only the actors in the cells of the collision world's
+        spatial hash which the viewport overlaps are looked at, so
+        off-screen NPCs cost nothing to render, not even updating
+        their animations. Counts 'npcs drawn' and 'npcs culled'.
+
+        Args:
+            viewport (render.Viewport): --
+
+        Returns:
+            list[sprites.Walkabout]: --
+
+        """
+
+        margin = Scene.CULL_MARGIN
+        on_screen = self.collision_world.actors.query(
+            viewport.rect.inflate(margin * 2, margin * 2),
+            ignore=self.human_player
+        )
+
+        # in the order of self.npcs, which may have changed since
+        # it was last indexed.
+        try:
+            npcs = sorted(on_screen, key=self._npc_indexes.__getitem__)
+        except KeyError:
+            self._npc_indexes = dict((npc, i)
+                                     for i, npc in enumerate(self.npcs))
+            npcs = sorted(on_screen.intersection(self._npc_indexes),
+                          key=self._npc_indexes.__getitem__)
+
+        profiler = profiling.profiler
+        profiler.count('npcs drawn', len(npcs))
+        profiler.count('npcs culled', len(self.npcs) - len(npcs))
+        walkabouts = [npc.walkabout for npc in npcs]
+        walkabouts.append(self.human_player.walkabout)
+
+        return walkabouts
 
     def render(self, viewport, clock):
         """Render this Scene onto viewport.
@@ -444,33 +774,115 @@ class Scene(object):
 
         """
 
+        profiler = profiling.profiler
+
+        with profiler.span('animation'):
+            (self.tilemap.tilesheet.animated_tiles_group.
+             update(clock, viewport.surface, viewport.rect.topleft))
+            viewport.center_on(self.human_player.walkabout,
+                               self.tilemap.rect)
+            walkabouts = self.visible_walkabouts(viewport)
+
+        with profiler.span('layers'):
+            self.tilemap.blit_band(viewport, tiles.TileMap.BELOW)
+
+        with profiler.span('actors'):
+
+            # render each visible npc walkabout, then the human
+            # player, in one batch; the rest of the map layers go
+            # on top.
+            draws = []
+
+            for walkabout in walkabouts:
+                draws.extend(walkabout.draw_list(clock, viewport.surface,
+                                                 viewport.rect.topleft))
+
+            sprites.blit_draw_list(viewport.surface, draws)
+
+        with profiler.span('layers'):
+            self.tilemap.blit_band(viewport, tiles.TileMap.ABOVE)
+
+    def track_changes(self, viewport, clock, dirty):
+        """Update the camera and every animation, like render()
+        does, but rather than drawing anything, mark what changed
+        since the last frame as dirty.
+
+        Draw the dirty areas with render_area() afterwards.
+
+        Args:
+            viewport (render.Viewport): --
+            clock (pygame.time.Clock): --
+            dirty (render.DirtyRects): --
+
+        """
+
         (self.tilemap.tilesheet.animated_tiles_group.
          update(clock, viewport.surface, viewport.rect.topleft))
-        first_tilemap_layer = self.tilemap.layer_images[0]
-        viewport.center_on(self.human_player.walkabout,
-                           first_tilemap_layer.get_rect())
-        viewport.blit(first_tilemap_layer)
-        self.tilemap.blit_layer_animated_tiles(viewport, 0)
-
-        # render each npc walkabout
-        # should use group draw
-        for npc in self.npcs:
-            npc.walkabout.blit(
-                               clock,
-                               viewport.surface,
-                               viewport.rect.topleft
-                              )
+        viewport.center_on(self.human_player.walkabout, self.tilemap.rect)
+
+        # everything moves on screen if the camera moved
+        if dirty.track(viewport, viewport.rect.topleft, None):
+            dirty.mark_all()
+
+        # animated tiles only go off screen when the camera moves,
+        # which redraws everything anyway.
+        tilemap = self.tilemap
+        drawn = 0
+
+        for layer in tilemap.animated_tile_stack:
+            visible = tilemap.visible_animated_tiles(viewport, layer)
+            drawn += len(visible)
+
+            for tile_anim, position in visible:
+                rect = pygame.Rect(viewport.relative_position(position),
+                                   tile_anim.image.get_size())
+                state = (tile_anim.active_frame_index, tuple(rect))
+                dirty.track((layer, position), state, rect)
+
+        total = sum(len(animated_tiles) for animated_tiles
+                    in tilemap.animated_tile_stack.values())
+        profiling.profiler.count('animated tiles drawn', drawn)
+        profiling.profiler.count('animated tiles culled', total - drawn)
+
+        # npcs first, then the human player, like render()
+        walkabouts = self.visible_walkabouts(viewport)
+        self.draw_lists = []
+
+        for walkabout in walkabouts:
+            draws = walkabout.draw_list(clock, viewport.surface,
+                                        viewport.rect.topleft)
+            state = tuple((id(image), position, id(palette))
+                          for image, position, palette in draws)
+            dirty.track(walkabout, state, sprites.draw_list_rect(draws))
+            self.draw_lists.append(draws)
+
+        # NPCs which went off screen without the camera moving
+        # (e.g., they walked off) leave behind where they were.
+        visible = set(walkabouts)
 
-        # finally human and rest map layers last
-        self.human_player.walkabout.blit(
-                                         clock,
-                                         viewport.surface,
-                                         viewport.rect.topleft
-                                        )
+        for walkabout in self.tracked_walkabouts - visible:
+            dirty.forget(walkabout)
 
-        for i, layer in enumerate(self.tilemap.layer_images[1:], 1):
-            viewport.blit(layer)
-            self.tilemap.blit_layer_animated_tiles(viewport, i)
+        self.tracked_walkabouts = visible
+
+    def render_area(self, viewport, area):
+        """Redraw an area of the viewport, as it was when
+        track_changes() was last called.
+
+        Args:
+            viewport (render.Viewport): --
+            area (pygame.Rect): in viewport coordinates.
+
+        """
+
+        viewport.surface.fill((0, 0, 0), area)
+        self.tilemap.blit_band(viewport, tiles.TileMap.BELOW, area)
+
+        sprites.blit_draw_list(viewport.surface,
+                               [draw for draws in self.draw_lists
+                                for draw in draws])
+
+        self.tilemap.blit_band(viewport, tiles.TileMap.ABOVE, area)
 
 
 class TMX(object):
@@ -523,9 +935,19 @@ class TMX(object):
 
         """
 
-        # parse TMXML for TileMap-specific/supported data
-        tree = ET.parse(path_or_readable)
-        self.root = tree.getroot()  # <map ...>
+        # parse TMXML for TileMap-specific/supported data. TMX
+        # files on disk are parsed once, through the asset cache.
+        if isinstance(path_or_readable, str):
+            self.root = resources.assets.acquire(
+                'TMX',
+                path_or_readable,
+                lambda: ET.parse(path_or_readable).getroot(),
+                size_of=lambda root: os.path.getsize(path_or_readable)
+            )
+            resources.assets.release('TMX', path_or_readable)
+
+        else:
+            self.root = ET.parse(path_or_readable).getroot()  # <map ...>
 
         # check the version first, make sure it's supported
         map_version = self.root.attrib['version']
@@ -564,7 +986,8 @@ class TMX(object):
             for row in rows:
                 # TMX tilesets start their ids at 1, Hypatia Tilesheets
                 # starts ids at 0.
-                cells = row.split(',')[:-1]  # trailing comma
+                # every row but the last has a trailing comma
+                cells = row.strip().rstrip(',').split(',')
                 parsed_row = [int(tile_id) - 1 for tile_id in cells]
                 parsed_rows.append(parsed_row)
 
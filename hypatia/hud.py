@@ -0,0 +1,339 @@
+# This module is part of Hypatia and is released under the
+# MIT License: http://opensource.org/licenses/MIT
+
+"""On-screen performance overlay (heads-up display), for seeing
+hitches, and what causes them, while playing.
+
+The overlay shows what the process-wide profiler (see
+hypatia.profiling) collected about the last frames, so showing it
+enables the profiler. Text is blitted from a glyph atlas, which is
+rendered once, so drawing the overlay costs a few blits per line.
+
+"""
+
+import pygame
+
+from hypatia import render
+from hypatia import profiling
+from hypatia import resources
+
+
+class GlyphAtlas(object):
+    """Every printable ASCII character rendered once, side by side
+    on one surface, for blitting text without rendering it.
+
+    Attributes:
+        surface (pygame.Surface): the atlas; COLORKEY is transparent.
+        areas (dict): character -> the pygame.Rect of its glyph on
+            surface.
+        line_height (int): --
+
+    Example:
+        >>> pygame.font.init()
+        >>> font = pygame.font.Font('resources/fonts/VeraMono.ttf', 5)
+        >>> atlas = GlyphAtlas(font)
+        >>> atlas.size('60 fps') == font.size('60 fps')
+        True
+
+    """
+
+    CHARACTERS = ''.join(chr(i) for i in range(32, 127))
+    COLORKEY = (255, 0, 255)
+
+    def __init__(self, font, color=(255, 255, 255)):
+        """
+
+        Args:
+            font (pygame.font.Font): --
+            color (tuple): (r, g, b) of the text.
+
+        """
+
+        glyphs = [font.render(character, False, color)
+                  for character in GlyphAtlas.CHARACTERS]
+        width = sum(glyph.get_width() for glyph in glyphs)
+        self.line_height = font.get_linesize()
+        self.surface = pygame.Surface((width, self.line_height))
+        self.surface.fill(GlyphAtlas.COLORKEY)
+        self.surface.set_colorkey(GlyphAtlas.COLORKEY)
+        self.areas = {}
+        x = 0
+
+        for character, glyph in zip(GlyphAtlas.CHARACTERS, glyphs):
+            self.surface.blit(glyph, (x, 0))
+            self.areas[character] = pygame.Rect((x, 0), glyph.get_size())
+            x += glyph.get_width()
+
+    def size(self, text):
+        """The (x, y) pixel dimensions text takes up."""
+
+        areas = self.areas
+        unknown = areas['?']
+        width = sum(areas.get(character, unknown).width
+                    for character in text)
+
+        return (width, self.line_height)
+
+    def blit(self, surface, text, position):
+        """Blit text onto surface, every glyph in one batch;
+        characters which aren't in the atlas are shown as '?'.
+
+        Args:
+            surface (pygame.Surface): --
+            text (str): --
+            position (tuple): (x, y) topleft of the text.
+
+        """
+
+        areas = self.areas
+        unknown = areas['?']
+        atlas = self.surface
+        x, y = position
+        blits = []
+
+        for character in text:
+            area = areas.get(character, unknown)
+            blits.append((atlas, (x, y), area))
+            x += area.width
+
+        render.blit_batch(surface, blits)
+
+
+def format_bytes(count):
+    """Bytes, shortened.
+
+    Example:
+        >>> format_bytes(512)
+        '512B'
+        >>> format_bytes(2048)
+        '2.0K'
+        >>> format_bytes(3 * 1024 * 1024)
+        '3.0M'
+
+    """
+
+    for unit in ('B', 'K'):
+
+        if count < 1024:
+
+            return ('%d%s' if unit == 'B' else '%.1f%s') % (count, unit)
+
+        count /= 1024.0
+
+    return '%.1fM' % count
+
+
+class PerformanceHUD(object):
+    """Frame rate, a frame time sparkline, and what each frame did.
+
+    Lines, top to bottom: frames per second and the last frame's
+    milliseconds, the sparkline (red columns went over the
+    profiler's budget), blits per frame, NPCs and animated tiles
+    drawn/culled, the asset cache hit rate, and the memory used by
+    cached assets and stitched tilemap chunks.
+
+    Constants:
+        TOGGLE_KEY (int): the key which shows/hides the overlay;
+            see controllers.WorldController.
+        FPS_FRAMES (int): how many frames the FPS is averaged over.
+        SPARKLINE_HEIGHT (int): in pixels.
+
+    Attributes:
+        visible (bool): --
+        atlas (GlyphAtlas): --
+        profiler (profiling.FrameProfiler): --
+        width (int): the overlay is as wide as the viewport.
+        sparkline (pygame.Surface): the sparkline, kept between
+            frames; see update_sparkline().
+
+    """
+
+    TOGGLE_KEY = pygame.K_F3
+    FPS_FRAMES = 30
+    SPARKLINE_HEIGHT = 6
+    BACKGROUND = (0, 0, 0)
+    GOOD = (0, 200, 0)
+    BAD = (220, 0, 0)
+
+    def __init__(self, viewport_size, font=None, profiler=None):
+        """
+
+        Args:
+            viewport_size (tuple): (x, y) pixel dimensions of the
+                viewport.
+            font (pygame.font.Font|None): Defaults to the font the
+                dialog box uses.
+            profiler (profiling.FrameProfiler|None): Defaults to
+                the process-wide profiling.profiler.
+
+        """
+
+        font = (font or
+                pygame.font.Font('resources/fonts/VeraMono.ttf', 5))
+        self.atlas = GlyphAtlas(font)
+        self.profiler = profiler or profiling.profiler
+        self.width = viewport_size[0]
+        self.visible = False
+        self._profiler_was_enabled = False
+        self.sparkline = pygame.Surface((self.width, self.SPARKLINE_HEIGHT))
+        self.sparkline.fill(self.BACKGROUND)
+        self._sparkline_frames = 0
+
+    def toggle(self):
+        """Show or hide the overlay, enabling the profiler while
+        it's shown.
+
+        """
+
+        self.visible = not self.visible
+
+        if self.visible:
+            self._profiler_was_enabled = self.profiler.enabled
+            self.profiler.enabled = True
+        else:
+            self.profiler.enabled = self._profiler_was_enabled
+
+    def lines(self, scene):
+        """The text of the overlay.
+
+        Args:
+            scene (game.Scene): --
+
+        Returns:
+            tuple: (lines above the sparkline, lines below it).
+
+        """
+
+        profiler = self.profiler
+        frame_times = list(profiler.frame_milliseconds)[-self.FPS_FRAMES:]
+
+        if frame_times:
+            average = sum(frame_times) / len(frame_times)
+            fps = 1000.0 / average if average else 0
+            header = ['%3d fps %4.1fms' % (fps, frame_times[-1])]
+        else:
+            header = ['-- fps']
+
+        last_frame = profiler.last_frame or {'counters': {}}
+        counters = last_frame['counters']
+
+        def drawn_culled(name):
+
+            return '%d/%d' % (counters.get(name + ' drawn', 0),
+                              counters.get(name + ' culled', 0))
+
+        stats = resources.assets.stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = 100.0 * stats['hits'] / lookups if lookups else 100.0
+        memory = stats['bytes_used'] + scene.tilemap.chunks.bytes_used
+
+        return (header,
+                ['blit %d' % counters.get('blits', 0),
+                 'npc %s' % drawn_culled('npcs'),
+                 'anim %s' % drawn_culled('animated tiles'),
+                 'hit %d%%' % hit_rate,
+                 'mem %s' % format_bytes(memory)])
+
+    @property
+    def rect(self):
+        """pygame.Rect: the area the overlay covers."""
+
+        # the header line, and the five lines below the sparkline
+        height = (self.atlas.line_height * 6 +
+                  self.SPARKLINE_HEIGHT + 1)
+
+        return pygame.Rect(0, 0, self.width, height)
+
+    def render_state(self):
+        """What the overlay looks like, and the area it covers, for
+        finding out if it has to be redrawn, like
+        dialog.DialogBox.render_state().
+
+        Returns:
+            tuple: (state, pygame.Rect|None); the rect is None if
+                the overlay isn't shown.
+
+        """
+
+        if not self.visible:
+
+            return (None, None)
+
+        # the numbers change every frame
+        return (self.profiler.frames, self.rect)
+
+    def blit(self, surface, scene):
+        """Draw the overlay onto the top of surface, if visible.
+
+        Args:
+            surface (pygame.Surface): the viewport surface.
+            scene (game.Scene): --
+
+        """
+
+        if not self.visible:
+
+            return None
+
+        header, body = self.lines(scene)
+        line_height = self.atlas.line_height
+        surface.fill(self.BACKGROUND, self.rect)
+        y = 0
+
+        for line in header:
+            self.atlas.blit(surface, line, (0, y))
+            y += line_height
+
+        self.update_sparkline()
+        surface.blit(self.sparkline, (0, y))
+        y += self.SPARKLINE_HEIGHT + 1
+
+        for line in body:
+            self.atlas.blit(surface, line, (0, y))
+            y += line_height
+
+    def update_sparkline(self):
+        """Bring the sparkline up to date with the profiler: scroll
+        it left by a column per frame profiled since the last
+        update, and draw just the new columns, so the sparkline costs
+        (about) one fill per frame, however wide it is.
+
+        The sparkline has one pixel wide column per recent frame,
+        newest on the right, as tall as the frame took; full height
+        is twice the profiler's budget. Frames which were busy for
+        longer than the budget are red.
+
+        """
+
+        profiler = self.profiler
+        sparkline = self.sparkline
+        new_frames = profiler.frames - self._sparkline_frames
+
+        # the profiler was reset; start over
+        if new_frames < 0:
+            sparkline.fill(self.BACKGROUND)
+            new_frames = profiler.frames
+
+        self._sparkline_frames = profiler.frames
+        new_frames = min(new_frames, self.width,
+                         len(profiler.frame_milliseconds))
+
+        if not new_frames:
+
+            return None
+
+        height = self.SPARKLINE_HEIGHT
+        budget = profiler.budget_milliseconds
+        frame_milliseconds = profiler.frame_milliseconds
+        busy_milliseconds = profiler.busy_milliseconds
+        sparkline.scroll(-new_frames, 0)
+        x = self.width - new_frames
+        sparkline.fill(self.BACKGROUND, (x, 0, new_frames, height))
+
+        for i in range(-new_frames, 0):
+            milliseconds = frame_milliseconds[i]
+            column = min(height, max(1, int(milliseconds * height /
+                                            (budget * 2))))
+            color = self.BAD if busy_milliseconds[i] > budget else self.GOOD
+            sparkline.fill(color, (x, height - column, 1, column))
+            x += 1
@@ -9,6 +9,9 @@ See Also:
 
 """
 
+import math
+import collections
+
 import pygame
 
 from hypatia import constants
@@ -30,6 +33,530 @@ class Velocity(object):
         self.y = y
 
 
+class PassabilityGrid(object):
+    """Static impassability bitmap, indexed by tile coordinate.
+
+    Checking a rect against the grid only looks at the tiles the
+    rect overlaps, so it costs the same no matter how big the map
+    is. Anything outside of the grid is impassable; the edge of
+    the map is a wall.
+
+    Attributes:
+        size_in_tiles (tuple): (x, y) dimensions of the grid in tiles.
+        tile_size (tuple): (x, y) pixel dimensions of a tile.
+
+    Example:
+        >>> grid = PassabilityGrid((3, 3), (10, 10))
+        >>> grid[(1, 1)] = True
+        >>> grid.collides(pygame.Rect((0, 0), (10, 10)))
+        False
+        >>> grid.collides(pygame.Rect((5, 5), (10, 10)))
+        True
+        >>> grid.collides(pygame.Rect((-1, 0), (10, 10)))
+        True
+
+    """
+
+    def __init__(self, size_in_tiles, tile_size):
+        """Create a grid where every tile is passable.
+
+        Args:
+            size_in_tiles (tuple): (x, y) dimensions of the
+                grid in tiles.
+            tile_size (tuple): (x, y) pixel dimensions of a tile.
+
+        """
+
+        self.size_in_tiles = size_in_tiles
+        self.tile_size = tile_size
+        self._bitmap = bytearray(size_in_tiles[0] * size_in_tiles[1])
+
+    @classmethod
+    def from_bytes(cls, size_in_tiles, tile_size, bitmap):
+        """Create a grid from a row-major bitmap, with one
+        byte per tile which is nonzero if the tile is impassable.
+
+        Args:
+            size_in_tiles (tuple): --
+            tile_size (tuple): --
+            bitmap (bytes): --
+
+        Example:
+            >>> grid = PassabilityGrid.from_bytes((2, 1), (10, 10),
+            ...                                   b'\\x00\\x01')
+            >>> grid[(0, 0)], grid[(1, 0)]
+            (False, True)
+
+        """
+
+        grid = cls(size_in_tiles, tile_size)
+
+        if len(bitmap) != len(grid._bitmap):
+
+            raise ValueError(len(bitmap))
+
+        grid._bitmap[:] = bitmap
+
+        return grid
+
+    def __getitem__(self, coord):
+        """Return True if the tile at coord is impassable.
+
+        Args:
+            coord (tuple): (x, y) tile coordinate.
+
+        """
+
+        x, y = coord
+        width, height = self.size_in_tiles
+
+        if not (0 <= x < width and 0 <= y < height):
+
+            return True
+
+        return bool(self._bitmap[y * width + x])
+
+    def __setitem__(self, coord, impassable):
+        """Make the tile at coord impassable (True) or
+        passable (False).
+
+        """
+
+        x, y = coord
+        self._bitmap[y * self.size_in_tiles[0] + x] = bool(impassable)
+
+    def tile_span(self, rect):
+        """Return the range of tile coordinates a pixel rect overlaps.
+
+        Args:
+            rect (pygame.Rect): --
+
+        Returns:
+            tuple: (first_x, first_y, last_x, last_y) inclusive tile
+                coordinates, which may lie outside of the grid.
+
+        """
+
+        tile_width, tile_height = self.tile_size
+
+        return (rect.left // tile_width,
+                rect.top // tile_height,
+                (max(rect.right, rect.left + 1) - 1) // tile_width,
+                (max(rect.bottom, rect.top + 1) - 1) // tile_height)
+
+    def any_impassable(self, first_x, first_y, last_x, last_y):
+        """Return True if any tile in the inclusive range of tile
+        coordinates is impassable, or lies outside of the grid.
+
+        Args:
+            first_x (int): --
+            first_y (int): --
+            last_x (int): --
+            last_y (int): --
+
+        """
+
+        width, height = self.size_in_tiles
+
+        if first_x < 0 or first_y < 0 or last_x >= width or last_y >= height:
+
+            return True
+
+        bitmap = self._bitmap
+
+        for y in range(first_y, last_y + 1):
+            row_start = y * width
+
+            if any(bitmap[row_start + first_x:row_start + last_x + 1]):
+
+                return True
+
+        return False
+
+    def collides(self, rect):
+        """Return True if rect overlaps an impassable tile.
+
+        Args:
+            rect (pygame.Rect): pixel area to check.
+
+        """
+
+        return self.any_impassable(*self.tile_span(rect))
+
+    def impassable_rects(self):
+        """Return the pixel rect of every impassable tile.
+
+        This is a full scan of the grid, intended for inspection
+        and debugging rather than collision checks.
+
+        Returns:
+            list[pygame.Rect]: --
+
+        """
+
+        width = self.size_in_tiles[0]
+        tile_width, tile_height = self.tile_size
+        rects = []
+
+        for i, impassable in enumerate(self._bitmap):
+
+            if impassable:
+                position = ((i % width) * tile_width,
+                            (i // width) * tile_height)
+                rects.append(pygame.Rect(position, self.tile_size))
+
+        return rects
+
+
+class SpatialHash(object):
+    """Buckets rects of moving things (e.g., actors) into a
+    uniform grid of cells, so finding what a rect collides with
+    only looks at the things in the cells that rect overlaps.
+
+    Attributes:
+        cell_size (int): width and height of a cell in pixels.
+
+    Example:
+        >>> spatial_hash = SpatialHash(cell_size=16)
+        >>> spatial_hash.insert('slime', pygame.Rect(0, 0, 10, 10))
+        >>> spatial_hash.query(pygame.Rect(5, 5, 2, 2))
+        {'slime'}
+        >>> spatial_hash.move('slime', pygame.Rect(40, 40, 10, 10))
+        >>> spatial_hash.query(pygame.Rect(5, 5, 2, 2))
+        set()
+
+    """
+
+    DEFAULT_CELL_SIZE = 32
+
+    def __init__(self, cell_size=None):
+        """
+
+        Args:
+            cell_size (int|None): width and height of a cell in
+                pixels. Defaults to SpatialHash.DEFAULT_CELL_SIZE.
+
+        """
+
+        self.cell_size = cell_size or SpatialHash.DEFAULT_CELL_SIZE
+        self._cells = collections.defaultdict(set)
+        self._rects = {}
+        self._key_cells = {}
+
+    def __contains__(self, key):
+
+        return key in self._rects
+
+    def __len__(self):
+
+        return len(self._rects)
+
+    def cells_for(self, rect):
+        """Return the (x, y) coordinates of the cells rect overlaps.
+
+        Args:
+            rect (pygame.Rect): --
+
+        Returns:
+            tuple: --
+
+        """
+
+        cell_size = self.cell_size
+        first_x = rect.left // cell_size
+        first_y = rect.top // cell_size
+        last_x = (max(rect.right, rect.left + 1) - 1) // cell_size
+        last_y = (max(rect.bottom, rect.top + 1) - 1) // cell_size
+
+        return tuple((x, y)
+                     for y in range(first_y, last_y + 1)
+                     for x in range(first_x, last_x + 1))
+
+    def insert(self, key, rect):
+        """Add key, occupying rect, to the hash.
+
+        Args:
+            key (hashable): the thing occupying rect, e.g., an Actor.
+            rect (pygame.Rect): the area key occupies. A copy is kept.
+
+        """
+
+        cells = self.cells_for(rect)
+
+        for cell in cells:
+            self._cells[cell].add(key)
+
+        self._rects[key] = pygame.Rect(rect)
+        self._key_cells[key] = cells
+
+    def remove(self, key):
+        """Remove key from the hash.
+
+        Raises:
+            KeyError: key is not in the hash.
+
+        """
+
+        for cell in self._key_cells.pop(key):
+            bucket = self._cells[cell]
+            bucket.discard(key)
+
+            if not bucket:
+                del self._cells[cell]
+
+        del self._rects[key]
+
+    def move(self, key, rect):
+        """Update the area occupied by key, inserting it
+        if it isn't already in the hash.
+
+        Args:
+            key (hashable): --
+            rect (pygame.Rect): the new area key occupies.
+
+        """
+
+        if key not in self._rects:
+            self.insert(key, rect)
+
+            return
+
+        new_cells = self.cells_for(rect)
+
+        if new_cells != self._key_cells[key]:
+            self.remove(key)
+            self.insert(key, rect)
+        else:
+            self._rects[key] = pygame.Rect(rect)
+
+    def rect(self, key):
+        """Return the area key was last inserted or moved with."""
+
+        return self._rects[key]
+
+    def query(self, rect, ignore=None):
+        """Return the keys whose rects collide with rect.
+
+        Args:
+            rect (pygame.Rect): --
+            ignore (hashable|None): key to leave out of the
+                results, e.g., the actor doing the asking.
+
+        Returns:
+            set: --
+
+        """
+
+        found = set()
+        rects = self._rects
+
+        for cell in self.cells_for(rect):
+
+            for key in self._cells.get(cell, ()):
+
+                if key not in found and key is not ignore:
+
+                    if rects[key].colliderect(rect):
+                        found.add(key)
+
+        return found
+
+
+class CollisionWorld(object):
+    """Everything that can be collided with in a scene: the
+    static passability grid built from the tilemap's tile flags,
+    and a spatial hash of the actors, updated as they move.
+
+    Attributes:
+        passability (PassabilityGrid): --
+        actors (SpatialHash): keys are actors, whose rects are
+            their walkabout's rect.
+
+    """
+
+    def __init__(self, passability, actors=None, cell_size=None):
+        """
+
+        Args:
+            passability (PassabilityGrid): --
+            actors (list[actor.Actor]|None): actors to add
+                to the world right away.
+            cell_size (int|None): actor spatial hash cell size in
+                pixels. Defaults to four tiles.
+
+        """
+
+        tile_width, tile_height = passability.tile_size
+        self.passability = passability
+        self.actors = SpatialHash(cell_size or
+                                  4 * max(tile_width, tile_height))
+
+        for an_actor in actors or []:
+            self.add_actor(an_actor)
+
+    def add_actor(self, an_actor):
+        """Start tracking an actor's walkabout rect.
+
+        Args:
+            an_actor (actor.Actor): --
+
+        """
+
+        self.actors.insert(an_actor, an_actor.walkabout.rect)
+
+    def update_actor(self, an_actor):
+        """Call after an actor's walkabout rect has changed.
+
+        Args:
+            an_actor (actor.Actor): --
+
+        """
+
+        self.actors.move(an_actor, an_actor.walkabout.rect)
+
+    def remove_actor(self, an_actor):
+        """Stop tracking an actor.
+
+        Args:
+            an_actor (actor.Actor): --
+
+        """
+
+        self.actors.remove(an_actor)
+
+    def collides(self, rect, ignore=None):
+        """Return True if rect overlaps an impassable tile,
+        the edge of the map, or an actor.
+
+        Args:
+            rect (pygame.Rect): --
+            ignore (actor.Actor|None): actor which is never
+                collided with, e.g., the actor which is moving.
+
+        """
+
+        return (self.passability.collides(rect) or
+                bool(self.actors.query(rect, ignore=ignore)))
+
+    def sweep(self, topleft, size, displacement, ignore=None):
+        """Return how far a box can legally move, in one query
+        against the passability grid and the actors.
+
+        The x-axis is resolved first, then the y-axis from where the
+        box ended up, so a box moving diagonally into a wall slides
+        along it on the free axis. Tiles and actors the box already
+        overlaps never block it, so it can always move out of them.
+
+        Args:
+            topleft (tuple): (x, y) float pixel position of the box.
+            size (tuple): (x, y) pixel dimensions of the box.
+            displacement (tuple): (x, y) pixels the box wants to move.
+            ignore (actor.Actor|None): actor which is never collided
+                with, e.g., the one which owns the box.
+
+        Returns:
+            tuple: (x, y) displacement the box can actually move,
+                never further than the requested displacement.
+
+        Example:
+            >>> grid = PassabilityGrid((5, 5), (10, 10))
+            >>> grid[(3, 1)] = True
+            >>> world = CollisionWorld(grid)
+            >>> world.sweep((10.0, 10.0), (10, 10), (25.0, 5.0))
+            (10.0, 5.0)
+
+        """
+
+        x, y = topleft
+        width, height = size
+        dx, dy = displacement
+
+        # every actor which could possibly be in the way
+        swept_rect = pygame.Rect(
+                                 int(math.floor(x + min(dx, 0))),
+                                 int(math.floor(y + min(dy, 0))),
+                                 int(math.ceil(width + abs(dx))) + 1,
+                                 int(math.ceil(height + abs(dy))) + 1
+                                )
+        obstacles = [self.actors.rect(an_actor) for an_actor
+                     in self.actors.query(swept_rect, ignore=ignore)]
+
+        dx = self._sweep_axis(0, (x, y), size, dx, obstacles)
+        dy = self._sweep_axis(1, (x + dx, y), size, dy, obstacles)
+
+        return (dx, dy)
+
+    def _sweep_axis(self, axis, topleft, size, distance, obstacles):
+        """Clamp a movement along one axis (0 for x, 1 for y)
+        to the nearest tile or obstacle rect in the way.
+
+        """
+
+        if not distance:
+
+            return distance
+
+        other = 1 - axis
+        tile_length = self.passability.tile_size[axis]
+        other_tile_length = self.passability.tile_size[other]
+
+        near = topleft[axis]
+        far = near + size[axis]
+        cross_near = topleft[other]
+        cross_far = cross_near + size[other]
+
+        # tiles the box spans on the other axis
+        first_cross = int(math.floor(cross_near / other_tile_length))
+        last_cross = int(math.ceil(cross_far / other_tile_length)) - 1
+
+        if distance > 0:
+            lines = range(int(math.ceil(far / tile_length)),
+                          int(math.ceil((far + distance) / tile_length)))
+        else:
+            lines = range(int(math.floor(near / tile_length)) - 1,
+                          int(math.floor((near + distance) /
+                                         tile_length)) - 1,
+                          -1)
+
+        # the nearest line of tiles which blocks the box
+        for line in lines:
+
+            if axis == 0:
+                blocked = self.passability.any_impassable(line, first_cross,
+                                                          line, last_cross)
+            else:
+                blocked = self.passability.any_impassable(first_cross, line,
+                                                          last_cross, line)
+
+            if blocked:
+
+                if distance > 0:
+                    distance = line * tile_length - far
+                else:
+                    distance = (line + 1) * tile_length - near
+
+                break
+
+        # the nearest actor which blocks the box
+        for obstacle in obstacles:
+            obstacle_near = obstacle.topleft[axis]
+            obstacle_far = obstacle_near + obstacle.size[axis]
+            obstacle_cross_near = obstacle.topleft[other]
+            obstacle_cross_far = obstacle_cross_near + obstacle.size[other]
+
+            if (obstacle_cross_far <= cross_near or
+                    obstacle_cross_near >= cross_far):
+
+                continue
+
+            if distance > 0 and obstacle_near >= far:
+                distance = min(distance, obstacle_near - far)
+            elif distance < 0 and obstacle_far <= near:
+                distance = max(distance, obstacle_far - near)
+
+        return float(distance)
+
+
 # this really isn't used, yet
 class Position(object):
     """The position of an object.
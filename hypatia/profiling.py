@@ -0,0 +1,399 @@
+# This module is part of Hypatia and is released under the
+# MIT License: http://opensource.org/licenses/MIT
+
+"""Where frame time goes: named timing spans and counters, per
+frame, aggregated into rolling histories.
+
+The game loop, Scene.render() and Screen.update() time their parts
+with spans of the process-wide profiler, and count blits and
+pixels. The profiler is disabled by default, which makes spans and
+counters do (almost) nothing.
+
+Example:
+    >>> frame_profiler = FrameProfiler(budget_milliseconds=1000)
+    >>> frame_profiler.span('render') is NULL_SPAN
+    True
+    >>> frame_profiler.enabled = True
+    >>> frame_profiler.begin_frame()
+    >>> with frame_profiler.span('render'):
+    ...     with frame_profiler.span('layers'):
+    ...         frame_profiler.count('blits', 4)
+    >>> frame_profiler.end_frame()
+    >>> sorted(frame_profiler.last_frame['spans'])
+    ['layers', 'render']
+    >>> frame_profiler.last_frame['counters']
+    {'blits': 4}
+    >>> frame_profiler.frames
+    1
+    >>> list(frame_profiler.slow_frames)
+    []
+
+"""
+
+import time
+import collections
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# upper bounds of histogram buckets, in milliseconds
+HISTOGRAM_BOUNDS = (1, 2, 4, 8, 16.7, 33.3, 66.7, float('inf'))
+
+
+def percentile(samples, percent):
+    """The nearest-rank percentile of samples.
+
+    Args:
+        samples (iter): numbers, in any order.
+        percent (int|float): 0 to 100.
+
+    Returns:
+        int|float|None: None if there are no samples.
+
+    Example:
+        >>> percentile([4, 1, 3, 2], 50)
+        2
+        >>> percentile(range(1, 101), 99)
+        99
+        >>> percentile([7], 95)
+        7
+
+    """
+
+    samples = sorted(samples)
+
+    if not samples:
+
+        return None
+
+    rank = int(len(samples) * percent / 100.0 + 0.5)
+
+    return samples[min(max(rank, 1), len(samples)) - 1]
+
+
+class NullSpan(object):
+    """What FrameProfiler.span() returns when disabled; does
+    nothing.
+
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span(object):
+    """Times a named part of a frame, as a context manager.
+
+    See FrameProfiler.span().
+
+    """
+
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.start(self.name)
+
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.profiler.stop()
+
+        return False
+
+
+class SlowFrame(object):
+    """A frame which went over budget, and what is to blame.
+
+    Attributes:
+        frame (int): the frame number; see FrameProfiler.frames.
+        milliseconds (float): time spent in (top level) spans.
+        span (str|None): the span which took the most time itself,
+            i.e., not counting the spans within it.
+        span_milliseconds (float): --
+
+    """
+
+    __slots__ = ('frame', 'milliseconds', 'span', 'span_milliseconds')
+
+    def __init__(self, frame, milliseconds, span, span_milliseconds):
+        self.frame = frame
+        self.milliseconds = milliseconds
+        self.span = span
+        self.span_milliseconds = span_milliseconds
+
+    def __repr__(self):
+
+        return ('<SlowFrame #%d: %.1f ms, mostly %s (%.1f ms)>'
+                % (self.frame, self.milliseconds, self.span,
+                   self.span_milliseconds))
+
+
+class FrameProfiler(object):
+    """Collects spans and counters per frame, between
+    begin_frame() and end_frame().
+
+    A frame's busy time is the time spent in its top level spans,
+    so time the loop spends waiting (e.g., in Clock.tick()) isn't
+    held against the budget; frame_milliseconds has the whole
+    frame's time.
+
+    Constants:
+        HISTORY (int): how many frames the rolling histories keep.
+        SLOW_FRAMES (int): how many slow frames are kept.
+
+    Attributes:
+        enabled (bool): --
+        budget_milliseconds (float): frames busy longer than this
+            are slow frames.
+        frames (int): how many frames were profiled.
+        frame_milliseconds (collections.deque): the whole time of
+            each recent frame.
+        busy_milliseconds (collections.deque): the busy time of
+            each recent frame.
+        spans (dict): span name -> collections.deque of its
+            milliseconds in each recent frame it was in.
+        counters (dict): counter name -> collections.deque of its
+            total in each recent frame it was counted in.
+        slow_frames (collections.deque): recent SlowFrames.
+        last_frame (dict|None): the most recent frame's 'spans' and
+            'counters' totals, 'busy' and 'frame' milliseconds.
+
+    """
+
+    HISTORY = 300
+    SLOW_FRAMES = 100
+
+    def __init__(self, budget_milliseconds=1000.0 / 60, enabled=False,
+                 history=None):
+        """
+
+        Args:
+            budget_milliseconds (float): Defaults to a 60 FPS frame.
+            enabled (bool): --
+            history (int|None): Defaults to HISTORY.
+
+        """
+
+        self.enabled = enabled
+        self.budget_milliseconds = budget_milliseconds
+        self.history = history or FrameProfiler.HISTORY
+        self.reset()
+
+    def reset(self):
+        """Forget every frame so far."""
+
+        self.frames = 0
+        self.frame_milliseconds = collections.deque(maxlen=self.history)
+        self.busy_milliseconds = collections.deque(maxlen=self.history)
+        self.spans = {}
+        self.counters = {}
+        self.slow_frames = collections.deque(maxlen=FrameProfiler.SLOW_FRAMES)
+        self.last_frame = None
+        self._span_objects = {}
+        self._stack = []
+        self._frame_start = None
+        self._frame_busy = 0.0
+        self._frame_spans = collections.defaultdict(float)
+        self._frame_self = collections.defaultdict(float)
+        self._frame_counters = collections.defaultdict(int)
+
+    def span(self, name):
+        """Time a part of the frame:
+
+            with profiler.span('render'):
+                ...
+
+        Spans may be nested, and a span may happen more than once
+        per frame, in which case its times are added up.
+
+        Args:
+            name (str): --
+
+        Returns:
+            Span|NullSpan: --
+
+        """
+
+        if not self.enabled:
+
+            return NULL_SPAN
+
+        span = self._span_objects.get(name)
+
+        if span is None:
+            span = self._span_objects[name] = Span(self, name)
+
+        return span
+
+    def start(self, name):
+        """Start timing a span; see span()."""
+
+        self._stack.append([name, timer(), 0.0])
+
+    def stop(self):
+        """Stop timing the innermost span; see span()."""
+
+        name, start, children = self._stack.pop()
+        seconds = timer() - start
+        self._frame_spans[name] += seconds
+        self._frame_self[name] += seconds - children
+
+        if self._stack:
+            self._stack[-1][2] += seconds
+        else:
+            self._frame_busy += seconds
+
+    def count(self, name, amount=1):
+        """Add to a counter for this frame, e.g., 'blits'.
+
+        Args:
+            name (str): --
+            amount (int): --
+
+        """
+
+        if self.enabled:
+            self._frame_counters[name] += amount
+
+    def begin_frame(self):
+        """Start a frame, forgetting anything collected since the
+        last one ended, e.g., if the profiler was enabled mid-frame.
+
+        """
+
+        if self.enabled:
+            del self._stack[:]
+            self._frame_busy = 0.0
+            self._frame_spans.clear()
+            self._frame_self.clear()
+            self._frame_counters.clear()
+            self._frame_start = timer()
+
+    def end_frame(self):
+        """Finish the frame, adding it to the histories, and to
+        slow_frames if it went over budget.
+
+        """
+
+        if not self.enabled or self._frame_start is None:
+
+            return None
+
+        frame_milliseconds = (timer() - self._frame_start) * 1000
+        busy = self._frame_busy * 1000
+        spans = dict((name, seconds * 1000)
+                     for name, seconds in self._frame_spans.items())
+        counters = dict(self._frame_counters)
+
+        self.frame_milliseconds.append(frame_milliseconds)
+        self.busy_milliseconds.append(busy)
+
+        for name, milliseconds in spans.items():
+
+            if name not in self.spans:
+                self.spans[name] = collections.deque(maxlen=self.history)
+
+            self.spans[name].append(milliseconds)
+
+        for name, total in counters.items():
+
+            if name not in self.counters:
+                self.counters[name] = collections.deque(maxlen=self.history)
+
+            self.counters[name].append(total)
+
+        if busy > self.budget_milliseconds:
+
+            if self._frame_self:
+                guilty = max(self._frame_self, key=self._frame_self.get)
+                guilty_milliseconds = self._frame_self[guilty] * 1000
+            else:
+                guilty, guilty_milliseconds = None, 0.0
+
+            self.slow_frames.append(SlowFrame(self.frames, busy, guilty,
+                                              guilty_milliseconds))
+
+        self.last_frame = {'spans': spans, 'counters': counters,
+                           'busy': busy, 'frame': frame_milliseconds}
+        self.frames += 1
+        self._frame_start = None
+
+    def histogram(self, name=None):
+        """Bucket the recent times of a span (or of whole frames).
+
+        Args:
+            name (str|None): a span name, 'busy', or None for the
+                whole frame times.
+
+        Returns:
+            list[tuple]: (upper bound in milliseconds, count) for
+                each of HISTOGRAM_BOUNDS.
+
+        """
+
+        if name is None:
+            samples = self.frame_milliseconds
+        elif name == 'busy':
+            samples = self.busy_milliseconds
+        else:
+            samples = self.spans.get(name, ())
+
+        counts = [0] * len(HISTOGRAM_BOUNDS)
+
+        for milliseconds in samples:
+
+            for i, bound in enumerate(HISTOGRAM_BOUNDS):
+
+                if milliseconds <= bound:
+                    counts[i] += 1
+
+                    break
+
+        return list(zip(HISTOGRAM_BOUNDS, counts))
+
+    def summary(self):
+        """The recent frames, summarized.
+
+        Returns:
+            dict: 'frames' count, and for 'frame', 'busy' and each
+                span in 'spans': p50/p95/p99/max milliseconds, plus
+                the mean of each counter in 'counters' and the
+                number of 'slow_frames'.
+
+        """
+
+        def summarize(samples):
+
+            return {'p50': percentile(samples, 50),
+                    'p95': percentile(samples, 95),
+                    'p99': percentile(samples, 99),
+                    'max': max(samples) if samples else None}
+
+        return {
+                'frames': self.frames,
+                'frame': summarize(self.frame_milliseconds),
+                'busy': summarize(self.busy_milliseconds),
+                'spans': dict((name, summarize(samples))
+                              for name, samples in self.spans.items()),
+                'counters': dict((name, float(sum(totals)) / len(totals))
+                                 for name, totals in self.counters.items()),
+                'slow_frames': len(self.slow_frames),
+               }
+
+
+# the profiler the engine reports to; enable it to collect
+profiler = FrameProfiler()
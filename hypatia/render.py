@@ -11,6 +11,7 @@ See Also:
 
 """
 
+import os
 import sys
 import time
 import itertools
@@ -19,16 +20,68 @@ import pygame
 from pygame.locals import *
 
 from hypatia import constants
+from hypatia import profiling
+from hypatia import animatedsprite
+
+
+def letterbox(source_size, screen_size):
+    """Fit a viewport of source_size onto a screen of screen_size,
+    keeping its aspect ratio.
+
+    Prefers the largest whole-number scale which fits, so every
+    viewport pixel becomes the same block of screen pixels; only
+    a screen smaller than the viewport is scaled by a fraction.
+    The result is centered, with borders (letterboxing) wherever
+    it doesn't fill the screen.
+
+    Args:
+        source_size (tuple): (x, y) pixel dimensions of the viewport.
+        screen_size (tuple): (x, y) pixel dimensions of the screen.
+
+    Returns:
+        tuple: (scale, rect), the scale factor (int if it's a whole
+            number) and the pygame.Rect on screen which the scaled
+            viewport covers.
+
+    Example:
+        >>> letterbox((320, 240), (3840, 2160))
+        (9, <rect(480, 0, 2880, 2160)>)
+        >>> letterbox((320, 240), (640, 480))
+        (2, <rect(0, 0, 640, 480)>)
+        >>> letterbox((640, 480), (320, 320))
+        (0.5, <rect(0, 40, 320, 240)>)
+
+    """
+
+    source_width, source_height = source_size
+    screen_width, screen_height = screen_size
+    scale = min(screen_width // source_width,
+                screen_height // source_height)
+
+    if scale < 1:
+        scale = min(float(screen_width) / source_width,
+                    float(screen_height) / source_height)
+
+    size = (int(source_width * scale), int(source_height * scale))
+    rect = pygame.Rect((0, 0), size)
+    rect.center = (screen_width // 2, screen_height // 2)
+
+    return scale, rect
 
 
 class Screen(object):
     """Everything blits to screen!
 
+    The viewport is scaled straight into a persistent area of the
+    display surface (see letterbox()), so no full-resolution
+    surface is allocated per frame.
+
     Notes:
       --
 
     CONSTANTS:
-      FPS (int): frames per second limit
+      FPS (int): default frames per second limit
+      HEADLESS_SIZE (tuple): default screen size when headless.
 
     Attributes:
       clock (pygame.time.Clock):
@@ -36,48 +89,629 @@ class Screen(object):
         the two most recent frames/updates in milliseconds.
       screen_size (tuple):
       screen (pygame.display surface): --
+      headless (bool): drawing to an offscreen surface using the
+        dummy SDL video driver, e.g., for benchmarks in CI.
+      fps (int): frames per second limit; 0 is uncapped.
+      filters (list|None): functions which take and return a
+        surface, applied to the scaled viewport.
+      viewport_filters (list|None): functions which take and
+        return a surface, applied to the viewport before scaling,
+        i.e., on far fewer pixels than filters.
+      source_size (tuple|None): the viewport size which scale and
+        destination were laid out for.
+      scale (int|float): the viewport to screen scale factor.
+      destination (pygame.Surface): the subsurface of screen which
+        the scaled viewport is drawn to.
 
     """
 
     FPS = 60
+    HEADLESS_SIZE = (1280, 720)
 
-    def __init__(self, filters=None):
+    def __init__(self, filters=None, viewport_filters=None, fps=None,
+                 headless=False, screen_size=None):
         """Will init pygame.
 
         Args:
           filters (list): list of functions which takes and
-            returns a surface.
+            returns a surface. They work on the scaled viewport.
+          viewport_filters (list): list of functions which takes
+            and returns a surface. They work on the viewport before
+            it's scaled.
+          fps (int|None): frames per second limit. Defaults to
+            FPS; 0 renders as fast as possible.
+          headless (bool): Don't open a window or go fullscreen;
+            draw to an offscreen surface with the dummy SDL video
+            driver instead.
+          screen_size (tuple|None): (x, y) pixel dimensions of the
+            screen. Defaults to the display's size, or HEADLESS_SIZE
+            if headless.
 
         """
 
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+            # the video driver is only picked when the display inits
+            if (pygame.display.get_init() and
+                    pygame.display.get_driver() != 'dummy'):
+                pygame.display.quit()
+
         pygame.init()
         pygame.mouse.set_visible(False)
         self.clock = pygame.time.Clock()
         self.time_elapsed_milliseconds = 0
-        display_info = pygame.display.Info()
-        self.screen_size = (display_info.current_w, display_info.current_h)
-        self.screen = pygame.display.set_mode(
-                                              self.screen_size,
-                                              FULLSCREEN | DOUBLEBUF
-                                             )
+        self.headless = headless
+
+        if headless:
+            self.screen_size = screen_size or Screen.HEADLESS_SIZE
+            self.screen = pygame.display.set_mode(self.screen_size)
+        else:
+            display_info = pygame.display.Info()
+            self.screen_size = screen_size or (display_info.current_w,
+                                               display_info.current_h)
+            self.screen = pygame.display.set_mode(
+                                                  self.screen_size,
+                                                  FULLSCREEN | DOUBLEBUF
+                                                 )
+
+        self.fps = Screen.FPS if fps is None else fps
         self.filters = filters
+        self.viewport_filters = viewport_filters
+        self.source_size = None
+        self.scale = None
+        self.destination = None
+
+    def layout(self, source_size):
+        """Work out the scale and letterbox area for a viewport of
+        source_size, unless they're already worked out.
+
+        Clears the screen (and so the letterbox borders) when the
+        layout changes.
+
+        Args:
+          source_size (tuple): (x, y) pixel dimensions of the
+            viewport.
 
-    def update(self, surface):
+        """
+
+        if source_size == self.source_size:
+
+            return None
+
+        self.scale, rect = letterbox(source_size, self.screen_size)
+        self.screen.fill((0, 0, 0))
+        self.destination = self.screen.subsurface(rect)
+        self.source_size = source_size
+
+    def update(self, surface, rects=None):
         """Update the screen; apply surface to screen, automatically
         rescaling for fullscreen.
 
+        Args:
+          surface (pygame.Surface): the viewport surface.
+          rects (list[pygame.Rect]|None): only rescale and update
+            these areas of surface, e.g., from DirtyRects.regions().
+            Everything is updated if None, or if there are filters,
+            which work on the whole screen.
+
         """
 
-        scaled_surface = pygame.transform.scale(surface, self.screen_size)
+        profiler = profiling.profiler
+
+        with profiler.span('present'):
+
+            with profiler.span('scale'):
+                screen_rects = self.blit_viewport(surface, rects)
+
+            with profiler.span('flip'):
+                self.flip(screen_rects)
+
+        self.time_elapsed_milliseconds = self.clock.tick(self.fps)
+
+        # every animation shows the same moment during this tick
+        animatedsprite.set_time(pygame.time.get_ticks())
+
+    def blit_viewport(self, surface, rects=None):
+        """Filter and rescale surface onto the screen, without
+        updating the display; see update().
+
+        Args:
+          surface (pygame.Surface): the viewport surface.
+          rects (list[pygame.Rect]|None): See update().
+
+        Returns:
+          list[pygame.Rect]|None: the areas of the screen which
+            changed, or None if all of it did.
+
+        """
+
+        if self.viewport_filters:
+
+            for filter_function in self.viewport_filters:
+                surface = filter_function(surface)
+
+        self.layout(surface.get_size())
+
+        if rects is not None and not self.filters:
+
+            return self.blit_viewport_rects(surface, rects)
+
+        destination = self.destination
+        pygame.transform.scale(surface, destination.get_size(), destination)
 
         if self.filters:
+            filtered_surface = destination
 
             for filter_function in self.filters:
-                scaled_surface = filter_function(scaled_surface)
+                filtered_surface = filter_function(filtered_surface)
+
+            if filtered_surface is not destination:
+                destination.blit(filtered_surface, (0, 0))
+
+        return None
+
+    def blit_viewport_rects(self, surface, rects):
+        """Rescale only some areas of surface onto the screen.
+
+        Args:
+          surface (pygame.Surface): the viewport surface.
+          rects (list[pygame.Rect]): areas of surface.
+
+        Returns:
+          list[pygame.Rect]: the areas of the screen which changed.
+
+        """
+
+        self.layout(surface.get_size())
+        scale = self.scale
+        offset_x, offset_y = self.destination.get_abs_offset()
+        surface_rect = surface.get_rect()
+        screen_rects = []
+
+        for rect in rects:
+            rect = rect.clip(surface_rect)
+
+            if not rect:
+
+                continue
+
+            left = offset_x + int(rect.left * scale)
+            top = offset_y + int(rect.top * scale)
+            right = offset_x + int(rect.right * scale)
+            bottom = offset_y + int(rect.bottom * scale)
+            screen_rect = pygame.Rect(left, top, right - left, bottom - top)
+            pygame.transform.scale(surface.subsurface(rect),
+                                   screen_rect.size,
+                                   self.screen.subsurface(screen_rect))
+            screen_rects.append(screen_rect)
+
+        return screen_rects
+
+    def flip(self, screen_rects=None):
+        """Push the screen to the display.
+
+        Args:
+          screen_rects (list[pygame.Rect]|None): only push these
+            areas of the screen, or all of it if None.
+
+        """
+
+        if screen_rects is None:
+            pygame.display.flip()
+        elif screen_rects:
+            pygame.display.update(screen_rects)
+
+
+class DirtyRects(object):
+    """The areas of a viewport which changed since the last frame,
+    for redrawing (and updating the display) only those areas.
+
+    Things which are drawn are tracked by a key, e.g., an actor,
+    along with their state, e.g., (image, position). Whenever their
+    state differs from last frame, the area they covered last frame
+    and the area they cover now are both dirty.
+
+    Attributes:
+        viewport_rect (pygame.Rect): the whole viewport area, in
+            viewport coordinates.
+        everything (bool): True if the whole viewport is dirty,
+            e.g., on the first frame or after the camera moved.
+        rects (list[pygame.Rect]): --
+
+    Example:
+        >>> dirty = DirtyRects((100, 100))
+        >>> dirty.regions()
+        [<rect(0, 0, 100, 100)>]
+        >>> dirty.track('actor', (1, 2), pygame.Rect(0, 0, 10, 10))
+        True
+        >>> dirty.regions()
+        [<rect(0, 0, 10, 10)>]
+        >>> dirty.track('actor', (1, 2), pygame.Rect(0, 0, 10, 10))
+        False
+        >>> dirty.regions()
+        []
+        >>> dirty.track('actor', (2, 2), pygame.Rect(5, 0, 10, 10))
+        True
+        >>> dirty.regions()
+        [<rect(0, 0, 15, 10)>]
+
+    """
+
+    # more regions than this are merged into their bounding box
+    MAX_REGIONS = 8
+
+    def __init__(self, viewport_size):
+        """
+
+        Args:
+            viewport_size (tuple): (x, y) pixel dimensions of the
+                viewport.
+
+        """
+
+        self.viewport_rect = pygame.Rect((0, 0), viewport_size)
+        self.everything = True
+        self.rects = []
+        self._tracked = {}
+
+    def mark(self, rect):
+        """Mark an area (in viewport coordinates) as dirty."""
+
+        if rect:
+            self.rects.append(pygame.Rect(rect))
+
+    def mark_all(self):
+        """Mark the whole viewport as dirty."""
+
+        self.everything = True
+
+    def track(self, key, state, rect):
+        """Mark the area of the thing tracked by key as dirty if
+        its state changed since it was last tracked.
+
+        Args:
+            key (hashable): identifies the thing being drawn.
+            state (object): compared with == to the state last
+                tracked for key.
+            rect (pygame.Rect|None): the area the thing covers now,
+                or None if it isn't drawn.
+
+        Returns:
+            bool: True if the state changed.
+
+        """
+
+        previous = self._tracked.get(key)
+
+        if previous is not None and previous[0] == state:
+
+            return False
+
+        if previous is not None:
+            self.mark(previous[1])
+
+        self.mark(rect)
+        self._tracked[key] = (state, rect)
+
+        return True
+
+    def forget(self, key):
+        """Stop tracking key, marking where it was as dirty."""
+
+        previous = self._tracked.pop(key, None)
+
+        if previous is not None:
+            self.mark(previous[1])
+
+    def regions(self):
+        """Return the dirty areas, clipped to the viewport, and start
+        over for the next frame.
+
+        Returns:
+            list[pygame.Rect]: --
+
+        """
+
+        if self.everything:
+            regions = [self.viewport_rect.copy()]
+        else:
+            regions = [rect.clip(self.viewport_rect) for rect in self.rects]
+            regions = [rect for rect in regions if rect]
+            regions = merge_rects(regions)
+
+            if len(regions) > DirtyRects.MAX_REGIONS:
+                regions = [regions[0].unionall(regions[1:])]
+
+        self.everything = False
+        self.rects = []
+
+        return regions
+
+
+def merge_rects(rects):
+    """Merge overlapping rects into their union, until none of the
+    rects overlap.
+
+    Args:
+        rects (list[pygame.Rect]): --
+
+    Returns:
+        list[pygame.Rect]: --
+
+    Example:
+        >>> merge_rects([pygame.Rect(0, 0, 4, 4), pygame.Rect(2, 2, 4, 4),
+        ...              pygame.Rect(10, 10, 1, 1)])
+        [<rect(0, 0, 6, 6)>, <rect(10, 10, 1, 1)>]
+
+    """
+
+    merged = []
+
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        overlap = rect.collidelist(merged)
+
+        while overlap != -1:
+            rect.union_ip(merged.pop(overlap))
+            overlap = rect.collidelist(merged)
+
+        merged.append(rect)
+
+    return merged
+
+
+def blit_batch(surface, blits):
+    """Blit many surfaces onto surface with a single call, rather
+    than a Python level blit() call each.
+
+    Uses Surface.fblits() where pygame has it, else Surface.blits(),
+    without asking for the blitted rects, unless the profiler is
+    enabled, in which case it counts 'blits' and 'pixels' from them.
+
+    Args:
+        surface (pygame.Surface): --
+        blits (list[tuple]): (source surface, (x, y) position) or
+            (source surface, (x, y) position, area rect) tuples,
+            like Surface.blits() takes; blitted in order.
+
+    Example:
+        >>> surface = pygame.Surface((4, 4))
+        >>> red = pygame.Surface((1, 1))
+        >>> red.fill((255, 0, 0))
+        <rect(0, 0, 1, 1)>
+        >>> blit_batch(surface, [(red, (0, 0)), (red, (3, 3))])
+        >>> surface.get_at((3, 3))
+        (255, 0, 0, 255)
+
+    """
+
+    if not blits:
+
+        return None
+
+    profiler = profiling.profiler
+
+    if profiler.enabled:
+        pixels = sum(rect.width * rect.height
+                     for rect in surface.blits(blits))
+        profiler.count('blits', len(blits))
+        profiler.count('pixels', pixels)
+    # fblits() only takes (source, position) pairs
+    elif hasattr(surface, 'fblits') and len(blits[0]) == 2:
+        surface.fblits(blits)
+    else:
+        surface.blits(blits, False)
+
+
+# the most precise clock available, for ConversionPass timings
+timer = profiling.timer
+
+
+class ConversionPass(object):
+    """Convert surfaces to the display's pixel format, so blitting
+    them doesn't go through pygame's slow format-mismatch path,
+    and record how much time that saves.
+
+    One pass is meant to be shared by everything prepared at
+    the same time (see Scene.runtime_setup()), so a surface
+    shared by many sprites is only converted once.
+
+    When there is no display (e.g., headless testing), surfaces
+    are converted to 32-bit (A)RGB instead.
+
+    Indexed (8-bit) surfaces are left as they are, so their
+    palettes can still be changed.
+
+    Attributes:
+        headless (bool): True if there's no display, so the
+            fallback formats are used.
+        alpha_format (pygame.Surface): A surface in the format
+            which surfaces with per-pixel alpha are converted to.
+        opaque_format (pygame.Surface): A surface in the format
+            which other surfaces are converted to.
+        converted (int): How many surfaces were converted.
+        skipped (int): How many surfaces were already in
+            the display format, or indexed.
+        conversion_seconds (float): Time spent converting.
+        blit_seconds_before (float): Time it took to blit each
+            converted surface once, before conversion.
+        blit_seconds_after (float): Time it took to blit each
+            converted surface once, after conversion.
+
+    Example:
+        >>> conversion = ConversionPass()
+        >>> surface = pygame.image.frombuffer(b'\\0' * 64, (4, 4), 'RGBA')
+        >>> converted = conversion.convert(surface)
+        >>> converted.get_masks() == conversion.alpha_format.get_masks()
+        True
+        >>> conversion.convert(surface) is converted
+        True
+        >>> conversion.convert(converted) is converted
+        True
+
+    """
+
+    # blits are timed onto a surface of this size
+    SCRATCH_SIZE = (256, 256)
+
+    def __init__(self):
+        """Find out the display's formats, or the headless
+        fallback formats if there's no display.
+
+        """
+
+        format_surface = pygame.Surface((1, 1), pygame.SRCALPHA, 32)
+        scratch = pygame.Surface(ConversionPass.SCRATCH_SIZE, 0, 32)
+
+        self.headless = pygame.display.get_surface() is None
+
+        if self.headless:
+            self.alpha_format = format_surface
+            self.opaque_format = pygame.Surface((1, 1), 0, 32)
+        else:
+            self.alpha_format = format_surface.convert_alpha()
+            self.opaque_format = format_surface.convert()
+            scratch = scratch.convert()
+
+        self.scratch = scratch
+        self.converted = 0
+        self.skipped = 0
+        self.conversion_seconds = 0.0
+        self.blit_seconds_before = 0.0
+        self.blit_seconds_after = 0.0
+        self._conversions = {}
+
+    @staticmethod
+    def same_format(surface, format_surface):
+        """Return True if surface has the pixel format
+        of format_surface.
+
+        """
+
+        return (surface.get_bitsize() == format_surface.get_bitsize() and
+                surface.get_masks() == format_surface.get_masks() and
+                (surface.get_flags() & pygame.SRCALPHA ==
+                 format_surface.get_flags() & pygame.SRCALPHA))
+
+    def remember(self, surface, converted):
+        """Make future convert(surface) calls return converted,
+        e.g., for a subsurface whose parent was converted.
+
+        Args:
+            surface (pygame.Surface): --
+            converted (pygame.Surface): --
+
+        """
+
+        self._conversions[id(surface)] = (surface, converted)
+
+    def convert(self, surface):
+        """Return surface in the display format, which is the
+        surface itself if it's already in the display format
+        (or indexed).
+
+        Surfaces with per-pixel alpha keep it.
+
+        Args:
+            surface (pygame.Surface): --
+
+        Returns:
+            pygame.Surface: --
+
+        """
+
+        try:
+
+            return self._conversions[id(surface)][1]
+
+        except KeyError:
+            pass
+
+        if surface.get_masks()[3] or surface.get_flags() & pygame.SRCALPHA:
+            format_surface = self.alpha_format
+        else:
+            format_surface = self.opaque_format
+
+        if (surface.get_bitsize() == 8 or
+                self.same_format(surface, format_surface)):
+
+            self.skipped += 1
+            self.remember(surface, surface)
+
+            return surface
+
+        self.blit_seconds_before += self.time_blit(surface)
+
+        start = timer()
+
+        if self.headless:
+            converted = self.copy_to_format(surface, format_surface)
+        elif format_surface is self.alpha_format:
+            converted = surface.convert_alpha()
+        else:
+            converted = surface.convert()
+
+        self.conversion_seconds += timer() - start
+        self.blit_seconds_after += self.time_blit(converted)
+        self.converted += 1
+        self.remember(surface, converted)
+
+        return converted
+
+    @staticmethod
+    def copy_to_format(surface, format_surface):
+        """Return a copy of surface in the pixel format of
+        format_surface. Unlike Surface.convert(), this works
+        without pygame.display being initialized.
+
+        Args:
+            surface (pygame.Surface): --
+            format_surface (pygame.Surface): --
+
+        Returns:
+            pygame.Surface: --
+
+        """
+
+        flags = format_surface.get_flags() & pygame.SRCALPHA
+        copy = pygame.Surface(surface.get_size(), flags, format_surface)
+
+        # adding to the all-zero copy copies every channel exactly,
+        # rather than blending; the colorkey is copied separately.
+        colorkey = surface.get_colorkey()
+        surface.set_colorkey(None)
+        copy.blit(surface, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+        surface.set_colorkey(colorkey)
+        copy.set_colorkey(colorkey)
+
+        return copy
+
+    def time_blit(self, surface):
+        """Return how many seconds blitting surface once takes."""
+
+        start = timer()
+        self.scratch.blit(surface, (0, 0))
+
+        return timer() - start
+
+    def report(self):
+        """Summarize this pass.
+
+        Returns:
+            str: --
+
+        """
+
+        saved = self.blit_seconds_before - self.blit_seconds_after
 
-        self.screen.blit(scaled_surface, (0, 0))
-        pygame.display.flip()
-        self.time_elapsed_milliseconds = self.clock.tick(Screen.FPS)
+        return ("converted %d surfaces (%d skipped) in %.1f ms; "
+                "blitting each once went from %.2f ms to %.2f ms "
+                "(%.2f ms saved)" % (self.converted, self.skipped,
+                                     self.conversion_seconds * 1000,
+                                     self.blit_seconds_before * 1000,
+                                     self.blit_seconds_after * 1000,
+                                     saved * 1000))
 
 
 # how much of this is redundant due to pygame Surface.scroll?
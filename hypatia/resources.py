@@ -10,6 +10,7 @@ assist other modules, and does not do much on its own.
 
 import os
 import zipfile
+import collections
 from io import BytesIO
 
 try:
@@ -20,27 +21,380 @@ except ImportError:
     import configparser
     from io import StringIO
 
+try:
+    from collections.abc import Mapping
+
+except ImportError:
+    from collections import Mapping
+
 import pygame
 from hypatia.animatedsprite import AnimatedSprite
 
 
+class AssetCache(object):
+    """Assets (resources, tilesheets, parsed TMX, ...) shared
+    process-wide, keyed by (category, name), so that loading the
+    same asset twice decodes it only once.
+
+    Every acquire() of an asset should be paired with a release().
+    Assets which are no longer referenced are kept around, least
+    recently used first, until the memory budget is exceeded.
+
+    Attributes:
+        budget (int): Maximum number of bytes of unreferenced
+            assets to keep around.
+        bytes_used (int): Estimated bytes of all cached assets.
+        hits (int): How many acquire() calls found their asset
+            in the cache.
+        misses (int): How many acquire() calls had to load
+            their asset.
+        evictions (int): How many assets have been dropped to
+            stay within budget.
+
+    Example:
+        >>> cache = AssetCache(budget=0)
+        >>> data = cache.acquire('misc', 'data', lambda: b'1234')
+        >>> cache.acquire('misc', 'data', lambda: b'5678')
+        b'1234'
+        >>> cache.references('misc', 'data')
+        2
+        >>> cache.release('misc', 'data')
+        >>> cache.release('misc', 'data')
+        >>> ('misc', 'data') in cache
+        False
+        >>> cache.stats()['hits']
+        1
+
+    """
+
+    DEFAULT_BUDGET = 64 * 1024 * 1024
+
+    def __init__(self, budget=None):
+        """
+
+        Args:
+            budget (int|None): Bytes of unreferenced assets to keep
+                before evicting the least recently used ones.
+                Defaults to AssetCache.DEFAULT_BUDGET.
+
+        """
+
+        self.budget = (AssetCache.DEFAULT_BUDGET if budget is None
+                       else budget)
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # (category, name) -> [asset, references, bytes, size_of],
+        # least recently used first.
+        self._entries = collections.OrderedDict()
+
+    def __contains__(self, key):
+
+        return key in self._entries
+
+    def __len__(self):
+
+        return len(self._entries)
+
+    def acquire(self, category, name, loader, size_of=None):
+        """Return the asset stored under (category, name), loading
+        it with loader() first if it isn't cached, and add a
+        reference to it.
+
+        Args:
+            category (str): E.g., walkabouts, tilesheets.
+            name (str): E.g., debug.
+            loader (callable): Takes no arguments and returns
+                the asset.
+            size_of (callable|None): Takes the asset and returns
+                an estimate of its size in bytes. Defaults to
+                asset_bytes().
+
+        Returns:
+            object: the asset returned by loader(), now or
+                during an earlier acquire().
+
+        """
+
+        key = (category, name)
+
+        try:
+            entry = self._entries.pop(key)
+            self.hits += 1
+
+        except KeyError:
+            size_of = size_of or asset_bytes
+            asset = loader()
+            entry = [asset, 0, size_of(asset), size_of]
+            self.bytes_used += entry[2]
+            self.misses += 1
+
+        entry[1] += 1
+        self._entries[key] = entry
+        self.evict()
+
+        return entry[0]
+
+    def release(self, category, name):
+        """Remove a reference to the asset stored under
+        (category, name), making it evictable once it has
+        no references left.
+
+        Args:
+            category (str): --
+            name (str): --
+
+        Raises:
+            KeyError: the asset isn't cached, or it has
+                no references.
+
+        """
+
+        entry = self._entries[(category, name)]
+
+        if entry[1] < 1:
+
+            raise KeyError((category, name))
+
+        entry[1] -= 1
+
+        # the asset may have grown while it was in use,
+        # e.g., a Resource decoding more of its files.
+        size = entry[3](entry[0])
+        self.bytes_used += size - entry[2]
+        entry[2] = size
+        self.evict()
+
+    def references(self, category, name):
+        """Return how many references the asset stored under
+        (category, name) has, or 0 if it isn't cached.
+
+        """
+
+        entry = self._entries.get((category, name))
+
+        return entry[1] if entry else 0
+
+    def evict(self):
+        """Drop unreferenced assets, least recently used first,
+        until the bytes of unreferenced assets fit the budget.
+
+        """
+
+        unreferenced = [(key, entry) for key, entry in self._entries.items()
+                        if entry[1] == 0]
+        unreferenced_bytes = sum(entry[2] for key, entry in unreferenced)
+
+        for key, entry in unreferenced:
+
+            if unreferenced_bytes <= self.budget:
+
+                break
+
+            del self._entries[key]
+            unreferenced_bytes -= entry[2]
+            self.bytes_used -= entry[2]
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every asset, referenced or not, and reset
+        the statistics.
+
+        """
+
+        self._entries.clear()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """Return the cache statistics.
+
+        Returns:
+            dict: hits, misses, evictions, bytes_used, and
+                entries (the number of cached assets).
+
+        """
+
+        return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes_used': self.bytes_used,
+                'entries': len(self._entries),
+               }
+
+
+def asset_bytes(asset):
+    """Estimate how many bytes of memory an asset occupies.
+
+    Counts surface pixels (subsurfaces share their parent's
+    pixels and count as nothing), raw bytes and strings, numpy
+    arrays, the frames of AnimatedSprites, and the files of
+    Resources, as well as containers of the aforementioned.
+    Anything else counts as nothing.
+
+    Args:
+        asset (object): --
+
+    Returns:
+        int: --
+
+    Example:
+        >>> asset_bytes([pygame.Surface((4, 4), 0, 32), b'abc'])
+        67
+
+    """
+
+    if asset is None:
+
+        return 0
+
+    elif isinstance(asset, pygame.Surface):
+
+        if asset.get_parent() is not None:
+
+            return 0
+
+        return asset.get_pitch() * asset.get_height()
+
+    elif isinstance(asset, (bytes, bytearray, str)):
+
+        return len(asset)
+
+    elif hasattr(asset, 'nbytes'):
+
+        return int(asset.nbytes)
+
+    elif isinstance(asset, AnimatedSprite):
+
+        return sum(asset_bytes(frame.surface) for frame in asset.frames)
+
+    elif isinstance(asset, DirectoryFiles):
+
+        return asset_bytes(list(asset.loaded.values()))
+
+    elif isinstance(asset, Resource):
+
+        return (asset_bytes(asset.raw_files) +
+                asset_bytes(list(asset.decoded_files.values())))
+
+    elif isinstance(asset, dict):
+
+        return asset_bytes(list(asset.values()))
+
+    elif isinstance(asset, (list, tuple, set, frozenset)):
+
+        return sum(asset_bytes(item) for item in asset)
+
+    return 0
+
+
+class DirectoryFiles(Mapping):
+    """The files of an unpacked resource directory, by file name,
+    each read from disk the first time it's accessed, so files
+    which are never used (or which are memory-mapped from their
+    path instead, like tilemap.bin) are never read.
+
+    Attributes:
+        paths (dict): Key is file name, value is its path on disk.
+        loaded (dict): Key is file name, value is the untouched
+            file contents (bytes), of the files read so far.
+
+    Example:
+        >>> files = DirectoryFiles('resources/scenes')
+        >>> 'debug.tmx' in files
+        True
+        >>> files.loaded
+        {}
+        >>> files['debug.tmx'].startswith(b'<?xml')
+        True
+        >>> list(files.loaded)
+        ['debug.tmx']
+
+    """
+
+    def __init__(self, path):
+        """
+
+        Args:
+            path (str): the directory.
+
+        """
+
+        self.paths = {file_name: os.path.join(path, file_name)
+                      for file_name in os.listdir(path)}
+        self.loaded = {}
+
+    def __getitem__(self, file_name):
+
+        try:
+
+            return self.loaded[file_name]
+
+        except KeyError:
+            pass
+
+        with open(self.paths[file_name], "rb") as file_object:
+            file_data = file_object.read()
+
+        self.loaded[file_name] = file_data
+
+        return file_data
+
+    def __contains__(self, file_name):
+
+        return file_name in self.paths
+
+    def __iter__(self):
+
+        return iter(self.paths)
+
+    def __len__(self):
+
+        return len(self.paths)
+
+
 class Resource(object):
     """A zip archive in the resources directory, located by
     supplying a resource category and name. Files are stored
     as a str, BytesIO, PygAnimation, or ConfigParser, in a
     dictionary. Files are referenced by filepath/filename.
 
+    Files are only decoded (by their file handler) the first time
+    they're accessed, after which the decoded value is reused. The
+    files of an unpacked directory are only read then, too.
+
     Attributes:
-        files (dict): Key is file name, value can be one of str,
-            BytesIO, PygAnim, or ConfigParser objects.
+        file_handlers (dict): Key is a file extension, value is the
+            function which decodes files with that extension.
+        raw_files (dict|DirectoryFiles): Key is file name, value is
+            the untouched file contents (bytes); a DirectoryFiles,
+            which reads files on first access, if the resource is
+            an unpacked directory.
+        decoded_files (dict): Like `files`, but only containing the
+            files which have been accessed (decoded) so far.
+        extensions (dict): Key is a file extension (including the
+            dot), value is a list of the file names with it.
+        path (str): Path to the unpacked directory or zip archive
+            the files were loaded from.
+        is_directory (bool): True if the resource was loaded from
+            an unpacked directory, rather than a zip archive.
 
     Example:
         >>> from hypatia import animatedsprite as anim
         >>> resource = Resource('walkabouts', 'debug')
         >>> 'only.gif' in resource
         True
+        >>> 'only.gif' in resource.decoded_files
+        False
         >>> isinstance(resource['only.gif'], anim.AnimatedSprite)
         True
+        >>> resource['only.gif'] is resource['only.gif']
+        True
         >>> resource = Resource('scenes', 'debug')
         >>> resource['tilemap.txt'].startswith('debug')
         True
@@ -72,34 +426,29 @@ class Resource(object):
 
         # Once files have been collected from the aforementioned
         # path, the files will be passed through their respective
-        # file_handler, if available for the given file extension.
-        file_handlers = {
-                         '.ini': load_ini,
-                         '.gif': load_gif,
-                         '.png': load_png,
-                         '.txt': load_txt,
-                        }
-
-        # 1. Create a dictionary, where the key is the file name
-        # (including extension) and the value is the result
-        # of using x.open(path).read().
-        files = {}
+        # file_handler when accessed, if available for the given
+        # file extension.
+        self.file_handlers = {
+                              '.ini': load_ini,
+                              '.gif': load_gif,
+                              '.png': load_png,
+                              '.txt': load_txt,
+                             }
 
         # choose between loading as an unpacked directory, or a zip file.
         # unpacked takes priority.
         if os.path.isdir(path):
 
-            # go through each file in the supplied path, making an
-            # entry in the files dictionary, whose value is the
-            # file data (bytesio) and key is file name.
-            for file_name in os.listdir(path):
-                file_path = os.path.join(path, file_name)
-                file_data = open(file_path, "rb").read()
-
-                files[file_name] = file_data
+            # each file is only read from the directory when it's
+            # first accessed; see DirectoryFiles.
+            files = DirectoryFiles(path)
 
         # we're dealing with a zip file for our resources
         else:
+            # Create a dictionary, where the key is the file name
+            # (including extension) and the value is the result
+            # of using x.open(path).read().
+            files = {}
 
             with zipfile.ZipFile(path + ".zip") as zip_file:
 
@@ -114,31 +463,90 @@ class Resource(object):
                     file_data = zip_file.open(file_name).read()
                     files[file_name] = file_data
 
-        # 2. "Prepare" the "raw file data" from the files
-        # dictionary we just created. If a given file's
-        # file extension is in file_handlers, the data
-        # will be updated by an associated function.
-        for file_name in files.keys():
-            file_data = files[file_name]
+        # Index the file names by extension, so get_type() only
+        # has to decode the files it actually returns.
+        extensions = {}
+
+        for file_name in sorted(files):
             file_extension = os.path.splitext(file_name)[1]
+            extensions.setdefault(file_extension, []).append(file_name)
 
-            # if there is a known "handler" for this extension,
-            # we want the file data for this file to be the output
-            # of said handler
-            if file_extension in file_handlers:
-                file_data = file_handlers[file_extension](files, file_name)
+        self.raw_files = files
+        self.decoded_files = {}
+        self.extensions = extensions
+        self.is_directory = os.path.isdir(path)
+        self.path = path if self.is_directory else path + '.zip'
 
-            files[file_name] = file_data
+    @property
+    def files(self):
+        """dict: Key is file name, value can be one of str, BytesIO,
+        PygAnim, or ConfigParser objects.
 
-        self.files = files
+        Warning:
+            This decodes every file in the resource. Prefer
+            indexing the resource, or get_type().
+
+        """
+
+        return {file_name: self[file_name] for file_name in self.raw_files}
+
+    def file_path(self, file_name):
+        """Return the path of a file on disk, e.g., for
+        memory-mapping it.
+
+        Args:
+            file_name (str): --
+
+        Returns:
+            str|None: None if the resource is a zip archive,
+                because then its files aren't on disk.
+
+        """
+
+        if self.is_directory:
+
+            return os.path.join(self.path, file_name)
+
+        return None
 
     def __getitem__(self, file_name):
+        """Return the decoded contents of a file, decoding it
+        with its file handler on first access.
+
+        Args:
+            file_name (str): --
+
+        Returns:
+            str|BytesIO|AnimatedSprite|ConfigParser|bytes: the output
+                of the file handler for this file's extension, or the
+                untouched file contents if there is no handler.
+
+        """
+
+        try:
+
+            return self.decoded_files[file_name]
+
+        except KeyError:
+            pass
+
+        file_data = self.raw_files[file_name]
+        file_extension = os.path.splitext(file_name)[1]
+
+        # if there is a known "handler" for this extension,
+        # we want the file data for this file to be the output
+        # of said handler
+        if file_extension in self.file_handlers:
+            handler = self.file_handlers[file_extension]
+            file_data = handler(self.raw_files, file_name)
+
+        self.decoded_files[file_name] = file_data
 
-        return self.files[file_name]
+        return file_data
 
     def __contains__(self, item):
 
-        return item in self.files
+        return item in self.raw_files
 
     def get_type(self, file_extension):
         """Return a dictionary of files which have the file extension
@@ -160,10 +568,8 @@ class Resource(object):
 
         matching_files = {}
 
-        for file_name, file_content in self.files.items():
-
-            if os.path.splitext(file_name)[1] == file_extension:
-                matching_files[file_name] = file_content
+        for file_name in self.extensions.get(file_extension, ()):
+            matching_files[file_name] = self[file_name]
 
         return matching_files or None
 
@@ -182,7 +588,7 @@ def load_png(files, file_name):
         AnimatedSprite: --
 
     See Also:
-        * Resources.__init__()
+        * Resource.__getitem__()
         * animations.AnimatedSprite
 
     """
@@ -205,7 +611,7 @@ def load_txt(files, file_name):
         AnimatedSprite: --
 
     See Also:
-        * Resources.__init__()
+        * Resource.__getitem__()
         * animations.AnimatedSprite
 
     """
@@ -227,7 +633,7 @@ def load_gif(files, file_name):
         AnimatedSprite: --
 
     See Also:
-        * Resources.__init__()
+        * Resource.__getitem__()
         * animations.AnimatedSprite
 
     """
@@ -274,7 +680,7 @@ def load_ini(files, file_name):
         ConfigParser: --
 
     See Also:
-        Resources.__init__()
+        Resource.__getitem__()
 
     """
 
@@ -291,3 +697,45 @@ def load_ini(files, file_name):
     config.readfp(file_data)
 
     return config
+
+
+def load_resource(resource_category, resource_name):
+    """Acquire a Resource through the process-wide asset cache,
+    so each resource is only read (and its files decoded) once.
+
+    Pair with release_resource().
+
+    Args:
+        resource_category (str): E.g., tilesheets, walkabouts.
+        resource_name (str): E.g., debug.
+
+    Returns:
+        Resource: --
+
+    Example:
+        >>> resource = load_resource('walkabouts', 'debug')
+        >>> resource is load_resource('walkabouts', 'debug')
+        True
+        >>> release_resource('walkabouts', 'debug')
+        >>> release_resource('walkabouts', 'debug')
+
+    """
+
+    return assets.acquire(resource_category, resource_name,
+                          lambda: Resource(resource_category, resource_name))
+
+
+def release_resource(resource_category, resource_name):
+    """Release a Resource acquired with load_resource().
+
+    Args:
+        resource_category (str): --
+        resource_name (str): --
+
+    """
+
+    assets.release(resource_category, resource_name)
+
+
+# The process-wide asset cache; see AssetCache.
+assets = AssetCache()
@@ -0,0 +1,385 @@
+# This module is part of Hypatia and is released under the
+# MIT License: http://opensource.org/licenses/MIT
+
+"""Generate large synthetic scenes, for seeing how things scale.
+
+The demo scenes are tiny. Scenes generated here can be any size,
+with any number of layers and NPCs, using the tiles of an existing
+tilesheet (demo's debug, by default) and existing walkabouts. They
+are written as TMX files and/or native scene resources, so they
+load like any other scene, e.g., for hypatia.bench.
+
+Run from a directory with a resources directory, e.g., demo:
+
+    $ cd demo
+    $ python -m hypatia.scenegen big --width 1024 --height 1024 \\
+          --layers 3 --npcs 1000
+    $ python -m hypatia.bench --scene big
+
+"""
+
+import os
+import sys
+import argparse
+from xml.sax.saxutils import quoteattr
+
+import numpy
+
+from hypatia import game
+from hypatia import tiles
+from hypatia import player
+from hypatia import sprites
+
+
+# chance of a passable tile on each cell of layers above the
+# obstacle layer (layer 1), so every layer has something to blit
+DECOR_DENSITY = 0.1
+
+NPC_SAY_TEXT = 'Hello, world!'
+
+
+class NotEnoughRoom(ValueError):
+    """There are more NPCs than passable cells to put them on.
+
+    """
+
+    def __init__(self, npc_count, free_cells):
+        """
+
+        Args:
+            npc_count (int): --
+            free_cells (int): passable cells, not counting the
+                player's.
+
+        """
+
+        message = ('%d NPCs, but only %d passable cells for them'
+                   % (npc_count, free_cells))
+        super(NotEnoughRoom, self).__init__(message)
+
+
+class SyntheticScene(object):
+    """A generated scene; see generate().
+
+    Attributes:
+        tilesheet_name (str): --
+        tile_size (tuple): (x, y) pixel dimensions of a tile.
+        tilesheet_size (tuple): (x, y) pixel dimensions of the
+            tilesheet image, for the TMX tileset.
+        tile_ids (numpy.ndarray): int32 array of shape (depth,
+            height, width), like TileMap.tile_ids; -1 is air.
+        player_start_position (tuple): (x, y) pixel coordinates.
+        npcs (list[tuple]): (walkabout name, (x, y) pixel
+            coordinates) of each NPC.
+
+    """
+
+    def __init__(self, tilesheet_name, tile_size, tilesheet_size,
+                 tile_ids, player_start_position, npcs):
+
+        self.tilesheet_name = tilesheet_name
+        self.tile_size = tile_size
+        self.tilesheet_size = tilesheet_size
+        self.tile_ids = tile_ids
+        self.player_start_position = player_start_position
+        self.npcs = npcs
+
+    def to_scene(self):
+        """Create the Scene directly, without writing it first.
+
+        Returns:
+            game.Scene: --
+
+        """
+
+        tilemap = tiles.TileMap(self.tilesheet_name, self.tile_ids)
+        npcs = [player.Npc(walkabout=sprites.Walkabout(name, position),
+                           say_text=NPC_SAY_TEXT)
+                for name, position in self.npcs]
+        human_player = game.Scene.create_human_player(
+            self.player_start_position)
+
+        return game.Scene(tilemap=tilemap,
+                          player_start_position=self.player_start_position,
+                          human_player=human_player,
+                          npcs=npcs)
+
+    def to_tmx(self):
+        """Create a TMX (Tiled editor) map of this scene, which
+        game.TMX can read.
+
+        Returns:
+            str: --
+
+        """
+
+        depth, height, width = self.tile_ids.shape
+        tile_width, tile_height = self.tile_size
+        image_width, image_height = self.tilesheet_size
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<map version="1.0" orientation="orthogonal" '
+                 'renderorder="right-down" width="%d" height="%d" '
+                 'tilewidth="%d" tileheight="%d">'
+                 % (width, height, tile_width, tile_height),
+                 ' <tileset firstgid="1" name=%s tilewidth="%d" '
+                 'tileheight="%d">'
+                 % (quoteattr(self.tilesheet_name), tile_width,
+                    tile_height),
+                 '  <image source="%s.png" width="%d" height="%d"/>'
+                 % (self.tilesheet_name, image_width, image_height),
+                 ' </tileset>']
+
+        for z, layer in enumerate(self.tile_ids):
+            lines.append(' <layer name="Tile Layer %d" width="%d" '
+                         'height="%d">' % (z + 1, width, height))
+            lines.append('  <data encoding="csv">')
+
+            # TMX tile IDs start at 1, and 0 is air
+            rows = [','.join(map(str, row)) for row in (layer + 1).tolist()]
+            lines.append(',\n'.join(rows))
+            lines.append('</data>')
+            lines.append(' </layer>')
+
+        lines.append(' <objectgroup name="Object Layer 1">')
+        lines.append('  <object id="1" type="player_start_position" '
+                     'x="%d" y="%d" width="%d" height="%d"/>'
+                     % (self.player_start_position + self.tile_size))
+
+        for object_id, (walkabout, position) in enumerate(self.npcs, 2):
+            lines.append('  <object id="%d" type="npc" x="%d" y="%d" '
+                         'width="%d" height="%d">'
+                         % ((object_id,) + position + self.tile_size))
+            lines.append('   <properties>')
+            lines.append('    <property name="say" value=%s/>'
+                         % quoteattr(NPC_SAY_TEXT))
+            lines.append('    <property name="walkabout" value=%s/>'
+                         % quoteattr(walkabout))
+            lines.append('   </properties>')
+            lines.append('  </object>')
+
+        lines.append(' </objectgroup>')
+        lines.append('</map>')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_tmx(self, path):
+        """Write to_tmx() to path, e.g., resources/scenes/big.tmx.
+
+        Args:
+            path (str): --
+
+        """
+
+        with open(path, 'w') as tmx_file:
+            tmx_file.write(self.to_tmx())
+
+    def write_resource(self, path, binary=True, compress=False):
+        """Write this scene as a native scene resource directory,
+        e.g., resources/scenes/big, which Scene.from_resource()
+        can load.
+
+        Args:
+            path (str): the directory, which is created if need be.
+            binary (bool): write tilemap.bin, rather than the much
+                bigger and slower to load tilemap.txt.
+            compress (bool): zlib compress tilemap.bin; see
+                TileMap.to_binary().
+
+        """
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        with open(os.path.join(path, 'scene.ini'), 'w') as scene_ini:
+            scene_ini.write('[general]\n'
+                            'player_start_x=%d\n'
+                            'player_start_y=%d\n'
+                            % self.player_start_position)
+
+        with open(os.path.join(path, 'npcs.ini'), 'w') as npcs_ini:
+
+            for i, (walkabout, position) in enumerate(self.npcs):
+                npcs_ini.write('[npc%d]\n'
+                               'walkabout=%s\n'
+                               'position_x=%d\n'
+                               'position_y=%d\n'
+                               'say=%s\n\n'
+                               % ((i, walkabout) + position +
+                                  (NPC_SAY_TEXT,)))
+
+        if binary:
+            data = tiles.tile_ids_to_binary(self.tilesheet_name,
+                                            self.tile_ids, compress)
+
+            with open(os.path.join(path, 'tilemap.bin'), 'wb') as bin_file:
+                bin_file.write(data)
+
+        else:
+            layers = ['\n'.join(' '.join(map(str, row))
+                                for row in layer.tolist())
+                      for layer in self.tile_ids]
+
+            with open(os.path.join(path, 'tilemap.txt'), 'w') as txt_file:
+                txt_file.write(self.tilesheet_name + '\n')
+                txt_file.write('\n\n'.join(layers) + '\n')
+
+
+def generate(width, height, layers=2, animated_density=0.01,
+             impassable_density=0.1, npc_count=0, seed=0,
+             tilesheet_name='debug', walkabouts=('debug',)):
+    """Generate a scene of random tiles from a tilesheet.
+
+    Layer 0 is passable ground, some of it animated. Layer 1 has
+    the impassable tiles (layer 0 does, if it's the only layer).
+    Any other layers are sparse passable decoration. The human
+    player starts in the middle, and NPCs stand on random passable
+    cells, one per cell.
+
+    Args:
+        width (int): in tiles.
+        height (int): in tiles.
+        layers (int): --
+        animated_density (float): 0 to 1; the chance of a ground
+            tile being animated.
+        impassable_density (float): 0 to 1; the chance of a cell
+            being impassable.
+        npc_count (int): --
+        seed (int): the same seed (and arguments) always generates
+            the same scene.
+        tilesheet_name (str): whose tiles (and flags, animations) to
+            use; it's loaded through the asset cache.
+        walkabouts (tuple[str]): walkabout names the NPCs use, in
+            turn.
+
+    Returns:
+        SyntheticScene: --
+
+    Raises:
+        NotEnoughRoom: --
+
+    Example:
+        >>> scene = generate(8, 6, layers=3, npc_count=4)
+        >>> scene.tile_ids.shape
+        (3, 6, 8)
+        >>> scene.player_start_position
+        (40, 30)
+        >>> len(scene.npcs)
+        4
+
+    """
+
+    tilesheet = tiles.Tilesheet.acquire(tilesheet_name)
+    tile_size = tilesheet.tile_size
+    tilesheet_size = tilesheet.surface.get_size()
+    impassable_bit = tilesheet.flag_bits.get('impass_all', 0)
+    impassable_table = (tilesheet.flag_masks & impassable_bit).astype(bool)
+
+    all_ids = numpy.arange(len(impassable_table) - 1)
+    impassable_ids = all_ids[impassable_table[:-1]]
+    animated_ids = numpy.array([tile_id for tile_id
+                                in sorted(tilesheet.animated_tiles)
+                                if not impassable_table[tile_id]],
+                               dtype=numpy.int32)
+    passable_ids = numpy.setdiff1d(all_ids[~impassable_table[:-1]],
+                                   animated_ids)
+    tiles.Tilesheet.release(tilesheet_name)
+
+    random = numpy.random.RandomState(seed)
+    tile_ids = numpy.full((layers, height, width), -1, dtype=numpy.int32)
+    tile_ids[0] = random.choice(passable_ids, (height, width))
+
+    if animated_ids.size:
+        animated = random.random_sample((height, width)) < animated_density
+        tile_ids[0][animated] = random.choice(animated_ids,
+                                              int(animated.sum()))
+
+    obstacle_layer = min(1, layers - 1)
+    impassable = numpy.zeros((height, width), dtype=bool)
+
+    if impassable_ids.size:
+        impassable = (random.random_sample((height, width)) <
+                      impassable_density)
+        tile_ids[obstacle_layer][impassable] = random.choice(
+            impassable_ids, int(impassable.sum()))
+
+    for z in range(2, layers):
+        decor = random.random_sample((height, width)) < DECOR_DENSITY
+        tile_ids[z][decor] = random.choice(passable_ids, int(decor.sum()))
+
+    # the player starts in the middle, which is always passable
+    start_x, start_y = width // 2, height // 2
+
+    if impassable[start_y, start_x]:
+        impassable[start_y, start_x] = False
+        clear_tile = -1 if obstacle_layer else passable_ids[0]
+        tile_ids[obstacle_layer][start_y, start_x] = clear_tile
+
+    free_cells = numpy.flatnonzero(~impassable)
+    free_cells = free_cells[free_cells != start_y * width + start_x]
+
+    if npc_count > free_cells.size:
+
+        raise NotEnoughRoom(npc_count, free_cells.size)
+
+    npc_cells = random.choice(free_cells, npc_count, replace=False)
+    tile_width, tile_height = tile_size
+    npcs = [(walkabouts[i % len(walkabouts)],
+             (int(cell % width) * tile_width,
+              int(cell // width) * tile_height))
+            for i, cell in enumerate(npc_cells)]
+    player_start_position = (start_x * tile_width, start_y * tile_height)
+
+    return SyntheticScene(tilesheet_name, tile_size, tilesheet_size,
+                          tile_ids, player_start_position, npcs)
+
+
+def main(argv=None):
+    """Command line entry point; see the module docstring."""
+
+    parser = argparse.ArgumentParser(prog='python -m hypatia.scenegen',
+                                     description=__doc__.split('\n')[0])
+    parser.add_argument('name', help='scene resource name to write')
+    parser.add_argument('--width', type=int, default=64,
+                        help='in tiles (default: 64)')
+    parser.add_argument('--height', type=int, default=64,
+                        help='in tiles (default: 64)')
+    parser.add_argument('--layers', type=int, default=2)
+    parser.add_argument('--animated', type=float, default=0.01,
+                        help='animated tile density (default: 0.01)')
+    parser.add_argument('--impassable', type=float, default=0.1,
+                        help='impassable tile density (default: 0.1)')
+    parser.add_argument('--npcs', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tilesheet', default='debug')
+    parser.add_argument('--walkabouts', default='debug',
+                        help='comma separated (default: debug)')
+    parser.add_argument('--format', choices=('resource', 'tmx', 'both'),
+                        default='resource')
+    parser.add_argument('--text', action='store_true',
+                        help='write tilemap.txt, not tilemap.bin')
+    parser.add_argument('--compress', action='store_true',
+                        help='zlib compress tilemap.bin')
+    parser.add_argument('--directory',
+                        default=os.path.join('resources', 'scenes'))
+    args = parser.parse_args(argv)
+
+    scene = generate(args.width, args.height, args.layers,
+                     args.animated, args.impassable, args.npcs,
+                     args.seed, args.tilesheet,
+                     tuple(args.walkabouts.split(',')))
+    path = os.path.join(args.directory, args.name)
+
+    if args.format in ('resource', 'both'):
+        scene.write_resource(path, binary=not args.text,
+                             compress=args.compress)
+        sys.stdout.write(path + '\n')
+
+    if args.format in ('tmx', 'both'):
+        scene.write_tmx(path + '.tmx')
+        sys.stdout.write(path + '.tmx\n')
+
+    return scene
+
+
+if __name__ == '__main__':
+    main()
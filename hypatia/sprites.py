@@ -31,18 +31,17 @@ See Also:
 """
 
 import os
-import copy
-import itertools
-import collections
 
 try:
     import ConfigParser as configparser
 except ImportError:
     import configparser
 
+import numpy
 import pygame
 from PIL import Image
 
+from hypatia import render
 from hypatia import constants
 from hypatia import resources
 from hypatia import animatedsprite
@@ -81,6 +80,62 @@ class BadWalkabout(Exception):
         self.failed_name = failed_name
 
 
+class TooManyColors(Exception):
+    """Sprites have more colors than fit an 8-bit palette, so
+    they can't be indexed for palette variants.
+
+    Attributes:
+        colors (int): How many (opaque) colors were found.
+
+    See Also:
+        * index_clips()
+
+    """
+
+    def __init__(self, colors):
+        """
+
+        Args:
+            colors (int): How many (opaque) colors were found.
+
+        """
+
+        message = "%d colors, but a palette only fits %d" % (
+            colors, INDEXED_COLORS)
+        super(TooManyColors, self).__init__(message)
+        self.colors = colors
+
+
+class UnknownPalette(Exception):
+    """A Walkabout palette variant was asked for by name, but the
+    walkabout's palettes.ini has no such section (or the walkabout
+    has no palettes.ini at all).
+
+    Attributes:
+        walkabout_name (str): --
+        palette_name (str): --
+
+    See Also:
+        * Walkabout.__init__()
+
+    """
+
+    def __init__(self, walkabout_name, palette_name):
+        """
+
+        Args:
+            walkabout_name (str): --
+            palette_name (str): --
+
+        """
+
+        message = "walkabout %s has no palette named %s" % (
+            walkabout_name, palette_name)
+        super(UnknownPalette, self).__init__(message)
+        self.walkabout_name = walkabout_name
+        self.palette_name = palette_name
+
+
 class Walkabout(pygame.sprite.Sprite):
     """Sprite animations for a character which walks around.
 
@@ -94,6 +149,11 @@ class Walkabout(pygame.sprite.Sprite):
 
     Attributes:
         resource (Resource): --
+        resource_name (str): the walkabout resource's name; see
+            Walkabout.release().
+        palette (bytes|None): The palette set on the (8-bit) frames
+            when they're blitted, if this is a palette variant,
+            packed like palette_variant() returns it.
         animations (dict): 2D dictionary [action][direction] whose
             values are PygAnimations.
         animation_anchors (dict): 2D dictionary [action][direction]
@@ -111,7 +171,8 @@ class Walkabout(pygame.sprite.Sprite):
 
     """
 
-    def __init__(self, directory, position=None, children=None):
+    def __init__(self, directory, position=None, children=None,
+                 palette=None):
         """
 
         Args:
@@ -121,11 +182,29 @@ class Walkabout(pygame.sprite.Sprite):
                 referring to absolute pixel coordinate.
             children (list|None): Walkabout objects drawn relative to
                 this Walkabout instance.
+            palette (str|dict|None): Load the walkabout as 8-bit
+                indexed frames, shared by every palette variant of
+                this walkabout, and recolor them with this palette
+                variant. Either the name of a section in the
+                walkabout's palettes.ini, or a dictionary, whose keys
+                are original colors and values are the colors which
+                replace them. Colors are anything pygame.Color()
+                accepts, e.g., "#ff0000" or (255, 0, 0). An empty
+                dictionary keeps the original colors.
 
         Example:
             >>> debug = Walkabout('debug')
             >>> Walkabout('debug', position=(44, 55), children=[debug])
             <Walkabout sprite(in ... groups)>
+            >>> red = Walkabout('debug', palette={'#000000': '#ff0000'})
+            >>> red = Walkabout('slime', palette='red')
+            >>> len(red.palette)
+            12
+
+        Raises:
+            BadWalkabout: the resource has no GIFs.
+            UnknownPalette: palette is a name, which isn't a
+                section of the walkabout's palettes.ini.
 
         """
 
@@ -143,16 +222,47 @@ class Walkabout(pygame.sprite.Sprite):
 
         topleft_float = (float(position[0]), float(position[1]))
 
-        # specify the files to load
-        # how will i glob a resource
-        resource = resources.Resource('walkabouts', directory)
+        # specify the files to load. The resource (and thus its
+        # decoded GIFs) is shared by every Walkabout using it.
+        resource = resources.load_resource('walkabouts', directory)
         sprite_files = resource.get_type('.gif')
 
         # no sprites matching pattern!
         if not sprite_files:
+            resources.release_resource('walkabouts', directory)
 
             raise BadWalkabout(directory)
 
+        # palette variants share 8-bit versions of the clips, so
+        # each variant is just a palette.
+        if palette is None:
+            indexed_clips = None
+            self.palette = None
+
+        else:
+
+            if not isinstance(palette, dict):
+                palette_name = palette
+
+                try:
+                    palettes_ini = resource['palettes.ini']
+                    palette = dict(palettes_ini.items(palette_name))
+
+                except (KeyError, configparser.NoSectionError):
+                    resources.release_resource('walkabouts', directory)
+
+                    raise UnknownPalette(directory, palette_name)
+
+            base_palette, indexed_clips = resources.assets.acquire(
+                'indexed walkabouts',
+                directory,
+                lambda: index_clips([sprite_files[sprite_path].clip
+                                     for sprite_path in sprite_files]),
+                size_of=indexed_clips_bytes
+            )
+
+            self.palette = palette_variant(base_palette, palette)
+
         for sprite_path in sprite_files.keys():
             file_name, file_ext = os.path.splitext(sprite_path)
             file_name = os.path.split(file_name)[1]
@@ -169,8 +279,15 @@ class Walkabout(pygame.sprite.Sprite):
             self.actions.append(action)
             self.directions.append(direction)
 
-            # load pyganim from gif file
-            animation = sprite_files[sprite_path]
+            # load pyganim from gif file. The clip is shared
+            # with the cached resource, but the animation state
+            # belongs to this Walkabout alone.
+            clip = sprite_files[sprite_path].clip
+
+            if indexed_clips:
+                clip = indexed_clips[clip]
+
+            animation = animatedsprite.AnimatedSprite(clip)
 
             try:
                 self.animations[action][direction] = animation
@@ -202,6 +319,7 @@ class Walkabout(pygame.sprite.Sprite):
 
         # ... set the rest of the attribs
         self.resource = resource
+        self.resource_name = directory
 
         # NOTE: this is lazy and results in smaller frames
         # having a bunch of "padding"
@@ -297,6 +415,28 @@ class Walkabout(pygame.sprite.Sprite):
             loop iteration, and animations are advanced by
             getting the difference between two ticks.
 
+        See Also:
+            * Walkabout.draw_list()
+
+        """
+
+        blit_draw_list(screen, self.draw_list(clock, screen, offset))
+
+    def draw_list(self, clock, screen, offset):
+        """Update the active animations (this Walkabout's and its
+        children's) and return what to blit, and where, without
+        blitting it.
+
+        Args:
+            clock (pygame.time.Clock): See Walkabout.blit().
+            screen (pygame.Surface): See Walkabout.blit().
+            offset (x, y tuple): See Walkabout.blit().
+
+        Returns:
+            list[tuple]: (surface, (x, y) position on screen,
+                palette or None) tuples, in the order to blit them;
+                see blit_draw_list().
+
         """
 
         # `position_on_screen` is the Walkabout sprite's
@@ -318,10 +458,16 @@ class Walkabout(pygame.sprite.Sprite):
         # See: Walkabout.update()
         self.update(clock, screen, offset)
 
-        # Blit the current image for this Walkabout to the
+        # The current image for this Walkabout is blitted to the
         # supplied viewport surface (`screen`) at the supplied
         # `position_on_screen`, which we figured out earlier.
-        screen.blit(self.image, position_on_screen)
+        draws = [(self.image, position_on_screen, self.palette)]
+
+        # Walkabouts without children (e.g., a door) may not
+        # have anchors at all.
+        if not self.child_walkabouts:
+
+            return draws
 
         # Render and update child walkabouts. Render a child
         # Walkabout so that its head anchor occupies the same
@@ -361,86 +507,323 @@ class Walkabout(pygame.sprite.Sprite):
             # position by subtracting the child's anchor from
             # the adjusted parent anchor.
             child_position = (parent_anchor - child_frame_anchor).as_tuple()
-            screen.blit(child_active_anim.image, child_position)
+            draws.append((child_active_anim.image, child_position,
+                          child_walkabout.palette))
 
-    def runtime_setup(self):
+        return draws
+
+    def release(self):
+        """Release this Walkabout's (and its children's) reference
+        to its resource in the asset cache. Call this once the
+        Walkabout is no longer used.
+
+        See Also:
+            * resources.AssetCache
+
+        """
+
+        resources.release_resource('walkabouts', self.resource_name)
+
+        if self.palette:
+            resources.assets.release('indexed walkabouts', self.resource_name)
+
+        for walkabout_child in self.child_walkabouts:
+            walkabout_child.release()
+
+    def runtime_setup(self, conversion=None):
         """Perform actions to setup the walkabout. Actions performed
         once pygame is running and walkabout has been initialized.
 
-        Convert and play all the animations, run init for children.
+        Convert every animation, for every action and direction, to
+        the display format, and run init for children.
 
-        Note:
-            It MAY be bad to leave the sprites in play mode in startup
-            by default.
+        Args:
+            conversion (render.ConversionPass|None): The pass to
+                convert surfaces with, so surfaces shared with other
+                walkabouts are only converted once. A new pass is
+                used if None.
 
         """
 
-        if len(self.animations) == 1:
-            actions = (constants.Action.stand,)
-            directions = (constants.Direction.south,)
+        conversion = conversion or render.ConversionPass()
+        converted = set()
 
-        else:
-            actions = (constants.Action.walk, constants.Action.stand)
-            directions = (constants.Direction.north, constants.Direction.south,
-                          constants.Direction.east, constants.Direction.west)
+        for animations in self.animations.values():
+
+            for animated_sprite in animations.values():
 
-        for action in actions:
+                if id(animated_sprite) not in converted:
+                    animated_sprite.convert_alpha(conversion)
+                    converted.add(id(animated_sprite))
 
-            for direction in directions:
-                animated_sprite = self.animations[action][direction]
-                animated_sprite.convert_alpha()
+        self.image = self.current_animation().image
 
         for walkabout_child in self.child_walkabouts:
-            walkabout_child.runtime_setup()
+            walkabout_child.runtime_setup(conversion)
 
 
-def palette_cycle(surface):
-    """get_palette is not sufficient; it generates superflous colors.
+def blit_draw_list(surface, draws):
+    """Blit what Walkabout.draw_list() returned onto surface.
+
+    The draws are blitted in batches; see render.blit_batch().
+    Palette variants share their frames, so a frame is recolored
+    right before it's blitted, which ends the batch before it.
 
-    Note:
-      Need to see if I can convert 32bit alpha to 8 bit temporarily,
-      to be converted back at end of palette/color manipulations.
+    Args:
+        surface (pygame.Surface): --
+        draws (list[tuple]): (surface, (x, y), palette or None),
+            e.g., the draw lists of several walkabouts, joined.
 
     """
 
-    original_surface = surface.copy()  # don't touch! used for later calc
-    width, height = surface.get_size()
-    ordered_color_list = []
-    seen_colors = set()
+    blits = []
 
-    for coordinate in itertools.product(range(0, width), range(0, height)):
-        color = surface.get_at(coordinate)
-        color = tuple(color)
+    for image, position, palette in draws:
 
-        if color in seen_colors:
+        if palette:
+            render.blit_batch(surface, blits)
+            blits = []
+            image.set_palette(palette_colors(palette))
 
-            continue
+        blits.append((image, position))
 
-        ordered_color_list.append(color)
-        seen_colors.add(color)
+    render.blit_batch(surface, blits)
 
-    # reverse the color list but not the pixel arrays, then replace!
-    old_color_list = collections.deque(ordered_color_list)
-    new_surface = surface.copy()
-    frames = []
 
-    for rotation_i in range(len(ordered_color_list)):
-        new_surface = new_surface.copy()
+def draw_list_rect(draws):
+    """Return the area covered by what Walkabout.draw_list()
+    returned.
 
-        new_color_list = copy.copy(old_color_list)
-        new_color_list.rotate(1)
+    Args:
+        draws (list[tuple]): (surface, (x, y), palette or None).
 
-        color_translations = dict(zip(old_color_list, new_color_list))
+    Returns:
+        pygame.Rect: --
 
-        # replace each former color with the color from newcolor_list
-        for coordinate in itertools.product(range(0, width), range(0, height)):
-            color = new_surface.get_at(coordinate)
-            color = tuple(color)
-            new_color = color_translations[color]
-            new_surface.set_at(coordinate, new_color)
+    """
+
+    rects = [pygame.Rect(position, image.get_size())
+             for image, position, palette in draws]
+
+    return rects[0].unionall(rects[1:])
+
+
+# How many colors an indexed (8-bit) surface's palette has. Index 0
+# is always the transparent colorkey.
+INDEXED_COLORS = 256
+
+
+def index_clips(clips):
+    """Make 8-bit indexed versions of animation clips, which all
+    share one palette, e.g., for recoloring with palette_variant().
+
+    Transparent pixels become index 0, which is the colorkey.
+    Translucent pixels become opaque.
+
+    Args:
+        clips (list[animatedsprite.AnimationClip]): Clips whose
+            frames all have the same (32-bit) pixel format.
+
+    Returns:
+        tuple: (palette, {clip: indexed clip}), where palette is
+            a list of (r, g, b) tuples.
+
+    Raises:
+        TooManyColors: the clips have more than 255 opaque colors.
+
+    """
+
+    frames = [frame for clip in clips for frame in clip.frames]
+    format_surface = frames[0].surface
+    alpha_mask = format_surface.get_masks()[3]
+    pixel_arrays = [pygame.surfarray.array2d(frame.surface).
+                    astype(numpy.uint32) for frame in frames]
+
+    # the palette is every opaque color in every frame
+    all_pixels = numpy.concatenate([pixels.ravel()
+                                    for pixels in pixel_arrays])
+
+    if alpha_mask:
+        all_pixels = all_pixels[(all_pixels & alpha_mask) != 0]
+
+    colors = numpy.unique(all_pixels)
+
+    if len(colors) >= INDEXED_COLORS:
+
+        raise TooManyColors(len(colors))
+
+    palette = [(0, 0, 0)]
+    palette.extend(tuple(format_surface.unmap_rgb(int(color)))[:3]
+                   for color in colors)
+
+    indexed_surfaces = {}
+
+    for frame, pixels in zip(frames, pixel_arrays):
+        indexes = numpy.searchsorted(colors, pixels) + 1
+
+        if alpha_mask:
+            indexes[(pixels & alpha_mask) == 0] = 0
+
+        surface = pygame.Surface(frame.surface.get_size(), 0, 8)
+        surface.set_palette(palette)
+        pygame.surfarray.blit_array(surface, indexes.astype(numpy.uint8))
+        surface.set_colorkey(0)
+        indexed_surfaces[frame] = surface
+
+    indexed_clips = {}
+
+    for clip in clips:
+        indexed_frames = [animatedsprite.Frame(indexed_surfaces[frame],
+                                               frame.start_time,
+                                               frame.duration,
+                                               frame.anchors)
+                          for frame in clip.frames]
+        indexed_clips[clip] = animatedsprite.AnimationClip(indexed_frames)
+
+    return palette, indexed_clips
+
+
+def indexed_clips_bytes(indexed):
+    """Estimate the bytes of memory occupied by the result of
+    index_clips(), for the asset cache.
+
+    """
+
+    palette, indexed_clips = indexed
+
+    return resources.asset_bytes([frame.surface
+                                  for clip in indexed_clips.values()
+                                  for frame in clip.frames])
+
+
+def palette_variant(palette, replacements):
+    """Return a copy of a palette with some of its colors replaced,
+    packed as three bytes (red, green, blue) per color, so a
+    variant only takes as many bytes as that.
+
+    Args:
+        palette (list): (r, g, b) tuples.
+        replacements (dict): Original color -> the color which
+            replaces it. Colors are anything pygame.Color()
+            accepts. Colors which aren't in the palette are
+            ignored.
+
+    Returns:
+        bytes: --
+
+    Example:
+        >>> variant = palette_variant([(0, 0, 0), (0, 255, 0)],
+        ...                           {'#00ff00': (255, 0, 0)})
+        >>> len(variant)
+        6
+        >>> palette_colors(variant)
+        [(0, 0, 0), (255, 0, 0)]
+
+    """
+
+    replacements = {tuple(color_argument(old))[:3]:
+                    tuple(color_argument(new))[:3]
+                    for old, new in replacements.items()}
+    channels = bytearray()
+
+    for color in palette:
+        channels.extend(replacements.get(color, color))
+
+    return bytes(channels)
+
+
+def palette_colors(palette):
+    """Return the (r, g, b) colors of a palette packed by
+    palette_variant(), e.g., for pygame.Surface.set_palette().
+
+    Args:
+        palette (bytes): --
+
+    Returns:
+        list: (r, g, b) tuples.
+
+    """
+
+    channels = bytearray(palette)
+
+    return [tuple(channels[i:i + 3]) for i in range(0, len(channels), 3)]
+
+
+def color_argument(color):
+    """Return a pygame.Color from a color in a palettes.ini, e.g.,
+    "ff0000" or "255, 0, 0", or anything pygame.Color() accepts.
+
+    Example:
+        >>> tuple(color_argument('00ff00'))
+        (0, 255, 0, 255)
+        >>> tuple(color_argument('0, 0, 255'))
+        (0, 0, 255, 255)
+
+    """
+
+    if isinstance(color, str):
+        color = color.strip()
+
+        if ',' in color:
+            color = tuple(int(channel) for channel in color.split(','))
+
+        elif not color.startswith('#'):
+            color = '#' + color
+
+    return pygame.Color(color)
+
+
+def palette_cycle(surface):
+    """Return an animation which cycles the colors of surface.
+
+    The colors are ordered by where they first appear (column by
+    column). Each frame, every pixel takes the color which comes
+    before its color in that order, until, after as many frames as
+    there are colors, the surface is back to how it started.
+
+    The colors are remapped with numpy, over the whole surface at
+    once, rather than one pixel at a time.
+
+    Args:
+        surface (pygame.Surface): --
+
+    Returns:
+        animatedsprite.AnimatedSprite: one 250 millisecond frame
+            per color in surface.
+
+    Example:
+        >>> surface = pygame.Surface((2, 1))
+        >>> surface.set_at((1, 0), (255, 0, 0))
+        >>> cycle = palette_cycle(surface)
+        >>> len(cycle.frames)
+        2
+        >>> tuple(cycle.frames[0].surface.get_at((0, 0)))
+        (255, 0, 0, 255)
+
+    """
+
+    # pixels as mapped (format specific) integers, indexed [x][y],
+    # so flattening them is column by column.
+    pixels = pygame.surfarray.array2d(surface)
+    colors, first_seen, inverse = numpy.unique(pixels.ravel(),
+                                               return_index=True,
+                                               return_inverse=True)
+
+    # order the colors by where they first appear, and find out
+    # each pixel's position in that order.
+    order = numpy.argsort(first_seen)
+    ordered_colors = colors[order]
+    rank = numpy.empty_like(order)
+    rank[order] = numpy.arange(len(order))
+    pixel_ranks = rank[inverse.ravel()].reshape(pixels.shape)
+
+    frames = []
 
-        frame = new_surface.copy()
+    for rotation_i in range(1, len(ordered_colors) + 1):
+        frame_pixels = ordered_colors[(pixel_ranks - rotation_i) %
+                                      len(ordered_colors)]
+        frame = surface.copy()
+        pygame.surfarray.blit_array(frame, frame_pixels)
         frames.append((frame, 250))
-        old_color_list = copy.copy(new_color_list)
 
     return animatedsprite.AnimatedSprite.from_surface_duration_list(frames)
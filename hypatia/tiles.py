@@ -16,13 +16,20 @@ See Also:
 import os
 import sys
 import glob
+import mmap
 import zlib
+import struct
 import string
 import itertools
+import collections
 
+import numpy
 import pygame
 
+from hypatia import render
+from hypatia import physics
 from hypatia import sprites
+from hypatia import profiling
 from hypatia import resources
 from hypatia import animatedsprite
 
@@ -47,113 +54,524 @@ class BadTileID(Exception):
         self.bad_tile_id = bad_tile_id
 
 
+class TooManyFlags(Exception):
+    """Tilesheet: more distinct tile flags were defined than
+    fit into a flag bitmask.
+
+    Attributes:
+        flags (list): every flag name which was defined.
+
+    """
+
+    def __init__(self, flags):
+        message = ('%d flags defined, at most %d are supported' %
+                   (len(flags), Tilesheet.MAX_FLAGS))
+        super(TooManyFlags, self).__init__(message)
+        self.flags = flags
+
+
+class BadTileMapBinary(Exception):
+    """TileMap: binary tilemap data is not in a format which
+    this version of Hypatia can read.
+
+    Attributes:
+        reason (str): what is wrong with the data.
+
+    See Also:
+        TileMap.from_binary()
+
+    """
+
+    def __init__(self, reason):
+        super(BadTileMapBinary, self).__init__(reason)
+        self.reason = reason
+
+
+class ChunkCache(object):
+    """Least recently used store of stitched layer chunk surfaces,
+    bounded by a memory budget.
+
+    A chunk which contains nothing but air is stored as None, so
+    that it costs nothing and is never blitted.
+
+    Attributes:
+        budget (int): Maximum number of bytes of chunk surfaces
+            to keep around. The least recently used chunks are
+            discarded once this is exceeded.
+        bytes_used (int): Bytes currently occupied by the chunk
+            surfaces in this cache.
+        offsets (dict): key -> (x, y) position of the chunk surface
+            within the chunk, for the cached chunks which were
+            cropped; see compact_surface().
+
+    Example:
+        >>> cache = ChunkCache(budget=1024)
+        >>> cache.put((0, 0, 0), pygame.Surface((16, 16), 0, 32))
+        >>> cache.bytes_used
+        1024
+        >>> cache.put((0, 1, 0), pygame.Surface((8, 8), 0, 32), (4, 0))
+        >>> (0, 0, 0) in cache
+        False
+        >>> cache.offsets
+        {(0, 1, 0): (4, 0)}
+
+    """
+
+    DEFAULT_BUDGET = 32 * 1024 * 1024
+
+    def __init__(self, budget=None):
+        """
+
+        Args:
+            budget (int|None): Bytes of chunk surfaces to keep
+                before discarding the least recently used chunks.
+                Defaults to ChunkCache.DEFAULT_BUDGET.
+
+        """
+
+        if budget is None:
+            budget = ChunkCache.DEFAULT_BUDGET
+
+        self.budget = budget
+        self.bytes_used = 0
+        self.offsets = {}
+        self._chunks = collections.OrderedDict()
+
+    def __contains__(self, key):
+
+        return key in self._chunks
+
+    def __len__(self):
+
+        return len(self._chunks)
+
+    def get(self, key):
+        """Return the chunk surface stored under key, marking
+        it as the most recently used.
+
+        Raises:
+            KeyError: nothing is stored under key.
+
+        """
+
+        surface = self._chunks.pop(key)
+        self._chunks[key] = surface
+
+        return surface
+
+    def put(self, key, surface, offset=(0, 0)):
+        """Store a chunk surface (or None for an empty chunk),
+        evicting the least recently used chunks if the memory
+        budget is exceeded.
+
+        Args:
+            key (tuple): --
+            surface (pygame.Surface|None): --
+            offset (tuple): (x, y) position of surface within the
+                chunk, if it was cropped.
+
+        """
+
+        if key in self._chunks:
+            self.bytes_used -= surface_bytes(self._chunks.pop(key))
+            self.offsets.pop(key, None)
+
+        self._chunks[key] = surface
+        self.bytes_used += surface_bytes(surface)
+
+        if offset != (0, 0):
+            self.offsets[key] = offset
+
+        # never evict the chunk we just stitched, even if it
+        # alone is larger than the budget.
+        while self.bytes_used > self.budget and len(self._chunks) > 1:
+            evicted_key, evicted = self._chunks.popitem(last=False)
+            self.bytes_used -= surface_bytes(evicted)
+            self.offsets.pop(evicted_key, None)
+
+    def clear(self):
+        """Discard every chunk, e.g., because the tiles they
+        were stitched from have changed.
+
+        """
+
+        self._chunks.clear()
+        self.offsets.clear()
+        self.bytes_used = 0
+
+
+class ChunkFormats(object):
+    """Compacts stitched chunks (see compact_surface()), keeping
+    track of the formats picked and what they saved, per layer (or
+    band of layers).
+
+    Chunks are compacted into the display's pixel formats, once
+    use_formats() was told them (see TileMap.runtime_setup()).
+
+    Attributes:
+        layers (dict): layer name -> dict of how many chunks were
+            stored in each format ('opaque', 'colorkey', 'alpha',
+            'air'), how many were 'cropped', their 'bytes_before'
+            and 'bytes_after' compacting, and, if measuring, the
+            seconds blitting each of them once took before and
+            after compacting ('blit_seconds_before',
+            'blit_seconds_after'). Chunks which are all air
+            aren't stitched at all, which saves a whole chunk's
+            worth of bytes.
+        measure (bool): time blitting every chunk before and after
+            compacting it, for the report. This costs a few blits
+            per stitched chunk, so it's off by default.
+        opaque_format (pygame.Surface): a surface in the format
+            chunks without alpha are stored in.
+        alpha_format (pygame.Surface): a surface in the format
+            chunks with per-pixel alpha are stored in.
+        scratch (pygame.Surface): what blits are timed onto.
+
+    Example:
+        >>> formats = ChunkFormats((20, 20))
+        >>> surface = pygame.Surface((20, 20), pygame.SRCALPHA, 32)
+        >>> formats.compact('layer 1', surface)
+        (None, (0, 0))
+        >>> formats.compact('layer 1', None)
+        (None, (0, 0))
+        >>> formats.layers['layer 1']['air']
+        2
+        >>> formats.layers['layer 1']['bytes_before']
+        3200
+
+    """
+
+    FORMATS = ('opaque', 'colorkey', 'alpha', 'air')
+
+    def __init__(self, chunk_size, measure=False):
+        """
+
+        Args:
+            chunk_size (tuple): (x, y) pixel dimensions of a chunk.
+            measure (bool): --
+
+        """
+
+        self.layers = {}
+        self.measure = measure
+        self.chunk_size = chunk_size
+        self.use_formats(pygame.Surface((1, 1), 0, 32),
+                         pygame.Surface((1, 1), pygame.SRCALPHA, 32))
+
+    def use_formats(self, opaque_format, alpha_format):
+        """Compact chunks into these pixel formats from now on,
+        e.g., a render.ConversionPass's display formats.
+
+        Args:
+            opaque_format (pygame.Surface): --
+            alpha_format (pygame.Surface): --
+
+        """
+
+        self.opaque_format = opaque_format
+        self.alpha_format = alpha_format
+        self.scratch = pygame.Surface(self.chunk_size, 0, opaque_format)
+
+    def compact(self, name, surface):
+        """Compact a stitched chunk surface, recording the result.
+
+        Args:
+            name (str): the layer (or band) the chunk belongs to.
+            surface (pygame.Surface|None): None for nothing at all.
+
+        Returns:
+            tuple: (pygame.Surface|None, (x, y) offset to blit it
+                at, relative to where the chunk is); see
+                compact_surface().
+
+        """
+
+        if name not in self.layers:
+            self.layers[name] = dict.fromkeys(
+                ChunkFormats.FORMATS +
+                ('cropped', 'bytes_before', 'bytes_after',
+                 'blit_seconds_before', 'blit_seconds_after'),
+                0
+            )
+
+        stats = self.layers[name]
+
+        # nothing was stitched, which saved a whole chunk
+        if surface is None:
+            width, height = self.chunk_size
+            stats['air'] += 1
+            stats['bytes_before'] += width * height * 4
+
+            return (None, (0, 0))
+
+        compact, offset, chunk_format = compact_surface(
+            surface, self.opaque_format, self.alpha_format)
+        stats[chunk_format] += 1
+        stats['bytes_before'] += surface_bytes(surface)
+        stats['bytes_after'] += surface_bytes(compact)
+
+        if compact is not None:
+            stats['cropped'] += compact.get_size() != surface.get_size()
+
+        if self.measure:
+            stats['blit_seconds_before'] += self.time_blit(surface, (0, 0))
+
+            if compact is not None:
+
+                # the first blit of a RLEACCEL surface encodes it
+                if chunk_format == 'colorkey':
+                    self.scratch.blit(compact, offset)
+
+                stats['blit_seconds_after'] += self.time_blit(compact,
+                                                              offset)
+
+        return (compact, offset)
+
+    def time_blit(self, surface, position):
+        """Return how many seconds blitting surface once takes."""
+
+        start = render.timer()
+        self.scratch.blit(surface, position)
+
+        return render.timer() - start
+
+    def report(self):
+        """Summarize what compacting saved, layer by layer.
+
+        Returns:
+            str: one line per layer.
+
+        """
+
+        lines = []
+
+        for name in sorted(self.layers):
+            stats = self.layers[name]
+            line = ("%s: %d opaque, %d colorkey, %d alpha, %d air chunks "
+                    "(%d cropped); %d KiB -> %d KiB"
+                    % (name, stats['opaque'], stats['colorkey'],
+                       stats['alpha'], stats['air'], stats['cropped'],
+                       stats['bytes_before'] // 1024,
+                       stats['bytes_after'] // 1024))
+
+            if self.measure:
+                line += ("; blitting each once went from %.2f ms to "
+                         "%.2f ms" % (stats['blit_seconds_before'] * 1000,
+                                      stats['blit_seconds_after'] * 1000))
+
+            lines.append(line)
+
+        return '\n'.join(lines)
+
+
 class TileMap(object):
     """Layers created from graphical tiles specified in a tilesheet.
 
+    Layers are never stitched into a single map-sized surface.
+    Instead, each layer is split into chunks of CHUNK_SIZE tiles,
+    which are stitched on demand when they first intersect the
+    viewport and kept in a memory-bounded :class:`ChunkCache`.
+
     Note:
       Makes map-specific data accessible.
 
+    Stitched chunks are stored in the cheapest format which blits
+    the same; see compact_surface().
+
+    Constants:
+      CHUNK_SIZE (tuple): (x, y) dimensions of a layer chunk
+        in tiles.
+      BELOW (int): the band of layers under the actors; see bands.
+      ABOVE (int): the band of layers over the actors.
+
     Attributes:
       tilesheet:
+      tile_ids (numpy.ndarray): int32 array of shape (depth, height,
+        width) of the Tilesheet tile IDs which constructed this
+        TileMap; -1 is air.
       dimensions_in_tiles:
-      layer_images:
-      flags:
-      impassability:
-      animated_tiles:
+      rect (pygame.Rect): the area the whole map covers in pixels.
+      chunks (ChunkCache): stitched layer chunk surfaces.
+      chunk_formats (ChunkFormats): the formats picked for the
+        stitched chunks, by layer (or band), and what they saved.
+      layer_flags (numpy.ndarray): read-only uint32 array of shape
+        (depth, height, width); the flag bitmask of every cell of
+        every layer. See Tilesheet.flag_bits.
+      flags (numpy.ndarray): read-only uint32 array of shape
+        (height, width); the flag bitmasks of all layers merged.
+      passability (physics.PassabilityGrid): which tiles are
+        impassable on any layer, indexed by tile coordinate.
+      animated_tile_stack (dict): z-index -> set of
+        (AnimatedSprite, (x, y) pixel position) tuples.
+      animated_tile_chunks (dict): z-index -> dict of (chunk x,
+        chunk y) -> list of the animated_tile_stack tuples in that
+        chunk, for finding the visible ones quickly.
+      bands (tuple): the z-indexes of the layers flattened into
+        each band: BELOW the actors (the bottom layer), and ABOVE
+        them (every other layer). See blit_band().
+      animated_columns (dict): (chunk x, chunk y) -> list of
+        (list of (Tile, AnimatedSprite|None), (x, y) pixel position)
+        tuples; the cells the ABOVE band leaves out, because one of
+        its layers has an animated tile there. See
+        blit_animated_columns().
 
     """
 
-    def __init__(self, tilesheet_name, tile_ids):
-        """Stitch tiles from swatch to layer surfaces.
+    CHUNK_SIZE = (16, 16)
+    BELOW = 0
+    ABOVE = 1
 
-        Piece together layers/surfaces from corresponding tile graphic
-        names, using the specified tile swatch. Keep track of
+    def __init__(self, tilesheet_name, tile_ids, chunk_budget=None):
+        """Index the tiles of each layer and keep track of
         metadata, including passability.
 
+        Nothing here loops over individual tiles in Python: the
+        per-tile-id tables of the tilesheet are looked up for every
+        cell at once, and -1 (air) cells simply never match. Layer
+        surfaces are stitched lazily, chunk by chunk, from the
+        specified tile swatch. See TileMap.chunk().
+
         Args:
           tilesheet_name (str): directory name of the swatch to use
-          tile_ids (list): 3d list where list[layer][row][tile]
+          tile_ids (numpy.ndarray|list): integer array of shape
+            (depth, height, width), or a 3d list where
+            list[layer][row][tile].
+          chunk_budget (int|None): maximum bytes of stitched chunk
+            surfaces to keep; see ChunkCache.
+
+        Raises:
+          BadTileID: a tile ID which is neither -1 (air) nor
+            in the tilesheet.
 
         Examples:
           Make a 2x2x1 tilemap:
           >>> tiles = [[[0, 0], [0, 0]]]
           >>> tilemap = TileMap('debug', tiles)
+          >>> tilemap.tile_ids.shape
+          (1, 2, 2)
 
         """
 
-        # create the layer images and tile properties
-        tilesheet = Tilesheet.from_resources(tilesheet_name)
-        first_layer = tile_ids[0]
-
-        width_tiles = len(first_layer[0])
-        height_tiles = len(first_layer)
-        depth_tiles = len(tile_ids)
+        # create the tile properties
+        tilesheet = Tilesheet.acquire(tilesheet_name)
+        tile_ids = numpy.asarray(tile_ids, dtype=numpy.int32)
+        depth_tiles, height_tiles, width_tiles = tile_ids.shape
         dimensions_in_tiles = (width_tiles, height_tiles, depth_tiles)
 
-        tile_size = tilesheet.tiles[0].size
-        tile_width, tile_height = tile_size
-        layer_width = len(first_layer[0]) * tile_width
-        layer_height = len(first_layer) * tile_height
-        layer_size = (layer_width, layer_height)
-
-        tiles = []
-        layer_images = []
-        impassable_rects = []
-        animated_tile_stack = {i: set() for i in range(depth_tiles)}
-
-        for z, layer in enumerate(tile_ids):
-            new_layer = pygame.Surface(layer_size, pygame.SRCALPHA, 32)
-            new_layer.fill([0, 0, 0, 0])
-
-            for y, row_of_tile_ids in enumerate(layer):
+        bad_tile_ids = tile_ids[(tile_ids < -1) |
+                                (tile_ids >= len(tilesheet.tiles))]
 
-                for x, tile_id in enumerate(row_of_tile_ids):
-                    # is this right...?
-                    tile_index = (((z - 1) * height_tiles * width_tiles) +
-                                  (y * width_tiles) + x)
-                    tile = tilesheet[tile_id]
+        if bad_tile_ids.size:
 
-                    # if not on first layer, merge flags down to first
-                    if z:
-                        tile_index = (y * width_tiles) + x
-                        tiles[tile_index].flags.update(tile.flags)
-                    else:
-                        tiles.append(tile)
+            raise BadTileID(int(bad_tile_ids[0]))
 
-                    # -1 is air/nothing
-                    if tile.tilesheet_id == -1:
+        tile_size = tilesheet.tile_size
+        tile_width, tile_height = tile_size
+        layer_size = (width_tiles * tile_width, height_tiles * tile_height)
 
-                        continue
+        # the flag bitmask of every cell, per layer and merged
+        layer_flags = tilesheet.flag_masks[tile_ids]
+        flags = numpy.bitwise_or.reduce(layer_flags, axis=0)
+        layer_flags.setflags(write=False)
+        flags.setflags(write=False)
 
-                    # blit tile subsurface onto respective layer
-                    tile_position = (x * tile_width, y * tile_height)
-                    new_layer.blit(tile.subsurface, tile_position)
+        self.tilesheet = tilesheet
+        self.layer_flags = layer_flags
+        self.flags = flags
+
+        # impassable on any layer is impassable, period.
+        impassable = self.mask('impass_all')
+        passability = physics.PassabilityGrid.from_bytes(
+            (width_tiles, height_tiles),
+            tile_size,
+            impassable.astype(numpy.uint8).tobytes()
+        )
+
+        # the position of every animated tile, by layer
+        animated_table = tilesheet.id_table(tilesheet.animated_tiles)
+        animated_tile_stack = {}
+
+        # the lowest layer above the actors (i.e., not the bottom
+        # layer) with an animated tile in each cell, if any
+        first_animated_layer = numpy.full((height_tiles, width_tiles),
+                                          depth_tiles, dtype=numpy.int32)
+
+        for z in range(depth_tiles):
+            layer_ids = tile_ids[z]
+            ys, xs = numpy.nonzero(animated_table[layer_ids])
+
+            if z:
+                unset = first_animated_layer[ys, xs] == depth_tiles
+                first_animated_layer[ys[unset], xs[unset]] = z
+
+            animated_tile_stack[z] = set(
+                (tilesheet.animated_tiles[tile_id],
+                 (x * tile_width, y * tile_height))
+                for tile_id, x, y in zip(layer_ids[ys, xs].tolist(),
+                                         xs.tolist(),
+                                         ys.tolist())
+            )
+
+        chunk_width_tiles, chunk_height_tiles = TileMap.CHUNK_SIZE
+        chunks_wide = -(-width_tiles // chunk_width_tiles)
+        chunks_high = -(-height_tiles // chunk_height_tiles)
+
+        # the same animated tiles, bucketed by the chunk they're in
+        chunk_width = chunk_width_tiles * tile_width
+        chunk_height = chunk_height_tiles * tile_height
+        animated_tile_chunks = {}
+
+        for z, animated_tiles in animated_tile_stack.items():
+            buckets = animated_tile_chunks[z] = {}
+
+            for animated_tile in animated_tiles:
+                x, y = animated_tile[1]
+                key = (x // chunk_width, y // chunk_height)
+                buckets.setdefault(key, []).append(animated_tile)
+
+        # a cell where a layer above the actors has an animated tile
+        # is left out of the ABOVE band from that layer up, and drawn
+        # tile by tile instead, so the animated tile stays between
+        # the layers under and over it.
+        animated_columns = {}
+        ys, xs = numpy.nonzero(first_animated_layer != depth_tiles)
+
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            column = [(tilesheet.tiles[tile_id],
+                       tilesheet.animated_tiles.get(tile_id))
+                      for tile_id
+                      in tile_ids[first_animated_layer[y, x]:, y, x].tolist()
+                      if tile_id != -1]
+            position = (x * tile_width, y * tile_height)
+            key = (position[0] // chunk_width, position[1] // chunk_height)
+            animated_columns.setdefault(key, []).append((column, position))
+
+        self.rect = pygame.Rect((0, 0), layer_size)
+        self.chunks = ChunkCache(chunk_budget)
+        self.chunk_formats = ChunkFormats((chunk_width, chunk_height))
+        self.bands = ((0,), tuple(range(1, depth_tiles)))
+        self.animated_columns = animated_columns
+        self._first_animated_layer = first_animated_layer
+        self.dimensions_in_chunks = (chunks_wide, chunks_high)
+        self.passability = passability
+        self.animated_tile_stack = animated_tile_stack
+        self.animated_tile_chunks = animated_tile_chunks
+        self.dimensions_in_tiles = dimensions_in_tiles
+        self.tile_ids = tile_ids
 
-                    # is this tile an animation?
-                    if tile.tilesheet_id in tilesheet.animated_tiles:
-                        animated_tile = (tilesheet.
-                                         animated_tiles[tile.tilesheet_id])
-                        animation_info = (animated_tile, tile_position)
-                        animated_tile_stack[z].add(animation_info)
+    @property
+    def impassable_rects(self):
+        """The pixel rect of every impassable tile.
 
-                    # finally passability!
-                    if 'impass_all' in tile.flags:
-                        impassable_rects.append(pygame.Rect(tile_position,
-                                                            tile_size))
+        Use TileMap.passability (or Scene.collision_world) for
+        collision checks; this is a full scan of the map.
 
-            layer_images.append(new_layer)
+        Returns:
+            list[pygame.Rect]: --
 
-        self.tilesheet = tilesheet
-        self.layer_images = layer_images
-        self.tiles = tiles
-        self.impassable_rects = impassable_rects
-        self.animated_tile_stack = animated_tile_stack
-        self.dimensions_in_tiles = dimensions_in_tiles
+        """
 
-        # the 3D list of Tilesheet tile IDs
-        # which constructed this TileMap. It
-        # is not updated when self.tiles is.
-        self._tile_ids = tile_ids
+        return self.passability.impassable_rects()
 
     def __getitem__(self, coord):
         """Fetch TileInfo by tile coordinate.
@@ -163,7 +581,8 @@ class TileMap(object):
             z-index (it's not a pixel value)
 
         Returns:
-          TileProperties
+          Tile: the tile on the first (bottom) layer. Use
+            TileMap.flags_at() for the flags of every layer.
 
         Examples:
           >>> tiles = [[[0, 0], [0, 0]]]
@@ -174,9 +593,113 @@ class TileMap(object):
         """
 
         x, y = coord
-        width_in_tiles = self.dimensions_in_tiles[0]
 
-        return self.tiles[coord_to_index(width_in_tiles, x, y)]
+        return self.tilesheet[int(self.tile_ids[0, y, x])]
+
+    def flags_at(self, coord):
+        """Return the flags of every layer's tile at a tile
+        coordinate, merged together.
+
+        Args:
+          coord (tuple): (x, y) tile coordinate.
+
+        Returns:
+          set: flag names.
+
+        Examples:
+          >>> tiles = [[[12, 12]], [[-1, 0]]]
+          >>> tilemap = TileMap('debug', tiles)
+          >>> sorted(tilemap.flags_at((1, 0)))
+          ['impass_all']
+          >>> sorted(tilemap[(1, 0)].flags)
+          []
+
+        """
+
+        x, y = coord
+
+        return self.tilesheet.flag_names(self.flags[y, x])
+
+    def mask(self, flag, layer=None):
+        """Return which cells have a flag, for every cell at once,
+        e.g., for pathfinding, AI, or triggers.
+
+        Args:
+          flag (str): e.g., "impass_all." A flag which no tile in
+            the tilesheet has is simply never set.
+          layer (int|None): only look at this layer's tiles, rather
+            than the flags of all the layers merged.
+
+        Returns:
+          numpy.ndarray: bool array of shape (height, width).
+
+        Examples:
+          >>> tiles = [[[12, 12], [12, 12]], [[-1, 0], [-1, -1]]]
+          >>> tilemap = TileMap('debug', tiles)
+          >>> tilemap.mask('impass_all').tolist()
+          [[False, True], [False, False]]
+          >>> tilemap.mask('impass_all', layer=0).tolist()
+          [[False, False], [False, False]]
+
+        """
+
+        bit = self.tilesheet.flag_bits.get(flag, 0)
+
+        if layer is None:
+            flags = self.flags
+        else:
+            flags = self.layer_flags[layer]
+
+        return (flags & bit) != 0
+
+    def flags_in_region(self, rect, layer=None):
+        """Return the flag bitmasks of the tiles which a pixel
+        rect overlaps, clipped to the map.
+
+        This is a view, not a copy, so it is cheap to ask for
+        often. Test it against Tilesheet.flag_bits, e.g.,
+        ``region & tilesheet.flag_bits['impass_all']``.
+
+        Args:
+          rect (pygame.Rect): pixel area.
+          layer (int|None): only look at this layer's tiles, rather
+            than the flags of all the layers merged.
+
+        Returns:
+          numpy.ndarray: read-only uint32 array of shape
+            (rows, columns) of the overlapped tiles.
+
+        Examples:
+          >>> tiles = [[[12, 12, 12], [12, 12, 0]]]
+          >>> tilemap = TileMap('debug', tiles)
+          >>> region = tilemap.flags_in_region(pygame.Rect(15, 5, 20, 10))
+          >>> region.shape
+          (2, 2)
+          >>> bool((region & tilemap.tilesheet.flag_bits['impass_all'])[1, 1])
+          True
+          >>> tilemap.flags_in_region(pygame.Rect(0, -40, 10, 5)).shape
+          (0, 0)
+
+        """
+
+        if layer is None:
+            flags = self.flags
+        else:
+            flags = self.layer_flags[layer]
+
+        height, width = flags.shape
+        first_x, first_y, last_x, last_y = self.passability.tile_span(rect)
+        first_x = max(first_x, 0)
+        first_y = max(first_y, 0)
+        last_x = min(last_x, width - 1)
+        last_y = min(last_y, height - 1)
+
+        # negative indexes would count from the far edge of the map
+        if last_x < first_x or last_y < first_y:
+
+            return flags[0:0, 0:0]
+
+        return flags[first_y:last_y + 1, first_x:last_x + 1]
 
     def get_info(self, coord):
         """Fetch TileProperties by pixel coordinate.
@@ -204,36 +727,470 @@ class TileMap(object):
 
         return self[(tile_x, tile_y)]
 
-    def blit_layer_animated_tiles(self, viewport, layer):
-        """Blit all of the animated tiles from a
-        designated layer to the supplied viewport.
+    def chunk(self, layer, chunk_x, chunk_y):
+        """Return the surface for one chunk of a layer, stitching
+        it from tiles if it isn't already in the chunk cache.
+
+        Args:
+            layer (int): the z-index of the layer.
+            chunk_x (int): the x coordinate of the chunk, in chunks.
+            chunk_y (int): the y coordinate of the chunk, in chunks.
+
+        Returns:
+            pygame.Surface|None: None if the chunk is all air.
+
+        Examples:
+            >>> tiles = [[[0, -1], [-1, 4]], [[-1, -1], [-1, -1]]]
+            >>> tilemap = TileMap('debug', tiles)
+            >>> tilemap.chunk(0, 0, 0).get_size()
+            (20, 20)
+            >>> tilemap.chunk(1, 0, 0) is None
+            True
+
+        """
+
+        return self.cached_chunk((layer, chunk_x, chunk_y))
+
+    def band_chunk(self, band, chunk_x, chunk_y):
+        """Return the surface for one chunk of a band of layers
+        (see bands), flattened, stitching it from tiles if it isn't
+        already in the chunk cache.
+
+        Args:
+            band (int): BELOW or ABOVE.
+            chunk_x (int): the x coordinate of the chunk, in chunks.
+            chunk_y (int): the y coordinate of the chunk, in chunks.
+
+        Returns:
+            pygame.Surface|None: None if the chunk is all air.
+
+        Examples:
+            >>> tiles = [[[0, 0]], [[-1, 4]], [[-1, -1]]]
+            >>> tilemap = TileMap('debug', tiles)
+            >>> tilemap.bands
+            ((0,), (1, 2))
+            >>> tilemap.band_chunk(TileMap.ABOVE, 0, 0).get_size()
+            (10, 10)
+            >>> tilemap.chunks.offsets[('band', TileMap.ABOVE, 0, 0)]
+            (10, 0)
+
+        """
+
+        return self.cached_chunk(('band', band, chunk_x, chunk_y))
+
+    def cached_chunk(self, key):
+        """Return a chunk surface from the chunk cache, stitching and
+        compacting it if it isn't there.
+
+        Args:
+            key (tuple): (layer, chunk x, chunk y) for a chunk of a
+                layer, or ('band', band, chunk x, chunk y) for a
+                chunk of a band; see chunk() and band_chunk().
+
+        Returns:
+            pygame.Surface|None: None if the chunk is all air. It
+                may be cropped; see ChunkCache.offsets.
+
+        """
+
+        try:
+
+            return self.chunks.get(key)
+
+        except KeyError:
+            pass
+
+        if key[0] == 'band':
+            __, band, chunk_x, chunk_y = key
+            name = ('below', 'above')[band] + ' band'
+            surface = self.stitch_layers(self.bands[band], chunk_x, chunk_y,
+                                         band == TileMap.ABOVE)
+        else:
+            layer, chunk_x, chunk_y = key
+            name = 'layer %d' % layer
+            surface = self.stitch_chunk(layer, chunk_x, chunk_y)
+
+        surface, offset = self.chunk_formats.compact(name, surface)
+        self.chunks.put(key, surface, offset)
+
+        return surface
+
+    def stitch_chunk(self, layer, chunk_x, chunk_y):
+        """Blit the tiles belonging to a chunk of a layer onto
+        a new surface. Chunks on the right and bottom edges of
+        the map may be smaller than CHUNK_SIZE.
+
+        Args:
+            layer (int): the z-index of the layer.
+            chunk_x (int): the x coordinate of the chunk, in chunks.
+            chunk_y (int): the y coordinate of the chunk, in chunks.
+
+        Returns:
+            pygame.Surface|None: None if the chunk is all air.
+
+        """
+
+        return self.stitch_layers((layer,), chunk_x, chunk_y)
+
+    def stitch_layers(self, layers, chunk_x, chunk_y,
+                      leave_out_animated_columns=False):
+        """Blit the tiles belonging to a chunk of some layers onto
+        one new surface, bottom layer first.
+
+        Args:
+            layers (tuple): z-indexes of the layers, bottom first.
+            chunk_x (int): the x coordinate of the chunk, in chunks.
+            chunk_y (int): the y coordinate of the chunk, in chunks.
+            leave_out_animated_columns (bool): leave out the tiles
+                which blit_animated_columns() draws.
+
+        Returns:
+            pygame.Surface|None: None if the chunk is all air.
+
+        """
+
+        width_tiles, height_tiles, __ = self.dimensions_in_tiles
+        chunk_width_tiles, chunk_height_tiles = TileMap.CHUNK_SIZE
+        tile_width, tile_height = self.tilesheet.tile_size
+
+        first_x = chunk_x * chunk_width_tiles
+        first_y = chunk_y * chunk_height_tiles
+        last_x = min(first_x + chunk_width_tiles, width_tiles)
+        last_y = min(first_y + chunk_height_tiles, height_tiles)
+
+        chunk_ids = self.tile_ids[list(layers), first_y:last_y,
+                                  first_x:last_x]
+
+        if leave_out_animated_columns:
+            first_animated_layer = self._first_animated_layer[
+                first_y:last_y, first_x:last_x]
+            z = numpy.array(layers, dtype=numpy.int32)[:, None, None]
+            chunk_ids[z >= first_animated_layer] = -1
+
+        # -1 is air/nothing; bottom layer first
+        zs, ys, xs = numpy.nonzero(chunk_ids != -1)
+
+        if not len(ys):
+
+            return None
+
+        chunk_size = ((last_x - first_x) * tile_width,
+                      (last_y - first_y) * tile_height)
+        chunk_surface = pygame.Surface(chunk_size, pygame.SRCALPHA, 32)
+        chunk_surface.fill([0, 0, 0, 0])
+        tiles = self.tilesheet.tiles
+
+        for tile_id, x, y in zip(chunk_ids[zs, ys, xs].tolist(),
+                                 xs.tolist(),
+                                 ys.tolist()):
+            tile_position = (x * tile_width, y * tile_height)
+            chunk_surface.blit(tiles[tile_id].subsurface, tile_position)
+
+        return chunk_surface
+
+    def visible_area(self, viewport, area=None):
+        """The part of the map which is visible through the
+        viewport, or through an area of it.
+
+        Args:
+            viewport (render.Viewport): --
+            area (pygame.Rect|None): an area of the viewport (in
+                viewport coordinates), e.g., a dirty rect.
+
+        Returns:
+            pygame.Rect: in map coordinates; empty if area is
+                outside of the viewport.
+
+        """
+
+        if area is None:
+
+            return viewport.rect
+
+        return area.move(viewport.rect.topleft).clip(viewport.rect)
+
+    def chunks_in(self, rect):
+        """The chunks of the map which intersect rect.
+
+        Args:
+            rect (pygame.Rect): in map (pixel) coordinates.
+
+        Returns:
+            list[tuple]: (chunk x, chunk y) coordinates, row by row.
+
+        Examples:
+            >>> tilemap = TileMap('debug', [[[0] * 40] * 20])
+            >>> tilemap.chunks_in(pygame.Rect(150, 0, 20, 20))
+            [(0, 0), (1, 0)]
+            >>> tilemap.chunks_in(pygame.Rect(-50, -50, 10, 10))
+            []
+
+        """
+
+        chunk_width_tiles, chunk_height_tiles = TileMap.CHUNK_SIZE
+        tile_width, tile_height = self.tilesheet.tile_size
+        chunk_width = chunk_width_tiles * tile_width
+        chunk_height = chunk_height_tiles * tile_height
+        chunks_wide, chunks_high = self.dimensions_in_chunks
+
+        if not rect:
+
+            return []
+
+        first_chunk_x = max(rect.left // chunk_width, 0)
+        first_chunk_y = max(rect.top // chunk_height, 0)
+        last_chunk_x = min((rect.right - 1) // chunk_width,
+                           chunks_wide - 1)
+        last_chunk_y = min((rect.bottom - 1) // chunk_height,
+                           chunks_high - 1)
+
+        return [(chunk_x, chunk_y)
+                for chunk_y in range(first_chunk_y, last_chunk_y + 1)
+                for chunk_x in range(first_chunk_x, last_chunk_x + 1)]
+
+    def blit_layer(self, viewport, layer, area=None):
+        """Blit the chunks of a layer which intersect the
+        viewport's rect onto the viewport.
+
+        Only the visible chunks are stitched or blitted, so
+        this costs the same no matter how big the map is.
+
+        Args:
+            viewport (render.Viewport): --
+            layer (int): The z-index of the layer to blit.
+            area (pygame.Rect|None): Only blit the chunks which
+                intersect this area of the viewport (in viewport
+                coordinates), e.g., a dirty rect.
+
+        """
+
+        self.blit_chunks(viewport, (layer,), area)
+
+    def blit_band(self, viewport, band, area=None):
+        """Blit the chunks of a band of layers (see bands) which
+        intersect the viewport's rect onto the viewport, then the
+        band's animated tiles.
+
+        However many layers a map has, drawing all of them covers
+        the viewport twice: once with the BELOW band, once with the
+        ABOVE band. The animated tiles aren't part of the stitched
+        chunks; see blit_layer_animated_tiles() and
+        blit_animated_columns().
+
+        Args:
+            viewport (render.Viewport): --
+            band (int): BELOW or ABOVE.
+            area (pygame.Rect|None): Only blit the chunks which
+                intersect this area of the viewport (in viewport
+                coordinates), e.g., a dirty rect.
+
+        """
+
+        if not self.bands[band]:
+
+            return None
+
+        self.blit_chunks(viewport, ('band', band), area)
+
+        if band == TileMap.BELOW:
+            self.blit_layer_animated_tiles(viewport, 0, area)
+        else:
+            self.blit_animated_columns(viewport, area)
+
+    def blit_chunks(self, viewport, key_prefix, area=None):
+        """Blit the chunks which intersect the viewport's rect, in
+        one batch; see blit_layer() and blit_band().
+
+        Args:
+            viewport (render.Viewport): --
+            key_prefix (tuple): the chunk cache key of each chunk,
+                without its (chunk x, chunk y), e.g., (layer,); see
+                cached_chunk().
+            area (pygame.Rect|None): --
+
+        """
+
+        chunk_width_tiles, chunk_height_tiles = TileMap.CHUNK_SIZE
+        tile_width, tile_height = self.tilesheet.tile_size
+        chunk_width = chunk_width_tiles * tile_width
+        chunk_height = chunk_height_tiles * tile_height
+        left, top = viewport.rect.topleft
+        offsets = self.chunks.offsets
+        blits = []
+
+        for chunk_x, chunk_y in self.chunks_in(self.visible_area(viewport,
+                                                                 area)):
+            key = key_prefix + (chunk_x, chunk_y)
+            chunk_surface = self.cached_chunk(key)
+
+            if chunk_surface is not None:
+                offset_x, offset_y = offsets.get(key, (0, 0))
+                blits.append((chunk_surface,
+                              (chunk_x * chunk_width - left + offset_x,
+                               chunk_y * chunk_height - top + offset_y)))
+
+        render.blit_batch(viewport.surface, blits)
+
+    def visible_animated_tiles(self, viewport, layer, area=None):
+        """The animated tiles of a layer which intersect the
+        viewport's rect.
+
+        Only the animated tiles in the visible chunks are looked
+        at, so this costs the same no matter how big the map is.
+
+        Args:
+            viewport (render.Viewport): --
+            layer (int): the z-index of the layer.
+            area (pygame.Rect|None): Only the animated tiles which
+                intersect this area of the viewport (in viewport
+                coordinates), e.g., a dirty rect.
+
+        Returns:
+            list[tuple]: (AnimatedSprite, (x, y) pixel position)
+                tuples; see animated_tile_stack.
+
+        """
+
+        return self.visible_cells(self.animated_tile_chunks.get(layer),
+                                  self.visible_area(viewport, area))
+
+    def visible_cells(self, buckets, visible):
+        """The things in one-tile cells, bucketed by chunk, which
+        intersect an area of the map.
+
+        Args:
+            buckets (dict|None): (chunk x, chunk y) -> list of
+                tuples whose second item is the (x, y) pixel
+                position of the cell, e.g., animated_tile_chunks[0].
+            visible (pygame.Rect): in map (pixel) coordinates.
+
+        Returns:
+            list[tuple]: --
+
+        """
+
+        if not buckets:
+
+            return []
+
+        tile_width, tile_height = self.tilesheet.tile_size
+        left = visible.left - tile_width
+        top = visible.top - tile_height
+        right = visible.right
+        bottom = visible.bottom
+        found = []
+
+        for chunk in self.chunks_in(visible):
+
+            for cell in buckets.get(chunk, ()):
+                x, y = cell[1]
+
+                if left < x < right and top < y < bottom:
+                    found.append(cell)
+
+        return found
+
+    def blit_layer_animated_tiles(self, viewport, layer, area=None):
+        """Blit the animated tiles of a layer which intersect the
+        viewport's rect onto the viewport.
 
         Args:
             viewport (render.Viewport): --
             layer (int): The nth layer of animated tiles
                 which to blit to viewport.
+            area (pygame.Rect|None): Only blit the animated tiles
+                which intersect this area of the viewport (in
+                viewport coordinates), e.g., a dirty rect.
 
         """
 
-        # i have to start using sprite groups for this
-        for tile_anim, position in self.animated_tile_stack[layer]:
-            viewport.surface.blit(tile_anim.image,
-                                  viewport.relative_position(position))
+        animated_tiles = self.visible_animated_tiles(viewport, layer, area)
+        left, top = viewport.rect.topleft
+        render.blit_batch(viewport.surface,
+                          [(tile_anim.image, (x - left, y - top))
+                           for tile_anim, (x, y) in animated_tiles])
+
+        # a dirty rect redraw isn't a frame's worth of drawing;
+        # Scene.track_changes() counts those.
+        if area is None:
+            culled = (len(self.animated_tile_stack[layer]) -
+                      len(animated_tiles))
+            profiling.profiler.count('animated tiles drawn',
+                                     len(animated_tiles))
+            profiling.profiler.count('animated tiles culled', culled)
+
+    def blit_animated_columns(self, viewport, area=None):
+        """Blit the cells the ABOVE band leaves out (see
+        animated_columns) which intersect the viewport's rect onto
+        the viewport: every tile in the cell, from the lowest
+        animated one up, each followed by its animation, if any.
+
+        blit_band() draws these right after the ABOVE band.
+
+        Args:
+            viewport (render.Viewport): --
+            area (pygame.Rect|None): Only blit the cells which
+                intersect this area of the viewport (in viewport
+                coordinates), e.g., a dirty rect.
 
-    def runtime_setup(self):
+        """
+
+        columns = self.visible_cells(self.animated_columns,
+                                     self.visible_area(viewport, area))
+        left, top = viewport.rect.topleft
+        blits = []
+        drawn = 0
+
+        for column, (x, y) in columns:
+            position = (x - left, y - top)
+
+            for tile, tile_anim in column:
+                blits.append((tile.subsurface, position))
+
+                if tile_anim is not None:
+                    blits.append((tile_anim.image, position))
+                    drawn += 1
+
+        render.blit_batch(viewport.surface, blits)
+
+        if area is None:
+            total = sum(len(self.animated_tile_stack[layer])
+                        for layer in self.bands[TileMap.ABOVE])
+            profiling.profiler.count('animated tiles drawn', drawn)
+            profiling.profiler.count('animated tiles culled', total - drawn)
+
+    def release(self):
+        """Release this TileMap's reference to its tilesheet in
+        the asset cache. Call this once the TileMap is no
+        longer used.
+
+        """
+
+        Tilesheet.release(self.tilesheet.name)
+
+    def runtime_setup(self, conversion=None):
         """This is for game.py. These need to be launched after pygame
         has started.
 
-        """
+        Converts the tilesheet (and so every tile) and the animated
+        tiles to the display format, and has chunks compacted into
+        the display format from now on.
+
+        Args:
+            conversion (render.ConversionPass|None): The pass to
+                convert surfaces with. A new pass is used if None.
 
-        layer_images = self.layer_images
+        """
 
-        for image in layer_images:
-            image.convert()
-            image.convert_alpha()
+        conversion = conversion or render.ConversionPass()
+        self.tilesheet.convert(conversion)
+        self.chunk_formats.use_formats(conversion.opaque_format,
+                                       conversion.alpha_format)
 
-        for i, tile_animation in self.tilesheet.animated_tiles.items():
-            tile_animation.convert_alpha()
+        # chunks stitched before pygame started are discarded,
+        # so they are stitched again (from the converted tiles)
+        # once they become visible.
+        self.chunks.clear()
 
         return None
 
@@ -257,7 +1214,7 @@ class TileMap(object):
         max_digits = len(str(len(self.tilesheet.tiles))) - 1
         id_format = '%0' + str(max_digits) + 'd'
 
-        for layer in self._tile_ids:
+        for layer in self.tile_ids.tolist():
             layer_lines = []
 
             for row in layer:
@@ -303,10 +1260,132 @@ class TileMap(object):
 
         return TileMap(tilesheet_name, layers)
 
+    def to_binary(self, compress=False, chunk_rows=64):
+        """Create the binary version of the tilemap, for
+        tilemap.bin.
+
+        The format is a header, followed by the tilesheet name
+        and then the tile IDs as little-endian int32s, layer by
+        layer, row by row. See BINARY_HEADER.
+
+        Args:
+          compress (bool): zlib compress the tile IDs, in
+            chunks of chunk_rows rows of a layer each. Smaller,
+            but can't be memory-mapped without decompressing.
+          chunk_rows (int): rows per compressed chunk.
+
+        Returns:
+          bytes: --
+
+        Examples:
+          >>> tilemap = TileMap('debug', [[[0, 1], [2, -1]]])
+          >>> data = tilemap.to_binary()
+          >>> TileMap.from_binary(data).tile_ids.tolist()
+          [[[0, 1], [2, -1]]]
+
+        """
+
+        return tile_ids_to_binary(self.tilesheet.name, self.tile_ids,
+                                  compress, chunk_rows)
+
+    @classmethod
+    def from_binary(cls, buffer):
+        """Create a TileMap from the binary format created by
+        TileMap.to_binary(), e.g., the contents of tilemap.bin.
+
+        Uncompressed tile IDs are used straight from the buffer
+        (as a read-only array), never copied or parsed, so a
+        memory-mapped file loads in no time at all.
+
+        Args:
+          buffer (bytes|mmap.mmap): anything supporting the
+            buffer protocol.
+
+        Raises:
+          BadTileMapBinary: not a binary tilemap, or a newer
+            version than this one.
+
+        Returns:
+          TileMap: --
+
+        """
+
+        view = memoryview(buffer)
+
+        if len(view) < BINARY_HEADER.size:
+
+            raise BadTileMapBinary('truncated header')
+
+        (magic, version, flags, depth, height, width,
+         chunk_rows, name_length) = BINARY_HEADER.unpack_from(view)
+
+        if magic != BINARY_MAGIC:
+
+            raise BadTileMapBinary('not a binary tilemap')
+
+        if version != BINARY_VERSION:
+
+            raise BadTileMapBinary('version %d unsupported' % version)
+
+        offset = BINARY_HEADER.size
+        tilesheet_name = view[offset:offset + name_length].tobytes()
+        tilesheet_name = tilesheet_name.decode('utf-8')
+        offset += name_length + _binary_padding(name_length)
+        count = depth * height * width
+
+        if not flags & BINARY_ZLIB:
+            tile_ids = numpy.frombuffer(buffer, dtype='<i4',
+                                        count=count, offset=offset)
+        else:
+            chunks_per_layer = -(-height // chunk_rows)
+            chunk_count = depth * chunks_per_layer
+            chunk_sizes = struct.unpack_from('<%dI' % chunk_count,
+                                             view, offset)
+            offset += 4 * chunk_count
+            tile_ids = numpy.empty(count, dtype='<i4')
+            position = 0
+
+            for chunk_size in chunk_sizes:
+                chunk = zlib.decompress(view[offset:offset + chunk_size])
+                chunk = numpy.frombuffer(chunk, dtype='<i4')
+                tile_ids[position:position + chunk.size] = chunk
+                position += chunk.size
+                offset += chunk_size
+
+        tile_ids = tile_ids.reshape((depth, height, width))
+
+        return cls(tilesheet_name, tile_ids)
+
+    @classmethod
+    def from_binary_file(cls, path):
+        """Create a TileMap from a binary tilemap file,
+        memory-mapping it rather than reading it.
+
+        Args:
+          path (str): e.g., resources/scenes/debug/tilemap.bin
+
+        Returns:
+          TileMap: --
+
+        """
+
+        with open(path, 'rb') as binary_file:
+            mapped = mmap.mmap(binary_file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+
+        return cls.from_binary(mapped)
+
 
 class Tilesheet(object):
     """An image consisting of uniformly sized squares called "tiles."
 
+    Tile flags are interned into bit positions, so the flags of
+    any tile (or any cell of a TileMap) are a single integer.
+
+    Constants:
+        MAX_FLAGS (int): how many distinct flags a tilesheet
+            may define; flag bitmasks are uint32.
+
     Attributes:
         name (str): --
         surface (pygame.Surface): --
@@ -315,9 +1394,16 @@ class Tilesheet(object):
             comprise the Tilesheet surface.
         animated_tiles (dict): tile_id -> pyganimation
         animated_tiles_group (pygame.sprite.Group): --
+        flag_bits (dict): flag name -> the bit (1, 2, 4, ...)
+            which represents it in a flag bitmask.
+        flag_masks (numpy.ndarray): uint32 array of the flag bitmask
+            of each tile, indexed by tile ID, with a trailing
+            entry for -1 (air) which is always zero.
 
     """
 
+    MAX_FLAGS = 32
+
     def __init__(self, name, surface, tiles, tile_size, animated_tiles=None):
         """
 
@@ -340,6 +1426,22 @@ class Tilesheet(object):
         self.animated_tiles_group = (pygame.sprite.
                                      Group(*animated_tiles.values()))
 
+        flag_names = sorted(set().union(*[tile.flags for tile in tiles]))
+
+        if len(flag_names) > Tilesheet.MAX_FLAGS:
+
+            raise TooManyFlags(flag_names)
+
+        self.flag_bits = {flag: 1 << i for i, flag in enumerate(flag_names)}
+        self.flag_masks = numpy.zeros(len(tiles) + 1, dtype=numpy.uint32)
+
+        for tile in tiles:
+
+            for flag in tile.flags:
+                self.flag_masks[tile.tilesheet_id] |= self.flag_bits[flag]
+
+        self.flag_masks.setflags(write=False)
+
     def __getitem__(self, tile_id):
 
         try:
@@ -350,6 +1452,146 @@ class Tilesheet(object):
 
             raise BadTileID(tile_id)
 
+    def id_table(self, tile_ids):
+        """Return a lookup table which is True for the supplied
+        tile IDs, for looking up many tile IDs at once.
+
+        The table has one entry per tile, plus a trailing
+        entry for -1 (air), which is always False.
+
+        Args:
+            tile_ids (iter): tile IDs which should be True.
+
+        Returns:
+            numpy.ndarray: bool array, indexed by tile ID.
+
+        Example:
+            >>> tilesheet = Tilesheet.from_resources('debug')
+            >>> table = tilesheet.id_table([1, 2])
+            >>> table[numpy.array([-1, 0, 1, 2])].tolist()
+            [False, False, True, True]
+
+        """
+
+        table = numpy.zeros(len(self.tiles) + 1, dtype=bool)
+        table[list(tile_ids)] = True
+
+        return table
+
+    def flag_table(self, flag):
+        """Return a lookup table which is True for the tile
+        IDs of the tiles which have the supplied flag.
+
+        See Also:
+            Tilesheet.id_table()
+
+        Args:
+            flag (str): e.g., "impass_all."
+
+        Returns:
+            numpy.ndarray: bool array, indexed by tile ID.
+
+        """
+
+        return (self.flag_masks & self.flag_bits.get(flag, 0)) != 0
+
+    def flag_names(self, bitmask):
+        """Return the names of the flags set in a flag bitmask.
+
+        Args:
+            bitmask (int): e.g., a cell of TileMap.flags.
+
+        Returns:
+            set: --
+
+        Example:
+            >>> tilesheet = Tilesheet.from_resources('debug')
+            >>> tilesheet.flag_names(tilesheet.flag_masks[99])
+            {'impass_all'}
+
+        """
+
+        bitmask = int(bitmask)
+
+        return set(flag for flag, bit in self.flag_bits.items()
+                   if bitmask & bit)
+
+    def convert(self, conversion):
+        """Replace the tilesheet surface, the tiles' subsurfaces and
+        the animated tiles' frames with display format versions.
+
+        Args:
+            conversion (render.ConversionPass): --
+
+        """
+
+        surface = conversion.convert(self.surface)
+
+        if surface is not self.surface:
+
+            for tile in self.tiles:
+                subsurface = surface.subsurface(tile.area_on_tilesheet)
+
+                # animated tiles' frames are the tiles' subsurfaces
+                conversion.remember(tile.subsurface, subsurface)
+                tile.subsurface = subsurface
+
+            self.surface = surface
+
+        for animated_tile in self.animated_tiles.values():
+            animated_tile.convert_alpha(conversion)
+
+    def asset_bytes(self):
+        """Estimate how many bytes of memory this Tilesheet occupies,
+        for the asset cache.
+
+        Returns:
+            int: --
+
+        """
+
+        return resources.asset_bytes([self.surface, self.flag_masks,
+                                      list(self.animated_tiles.values())])
+
+    @staticmethod
+    def acquire(tilesheet_name):
+        """Return the Tilesheet of this name from the process-wide
+        asset cache, loading it from resources if needed. Pair
+        with Tilesheet.release().
+
+        Args:
+          tilesheet_name (str): --
+
+        Returns:
+          Tilesheet: shared by every TileMap using it.
+
+        Example:
+            >>> tilesheet = Tilesheet.acquire('debug')
+            >>> tilesheet is Tilesheet.acquire('debug')
+            True
+            >>> Tilesheet.release('debug')
+            >>> Tilesheet.release('debug')
+
+        """
+
+        return resources.assets.acquire(
+            'Tilesheet',
+            tilesheet_name,
+            lambda: Tilesheet.from_resources(tilesheet_name),
+            size_of=Tilesheet.asset_bytes
+        )
+
+    @staticmethod
+    def release(tilesheet_name):
+        """Release a Tilesheet acquired with Tilesheet.acquire().
+
+        Args:
+          tilesheet_name (str): --
+
+        """
+
+        resources.assets.release('Tilesheet', tilesheet_name)
+
     @classmethod
     def from_resources(cls, tilesheet_name):
         """Create a Tilesheet from a name, corresponding to a path
@@ -457,7 +1699,8 @@ class Tile(object):
           tile_size (tuple): (x, y) where x and y are integers
             defining the pixel dimensions of a tile.
           flags (set): Set of strings which acts as attributes, e.g.,
-            "impass_all."
+            "impass_all." Stored as a frozenset, since a Tile is
+            shared by every cell which uses it.
 
         """
 
@@ -470,11 +1713,194 @@ class Tile(object):
         position_rect = pygame.Rect(subsurface_top_left, tile_size)
         self.area_on_tilesheet = position_rect
         self.subsurface = tilesheet_surface.subsurface(position_rect)
-        self.flags = flags or set()
+        self.flags = frozenset(flags or ())
         self.tilesheet_id = tilesheet_id
         self.size = tile_size
 
 
+# The header of the binary tilemap format (tilemap.bin), which is
+# all little-endian:
+#
+#   magic (4 bytes), version (uint16), flags (uint16),
+#   depth, height, width, chunk_rows (uint32 each),
+#   tilesheet name length (uint16)
+#
+# followed by the tilesheet name, padded with zero bytes so the
+# tile IDs which follow start on a 4-byte boundary.
+BINARY_HEADER = struct.Struct('<4sHHIIIIH')
+BINARY_MAGIC = b'HTMB'
+BINARY_VERSION = 1
+
+# binary tilemap flags
+BINARY_ZLIB = 1
+
+
+def tile_ids_to_binary(tilesheet_name, tile_ids, compress=False,
+                       chunk_rows=64):
+    """The binary tilemap format, for tilemap.bin, without needing
+    a TileMap (or its tilesheet) first, e.g., for generating huge
+    maps. See TileMap.to_binary().
+
+    Args:
+        tilesheet_name (str): --
+        tile_ids (numpy.ndarray|list): integer array of shape
+            (depth, height, width); see TileMap.
+        compress (bool): See TileMap.to_binary().
+        chunk_rows (int): See TileMap.to_binary().
+
+    Returns:
+        bytes: --
+
+    """
+
+    depth, height, width = numpy.shape(tile_ids)
+    name = tilesheet_name.encode('utf-8')
+    tile_ids = numpy.asarray(tile_ids).astype('<i4')
+
+    if not compress:
+        chunk_rows = 0
+
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION,
+                                BINARY_ZLIB if compress else 0,
+                                depth, height, width, chunk_rows,
+                                len(name))
+    parts = [header, name, b'\0' * _binary_padding(len(name))]
+
+    if not compress:
+        parts.append(tile_ids.tobytes())
+    else:
+        chunks = [zlib.compress(layer[y:y + chunk_rows].tobytes())
+                  for layer in tile_ids
+                  for y in range(0, height, chunk_rows)]
+        parts.append(struct.pack('<%dI' % len(chunks),
+                                 *[len(chunk) for chunk in chunks]))
+        parts.extend(chunks)
+
+    return b''.join(parts)
+
+
+def _binary_padding(length):
+    """Zero bytes needed after the header and a tilesheet name of
+    length bytes, so the tile IDs are 4-byte aligned.
+
+    """
+
+    return -(BINARY_HEADER.size + length) % 4
+
+
+def surface_bytes(surface):
+    """Return how many bytes of pixel data a surface occupies.
+
+    Args:
+        surface (pygame.Surface|None): None counts as zero bytes.
+
+    Returns:
+        int: --
+
+    Example:
+        >>> surface_bytes(pygame.Surface((10, 10), pygame.SRCALPHA, 32))
+        400
+        >>> surface_bytes(None)
+        0
+
+    """
+
+    if surface is None:
+
+        return 0
+
+    return surface.get_pitch() * surface.get_height()
+
+
+# colors tried, in order, as the colorkey of a compacted surface;
+# one which none of its opaque pixels has is used.
+COLORKEYS = ((255, 0, 255), (0, 255, 255), (1, 2, 3))
+
+
+def compact_surface(surface, opaque_format=None, alpha_format=None):
+    """Pick the cheapest way to store a stitched (per-pixel alpha)
+    surface which still blits exactly the same pixels: cropped to
+    what isn't transparent, and
+
+      * 'opaque': without alpha, if nothing is see-through;
+      * 'colorkey': with a run-length encoded (RLEACCEL) colorkey,
+        if every pixel is either opaque or fully transparent;
+      * 'alpha': with per-pixel alpha, otherwise.
+
+    Args:
+        surface (pygame.Surface): 32-bit, with per-pixel alpha.
+        opaque_format (pygame.Surface|None): a surface in the pixel
+            format to store opaque and colorkeyed surfaces in, e.g.,
+            the display's; see render.ConversionPass. Defaults to
+            32-bit RGB.
+        alpha_format (pygame.Surface|None): likewise, for surfaces
+            with per-pixel alpha. Defaults to 32-bit RGBA.
+
+    Returns:
+        tuple: (pygame.Surface|None, (x, y) offset of it within
+            surface, format); the format is 'air', with no surface,
+            if surface is completely transparent.
+
+    Example:
+        >>> surface = pygame.Surface((20, 20), pygame.SRCALPHA, 32)
+        >>> surface.fill((255, 0, 0, 255), (5, 5, 10, 5))
+        <rect(5, 5, 10, 5)>
+        >>> compact, offset, chunk_format = compact_surface(surface)
+        >>> compact.get_size(), offset, chunk_format
+        ((10, 5), (5, 5), 'opaque')
+        >>> surface.fill((0, 255, 0, 255), (0, 0, 1, 1))
+        <rect(0, 0, 1, 1)>
+        >>> compact_surface(surface)[2]
+        'colorkey'
+
+    """
+
+    opaque_format = opaque_format or pygame.Surface((1, 1), 0, 32)
+    alpha_format = (alpha_format or
+                    pygame.Surface((1, 1), pygame.SRCALPHA, 32))
+
+    # (x, y) indexed
+    alpha = pygame.surfarray.array_alpha(surface)
+    columns = numpy.flatnonzero(alpha.any(axis=1))
+    rows = numpy.flatnonzero(alpha.any(axis=0))
+
+    if not len(columns):
+
+        return (None, (0, 0), 'air')
+
+    left, right = int(columns[0]), int(columns[-1]) + 1
+    top, bottom = int(rows[0]), int(rows[-1]) + 1
+    cropped = surface.subsurface((left, top, right - left, bottom - top))
+    alpha = alpha[left:right, top:bottom]
+    opaque = alpha == 255
+
+    if opaque.all():
+        compact = render.ConversionPass.copy_to_format(cropped,
+                                                       opaque_format)
+
+        return (compact, (left, top), 'opaque')
+
+    if (opaque | (alpha == 0)).all():
+        compact = pygame.Surface(cropped.get_size(), 0, opaque_format)
+
+        for colorkey in COLORKEYS:
+            compact.fill(colorkey)
+            compact.blit(cropped, (0, 0))
+
+            # compared in compact's format, in which different
+            # colors may be stored as the same pixel value
+            visible = pygame.surfarray.array2d(compact)[opaque]
+
+            if not (visible == compact.map_rgb(colorkey)).any():
+                compact.set_colorkey(colorkey, pygame.RLEACCEL)
+
+                return (compact, (left, top), 'colorkey')
+
+    compact = render.ConversionPass.copy_to_format(cropped, alpha_format)
+
+    return (compact, (left, top), 'alpha')
+
+
 def coord_to_index(width, x, y):
     """Return the 1D index which corresponds to 2D position (x, y).
 
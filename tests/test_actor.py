@@ -75,3 +75,23 @@ def test_actor():
     an_actor = actor.Actor(walkabout=walkabout,
                            say_text='Hello, world!',
                            velocity=velocity)
+
+
+def test_actor_move_by():
+    """Test actor.Actor.move_by(), which any actor uses to move
+    about a physics.CollisionWorld.
+
+    """
+
+    grid = physics.PassabilityGrid((10, 10), (10, 10))
+    grid[(5, 0)] = True
+    npc = actor.Actor(walkabout=sprites.Walkabout('debug', position=(0, 0)))
+    world = physics.CollisionWorld(grid, actors=[npc])
+
+    # blocked by the wall after moving 40 of the 100 pixels
+    assert npc.move_by(world, (100.0, 0)) == (40.0, 0)
+    assert npc.walkabout.topleft_float == (40.0, 0.0)
+    assert npc.walkabout.rect.topleft == (40, 0)
+
+    # the collision world was told about the move
+    assert world.actors.rect(npc).topleft == (40, 0)
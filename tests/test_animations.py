@@ -14,13 +14,236 @@ Example:
 """
 
 import os
+import copy
+import itertools
+import collections
 
 import pygame
 import pytest
 
 from hypatia import render
+from hypatia import sprites
+from hypatia import constants
+from hypatia import resources
+from hypatia import animatedsprite
 
 try:
     os.chdir('demo')
 except OSError:
     pass
+
+
+def test_animation_clip_sharing():
+    """Test that AnimatedSprites sharing an AnimationClip keep their
+    own playback state, and that updating more than once per tick
+    doesn't advance an animation more than once.
+
+    """
+
+    surfaces = [pygame.Surface((4, 4)), pygame.Surface((8, 8))]
+    clip = animatedsprite.AnimationClip.from_surface_duration_list(
+        [(surfaces[0], 100), (surfaces[1], 100)]
+    )
+    sprite = animatedsprite.AnimatedSprite(clip)
+    late_sprite = animatedsprite.AnimatedSprite(clip)
+    late_sprite.player.start_time = 100
+    assert sprite.clip is late_sprite.clip
+    assert sprite.largest_frame_size() == (8, 8)
+
+    animatedsprite.set_time(150)
+
+    for i in range(3):
+        sprite.update(None, (0, 0), None)
+
+    late_sprite.update(None, (0, 0), None)
+    assert sprite.image is surfaces[1]
+    assert sprite.animation_position == 150
+    assert late_sprite.image is surfaces[0]
+    assert late_sprite.active_frame_index == 0
+
+    # the animation loops
+    animatedsprite.set_time(250)
+    sprite.update(None, (0, 0), None)
+    assert sprite.image is surfaces[0]
+    animatedsprite.set_time(None)
+
+
+def test_playback_modes():
+    """Test the playback speed and modes of AnimationPlayer.
+
+    """
+
+    surface = pygame.Surface((4, 4))
+    clip = animatedsprite.AnimationClip.from_surface_duration_list(
+        [(surface, 100), (surface, 50), (surface, 100)]
+    )
+    player = animatedsprite.AnimationPlayer(clip)
+    times = (0, 99, 100, 149, 150, 249, 250, 399, 450)
+    assert [player.frame_index(t) for t in times] == [0, 0, 1, 1, 2, 2,
+                                                      0, 1, 2]
+
+    player.mode = constants.PlaybackMode.ping_pong
+    times = (0, 249, 250, 349, 350, 400, 499, 500)
+    assert [player.frame_index(t) for t in times] == [0, 2, 2, 2, 1, 0,
+                                                      0, 0]
+
+    player.mode = constants.PlaybackMode.one_shot
+    assert not player.finished(249)
+    assert player.finished(250)
+    assert player.frame_index(10000) == 2
+
+    player.speed = 0.5
+    player.start_time = 1000
+    assert player.frame_index(1000 + 200) == 1
+    assert player.frame_index(500) == 0
+
+    # updating looks frames up from the active one, which must find
+    # the same frames, whichever way the animation moves
+    sprite = animatedsprite.AnimatedSprite(
+        clip, speed=1.5, mode=constants.PlaybackMode.ping_pong)
+
+    for time in range(0, 1000, 17):
+        animatedsprite.set_time(time)
+        sprite.update(None, (0, 0), None)
+        assert sprite.active_frame_index == sprite.player.frame_index(time)
+
+    animatedsprite.set_time(None)
+
+
+def reference_palette_cycle(surface):
+    """The original, pixel-by-pixel sprites.palette_cycle(), which
+    the vectorized one must match.
+
+    """
+
+    width, height = surface.get_size()
+    coordinates = list(itertools.product(range(width), range(height)))
+    ordered_color_list = []
+
+    for coordinate in coordinates:
+        color = tuple(surface.get_at(coordinate))
+
+        if color not in ordered_color_list:
+            ordered_color_list.append(color)
+
+    old_color_list = collections.deque(ordered_color_list)
+    new_surface = surface.copy()
+    frames = []
+
+    for rotation_i in range(len(ordered_color_list)):
+        new_surface = new_surface.copy()
+        new_color_list = copy.copy(old_color_list)
+        new_color_list.rotate(1)
+        color_translations = dict(zip(old_color_list, new_color_list))
+
+        for coordinate in coordinates:
+            color = tuple(new_surface.get_at(coordinate))
+            new_surface.set_at(coordinate, color_translations[color])
+
+        frames.append(new_surface.copy())
+        old_color_list = copy.copy(new_color_list)
+
+    return frames
+
+
+def test_palette_cycle():
+    """Test that sprites.palette_cycle() makes the same frames as
+    the original pixel-by-pixel implementation.
+
+    """
+
+    surface = pygame.Surface((7, 5), pygame.SRCALPHA, 32)
+    colors = [(0, 0, 0, 0), (255, 0, 0, 255), (0, 255, 0, 128),
+              (0, 0, 255, 255), (255, 255, 255, 255)]
+
+    for x, y in itertools.product(range(7), range(5)):
+        surface.set_at((x, y), colors[(x * y + y) % len(colors)])
+
+    cycle = sprites.palette_cycle(surface)
+    expected = reference_palette_cycle(surface)
+    assert len(cycle.frames) == len(expected) == len(colors)
+
+    for frame, expected_surface in zip(cycle.frames, expected):
+        assert frame.duration == 250
+        assert (pygame.image.tostring(frame.surface, 'RGBA') ==
+                pygame.image.tostring(expected_surface, 'RGBA'))
+
+
+def test_walkabout_palette_variants():
+    """Test that palette variants of a Walkabout share 8-bit frames,
+    look like the original with the same colors, and recolor
+    with different ones.
+
+    """
+
+    original = sprites.Walkabout('slime')
+    same = sprites.Walkabout('slime', palette={})
+    black_to_red = sprites.Walkabout('slime',
+                                     palette={(0, 0, 0): '#ff0000'})
+    animation = same.current_animation()
+    red_animation = black_to_red.current_animation()
+
+    # the frames are shared; only the palettes differ
+    assert animation.clip is red_animation.clip
+    assert animation.frames[0].surface is red_animation.frames[0].surface
+    assert animation.frames[0].surface.get_bitsize() == 8
+    assert (0, 0, 0) in sprites.palette_colors(same.palette)
+    assert (0, 0, 0) not in sprites.palette_colors(black_to_red.palette)
+
+    # a variant is only its packed palette: 3 bytes per color
+    assert isinstance(black_to_red.palette, bytes)
+    assert (len(black_to_red.palette) == len(same.palette) ==
+            3 * len(sprites.palette_colors(same.palette)))
+
+    def render(walkabout):
+        viewport = pygame.Surface(walkabout.size, 0, 32)
+        viewport.fill((1, 2, 3))
+        walkabout.current_animation().update(None, (0, 0), None)
+        walkabout.update(None, viewport, (0, 0))
+
+        if walkabout.palette:
+            colors = sprites.palette_colors(walkabout.palette)
+            walkabout.image.set_palette(colors)
+
+        viewport.blit(walkabout.image, (0, 0))
+
+        return pygame.image.tostring(viewport, 'RGB')
+
+    animatedsprite.set_time(0)
+    assert render(same) == render(original)
+    assert render(black_to_red) != render(original)
+
+    # batched together, each variant still gets its own palette
+    width, height = same.size
+    viewport = pygame.Surface((width * 2, height), 0, 32)
+    viewport.fill((1, 2, 3))
+    draws = (same.draw_list(None, viewport, (0, 0)) +
+             black_to_red.draw_list(None, viewport, (-width, 0)))
+    sprites.blit_draw_list(viewport, draws)
+    assert (pygame.image.tostring(viewport.subsurface((0, 0), same.size),
+                                  'RGB') == render(original))
+    assert (pygame.image.tostring(viewport.subsurface((width, 0),
+                                                      same.size),
+                                  'RGB') == render(black_to_red))
+
+    # named variants are sections of the walkabout's palettes.ini
+    red = sprites.Walkabout('slime', palette='red')
+    assert red.current_animation().clip is animation.clip
+    assert red.palette == sprites.palette_variant(
+        sprites.palette_colors(same.palette), {'b8ff00': 'ff3020'})
+    assert render(red) != render(original)
+    animatedsprite.set_time(None)
+
+    for walkabout in (original, same, black_to_red, red):
+        walkabout.release()
+
+    # unknown names, or no palettes.ini at all, are a clear error
+    references = resources.assets.references('walkabouts', 'slime')
+
+    with pytest.raises(sprites.UnknownPalette):
+        sprites.Walkabout('slime', palette='plaid')
+
+    with pytest.raises(sprites.UnknownPalette):
+        sprites.Walkabout('debug', palette='red')
+
+    assert resources.assets.references('walkabouts', 'slime') == references
@@ -0,0 +1,55 @@
+# This module is part of Hypatia and is released under the
+# MIT license: http://opensource.org/licenses/MIT
+
+"""py.test unit testing for hypatia/bench.py
+
+Run py.test on this module to assert hypatia.bench
+is completely functional.
+
+"""
+
+import os
+import json
+
+import pygame
+
+from hypatia import game
+from hypatia import bench
+from hypatia import render
+
+try:
+    os.chdir('demo')
+except OSError:
+    pass
+
+
+def test_frame_benchmark():
+    """Test that bench.FrameBenchmark plays a scene on a headless
+    screen, reporting every phase as JSON serializable percentiles.
+
+    """
+
+    screen = render.Screen(headless=True, fps=0, screen_size=(320, 240))
+
+    try:
+        assert screen.headless
+        assert pygame.display.get_driver() == 'dummy'
+        assert screen.screen.get_size() == (320, 240)
+
+        scene = game.Scene.from_tmx_resource('debug')
+        start = scene.human_player.walkabout.topleft_float
+        benchmark = bench.FrameBenchmark(scene, (60, 60), screen)
+        report = json.loads(json.dumps(benchmark.run(10)))
+    finally:
+        pygame.display.quit()
+
+    assert report['frames'] == 10
+    assert report['screen'] == [320, 240]
+    assert sorted(report['phases']) == sorted(bench.PHASES)
+    assert report['chunks']['below band']['bytes_after'] > 0
+
+    for summary in list(report['phases'].values()) + [report['frame']]:
+        assert 0 <= summary['p50'] <= summary['p95'] <= summary['p99']
+
+    # the scripted input walked the player east
+    assert scene.human_player.walkabout.topleft_float[0] > start[0]
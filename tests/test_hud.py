@@ -0,0 +1,101 @@
+# This module is part of Hypatia and is released under the
+# MIT license: http://opensource.org/licenses/MIT
+
+"""py.test unit testing for hypatia/hud.py
+
+Run py.test on this module to assert hypatia.hud
+is completely functional.
+
+"""
+
+import os
+
+import pygame
+
+from hypatia import hud
+from hypatia import game
+from hypatia import render
+from hypatia import profiling
+
+try:
+    os.chdir('demo')
+except OSError:
+    pass
+
+
+def test_glyph_atlas():
+    """Test that text blitted from a hud.GlyphAtlas looks the same
+    as text rendered by the font.
+
+    """
+
+    pygame.font.init()
+    font = pygame.font.Font('resources/fonts/VeraMono.ttf', 5)
+    atlas = hud.GlyphAtlas(font)
+    text = 'blit 42'
+    rendered = font.render(text, False, (255, 255, 255), (0, 0, 0))
+    blitted = pygame.Surface(atlas.size(text))
+    atlas.blit(blitted, text, (0, 0))
+
+    assert blitted.get_size() == rendered.get_size()
+    assert (pygame.image.tostring(blitted, 'RGB') ==
+            pygame.image.tostring(rendered, 'RGB'))
+
+
+def test_performance_hud():
+    """Test that hud.PerformanceHUD shows what the profiler collected
+    about the last frame, and only profiles while it's shown.
+
+    """
+
+    scene = game.Scene.from_tmx_resource('debug')
+    viewport = render.Viewport((60, 60))
+    profiler = profiling.FrameProfiler()
+    overlay = hud.PerformanceHUD(viewport.rect.size, profiler=profiler)
+    assert overlay.render_state() == (None, None)
+
+    overlay.toggle()
+    assert profiler.enabled
+
+    # the scene reports to the process-wide profiler
+    profiling.profiler, original = profiler, profiling.profiler
+
+    try:
+        profiler.begin_frame()
+        scene.render(viewport, pygame.time.Clock())
+        profiler.end_frame()
+    finally:
+        profiling.profiler = original
+
+    header, body = overlay.lines(scene)
+    assert header[0].endswith('ms')
+    # the only NPC is off screen
+    assert body[1] == 'npc 0/%d' % len(scene.npcs)
+    assert body[0] == 'blit %d' % profiler.last_frame['counters']['blits']
+
+    state, rect = overlay.render_state()
+    assert rect.topleft == (0, 0) and rect.width == 60
+
+    viewport.surface.fill((1, 2, 3))
+    overlay.blit(viewport.surface, scene)
+    assert viewport.surface.get_at((59, rect.bottom - 1)) != (1, 2, 3)
+    assert viewport.surface.get_at((59, rect.bottom)) == (1, 2, 3)
+
+    # the sparkline scrolls a column per frame, only drawing new ones
+    def column(x):
+
+        return [tuple(overlay.sparkline.get_at((x, y)))
+                for y in range(overlay.SPARKLINE_HEIGHT)]
+
+    newest = column(59)
+    assert newest[-1][:3] in (overlay.GOOD, overlay.BAD)
+    assert column(58)[-1][:3] == overlay.BACKGROUND
+    profiler.begin_frame()
+    profiler.end_frame()
+    overlay.blit(viewport.surface, scene)
+    assert column(58) == newest
+    assert column(59)[-1][:3] in (overlay.GOOD, overlay.BAD)
+
+    overlay.toggle()
+    assert not profiler.enabled
+    assert overlay.render_state() == (None, None)
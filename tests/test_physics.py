@@ -13,7 +13,9 @@ import os
 import pygame
 import pytest
 
+from hypatia import actor
 from hypatia import physics
+from hypatia import sprites
 from hypatia import constants
 
 try:
@@ -39,3 +41,82 @@ def test_velocity():
     velocity = physics.Velocity(-22, 55)
     assert (constants.Direction.from_velocity(velocity) ==
             constants.Direction.south_west)
+
+
+def test_passability_grid():
+    """Test physics.PassabilityGrid, the static tile bitmap.
+
+    """
+
+    grid = physics.PassabilityGrid((4, 3), (10, 10))
+    grid[(2, 1)] = True
+    assert grid[(2, 1)] and not grid[(1, 1)]
+
+    # outside of the grid is always impassable
+    assert grid[(-1, 0)] and grid[(4, 0)] and grid[(0, 3)]
+
+    # rects only collide with the tiles they overlap
+    assert not grid.collides(pygame.Rect(0, 0, 20, 30))
+    assert grid.collides(pygame.Rect(19, 10, 2, 2))
+    assert not grid.collides(pygame.Rect(30, 20, 10, 10))
+    assert grid.collides(pygame.Rect(35, 20, 10, 10))
+
+    assert grid.impassable_rects() == [pygame.Rect(20, 10, 10, 10)]
+
+
+def test_collision_world():
+    """Test physics.CollisionWorld, and its spatial hash of actors.
+
+    """
+
+    grid = physics.PassabilityGrid((20, 20), (10, 10))
+    slime = actor.Actor(walkabout=sprites.Walkabout('debug',
+                                                    position=(50, 50)))
+    world = physics.CollisionWorld(grid, actors=[slime], cell_size=16)
+
+    slime_rect = slime.walkabout.rect.copy()
+    assert world.collides(slime_rect)
+    assert not world.collides(slime_rect, ignore=slime)
+    assert not world.collides(pygame.Rect(100, 100, 10, 10))
+
+    # the world only knows about the move once it's told
+    slime.walkabout.rect.topleft = (100, 100)
+    assert world.collides(slime_rect)
+    world.update_actor(slime)
+    assert not world.collides(slime_rect)
+    assert world.collides(pygame.Rect(100, 100, 10, 10))
+    assert world.actors.query(pygame.Rect(0, 0, 200, 200)) == set([slime])
+
+    world.remove_actor(slime)
+    assert not world.collides(pygame.Rect(100, 100, 10, 10))
+    assert len(world.actors) == 0
+
+
+def test_collision_world_sweep():
+    """Test physics.CollisionWorld.sweep(), the swept box resolver.
+
+    """
+
+    #    0 1 2 3 4
+    # 0| . . . . .
+    # 1| . @ . # .
+    # 2| . . . . .
+    grid = physics.PassabilityGrid((5, 3), (10, 10))
+    grid[(3, 1)] = True
+    world = physics.CollisionWorld(grid)
+
+    # stop flush against the wall, or the edge of the map
+    assert world.sweep((10.0, 10.0), (10, 10), (25.0, 0)) == (10.0, 0)
+    assert world.sweep((10.0, 10.0), (10, 10), (-25.0, 0)) == (-10.0, 0)
+    assert world.sweep((10.0, 10.0), (10, 10), (0, 3.5)) == (0, 3.5)
+
+    # moving diagonally into the wall slides along it
+    assert world.sweep((15.0, 10.0), (10, 10), (10.0, 4.0)) == (5.0, 4.0)
+
+    # actors are in the way, too, unless ignored
+    slime = actor.Actor(walkabout=sprites.Walkabout('debug',
+                                                    position=(10, 20)))
+    world.add_actor(slime)
+    assert world.sweep((10.0, 0.0), (10, 10), (0, 20.0)) == (0, 10.0)
+    assert (world.sweep((10.0, 0.0), (10, 10), (0, 20.0), ignore=slime) ==
+            (0, 20.0))
@@ -0,0 +1,106 @@
+# This module is part of Hypatia and is released under the
+# MIT license: http://opensource.org/licenses/MIT
+
+"""py.test unit testing for hypatia/profiling.py
+
+Run py.test on this module to assert hypatia.profiling
+is completely functional.
+
+"""
+
+import os
+import time
+
+import pygame
+
+from hypatia import game
+from hypatia import render
+from hypatia import profiling
+
+try:
+    os.chdir('demo')
+except OSError:
+    pass
+
+
+def test_slow_frames():
+    """Test that profiling.FrameProfiler flags frames over budget,
+    blaming the span which took the longest itself, and keeps
+    rolling histories.
+
+    """
+
+    profiler = profiling.FrameProfiler(budget_milliseconds=5, history=3)
+
+    # disabled, nothing is collected
+    profiler.begin_frame()
+
+    with profiler.span('render'):
+        profiler.count('blits')
+
+    profiler.end_frame()
+    assert profiler.frames == 0
+    assert profiler.last_frame is None
+
+    profiler.enabled = True
+
+    for frame in range(4):
+        profiler.begin_frame()
+
+        with profiler.span('render'):
+
+            with profiler.span('layers'):
+                time.sleep(0.01 if frame == 2 else 0)
+
+            with profiler.span('actors'):
+                profiler.count('blits', 3)
+
+        profiler.end_frame()
+
+    assert profiler.frames == 4
+    assert len(profiler.spans['render']) == 3
+    assert list(profiler.counters['blits']) == [3, 3, 3]
+
+    slow_frames = list(profiler.slow_frames)
+    assert [slow.frame for slow in slow_frames] == [2]
+    assert slow_frames[0].span == 'layers'
+    assert slow_frames[0].milliseconds >= 10
+
+    # the span within it isn't counted twice
+    assert slow_frames[0].span_milliseconds >= 10
+
+    histogram = dict(profiler.histogram('layers'))
+    assert sum(histogram.values()) == 3
+    assert histogram[16.7] == 1
+
+    summary = profiler.summary()
+    assert summary['slow_frames'] == 1
+    assert summary['counters'] == {'blits': 3.0}
+    assert summary['spans']['layers']['max'] >= 10
+
+
+def test_scene_render_counters():
+    """Test that rendering a scene reports its spans, blits and
+    pixels to the process-wide profiler.
+
+    """
+
+    scene = game.Scene.from_tmx_resource('debug')
+    viewport = render.Viewport((60, 60))
+    profiler = profiling.profiler
+    profiler.enabled = True
+
+    try:
+        profiler.begin_frame()
+        scene.render(viewport, pygame.time.Clock())
+        profiler.end_frame()
+    finally:
+        profiler.enabled = False
+        frame = profiler.last_frame
+        profiler.reset()
+
+    assert set(frame['spans']) == set(['animation', 'layers', 'actors'])
+
+    # at least a full layer, and every actor
+    assert frame['counters']['pixels'] >= 60 * 60
+    assert frame['counters']['blits'] >= len(scene.npcs) + 1
@@ -21,9 +21,247 @@ import os
 import pygame
 import pytest
 
+from hypatia import tiles
+from hypatia import game
 from hypatia import render
+from hypatia import sprites
+from hypatia import scenegen
+from hypatia import animatedsprite
 
 try:
     os.chdir('demo')
 except OSError:
     pass
+
+
+def test_conversion_pass():
+    """Test that render.ConversionPass replaces the tilesheet, tiles,
+    and animated tile frames with converted surfaces, even without
+    a display, and that shared surfaces are converted once.
+
+    """
+
+    tilemap = tiles.TileMap('debug', [[[0, 1], [2, 3]]])
+    tilesheet = tilemap.tilesheet
+    conversion = render.ConversionPass()
+    tilemap.runtime_setup(conversion)
+    alpha_format = conversion.alpha_format
+
+    for tile in tilesheet.tiles:
+        assert tile.subsurface.get_parent() is tilesheet.surface
+
+    for animated_tile in tilesheet.animated_tiles.values():
+
+        for frame in animated_tile.frames:
+            assert (render.ConversionPass.same_format(frame.surface,
+                                                      alpha_format) or
+                    frame.surface.get_bitsize() == 8)
+
+        assert animated_tile.image is animated_tile.active_frame.surface
+
+    converted = conversion.converted
+    tilemap.runtime_setup(conversion)
+    assert conversion.converted == converted
+    assert 'saved' in conversion.report()
+
+
+def test_dirty_rects():
+    """Test that redrawing only the dirty areas of a scene looks the
+    same as redrawing all of it, and that nothing is redrawn when
+    nothing changes.
+
+    """
+
+    scene = game.Scene.from_tmx_resource('debug')
+    viewport = render.Viewport((60, 60))
+    full_viewport = render.Viewport((60, 60))
+    dirty = render.DirtyRects(viewport.rect.size)
+    walkabout = scene.human_player.walkabout
+    clock = pygame.time.Clock()
+
+    def redraw_dirty():
+        scene.track_changes(viewport, clock, dirty)
+        regions = dirty.regions()
+
+        for region in regions:
+            viewport.surface.set_clip(region)
+            scene.render_area(viewport, region)
+
+        viewport.surface.set_clip(None)
+
+        return regions
+
+    def redraw_full():
+        full_viewport.surface.fill((0, 0, 0))
+        scene.render(full_viewport, clock)
+
+        return pygame.image.tostring(full_viewport.surface, 'RGB')
+
+    everything = [pygame.Rect((0, 0), viewport.rect.size)]
+    animatedsprite.set_time(0)
+    assert redraw_dirty() == everything
+
+    # the camera moves, so everything is redrawn
+    walkabout.topleft_float = (150.0, 150.0)
+    walkabout.rect.topleft = (150, 150)
+    assert redraw_dirty() == everything
+    assert redraw_dirty() == []
+
+    # a small move inside the map's interior only redraws the actor
+    scene.tilemap.rect.size = (10000, 10000)
+    viewport.rect.topleft = full_viewport.rect.topleft = (0, 0)
+    walkabout.topleft_float = (10.0, 10.0)
+    walkabout.rect.topleft = (10, 10)
+    redraw_dirty()
+    walkabout.topleft_float = (12.0, 10.0)
+    walkabout.rect.topleft = (12, 10)
+    regions = redraw_dirty()
+    assert len(regions) == 1
+    assert regions[0].width < viewport.rect.width
+    assert pygame.image.tostring(viewport.surface, 'RGB') == redraw_full()
+
+    animatedsprite.set_time(None)
+
+
+def test_screen_letterbox():
+    """Test that render.Screen scales the viewport by a whole number
+    into the same letterboxed area of the screen every frame, and
+    that viewport filters run before scaling.
+
+    """
+
+    # a headless Screen the size of a 4K monitor
+    screen = render.Screen(headless=True, fps=0, screen_size=(3840, 2160))
+    screen.layout((320, 240))
+
+    assert screen.scale == 9
+    assert screen.destination.get_abs_offset() == (480, 0)
+    assert screen.destination.get_size() == (2880, 2160)
+
+    # the destination is reused until the viewport size changes
+    destination = screen.destination
+    screen.layout((320, 240))
+    assert screen.destination is destination
+    screen.layout((640, 480))
+    assert screen.destination is not destination
+    assert screen.scale == 4
+
+    # viewport filters work on the viewport, before it's scaled
+    sizes = []
+
+    def remember_size(surface):
+        sizes.append(surface.get_size())
+
+        return surface
+
+    screen.viewport_filters = [remember_size]
+    viewport = pygame.Surface((320, 240))
+    viewport.fill((255, 0, 0))
+    screen.update(viewport)
+    animatedsprite.set_time(None)
+
+    assert sizes == [(320, 240)]
+    assert screen.screen.get_at((479, 0)) == (0, 0, 0, 255)
+    assert screen.screen.get_at((480, 0)) == (255, 0, 0, 255)
+    assert screen.screen.get_at((3359, 2159)) == (255, 0, 0, 255)
+    assert screen.screen.get_at((3360, 2159)) == (0, 0, 0, 255)
+
+
+def test_interpolation():
+    """Test that game.Scene draws actors between their last two
+    simulated positions, without changing the simulation, and that
+    game.Timestep runs fixed steps, dropping time when too far behind.
+
+    """
+
+    scene = game.Scene.from_tmx_resource('debug')
+    walkabout = scene.human_player.walkabout
+    walkabout.topleft_float = (0.0, 0.0)
+    scene.remember_positions()
+    walkabout.topleft_float = (10.0, 4.0)
+    rect = walkabout.rect
+
+    scene.interpolate(0.5)
+    assert walkabout.topleft_float == (5.0, 2.0)
+    assert walkabout.rect.topleft == (5, 2)
+    scene.restore_positions()
+    assert walkabout.topleft_float == (10.0, 4.0)
+    assert walkabout.rect is rect
+
+    timestep = game.Timestep(10, max_steps=4)
+    assert timestep.advance(5) == 0
+    assert timestep.alpha == 0.5
+    assert timestep.advance(5) == 1
+    assert timestep.alpha == 0.0
+    assert timestep.advance(1000) == 4
+    assert timestep.alpha == 0.0
+    assert timestep.dropped_milliseconds == 960.0
+
+
+def test_culling():
+    """Test that only the actors and animated tiles which are on
+    screen are drawn, and that the frame looks the same as if
+    everything had been drawn.
+
+    """
+
+    scene = scenegen.generate(64, 64, animated_density=0.05,
+                              npc_count=50, seed=1).to_scene()
+    tilemap = scene.tilemap
+    viewport = render.Viewport((80, 60))
+    everything = render.Viewport((80, 60))
+    clock = pygame.time.Clock()
+    animatedsprite.set_time(0)
+    scene.render(viewport, clock)
+    everything.rect.topleft = viewport.rect.topleft
+    view = viewport.rect
+
+    # every NPC which is on screen, in order, then the human player
+    walkabouts = scene.visible_walkabouts(viewport)
+    on_screen = [npc.walkabout for npc in scene.npcs
+                 if npc.walkabout.rect.colliderect(view)]
+    assert [walkabout for walkabout in walkabouts[:-1]
+            if walkabout.rect.colliderect(view)] == on_screen
+    assert walkabouts[-1] is scene.human_player.walkabout
+    assert len(walkabouts) < len(scene.npcs)
+
+    animated_tiles = tilemap.visible_animated_tiles(viewport, 0)
+    tile_size = tilemap.tilesheet.tile_size
+    assert set(animated_tiles) == set(
+        animated_tile for animated_tile in tilemap.animated_tile_stack[0]
+        if view.colliderect(pygame.Rect(animated_tile[1], tile_size))
+    )
+    assert 0 < len(animated_tiles) < len(tilemap.animated_tile_stack[0])
+
+    # draw everything, without culling
+    surface = everything.surface
+    tilemap.blit_layer(everything, 0)
+
+    for tile_anim, position in tilemap.animated_tile_stack[0]:
+        surface.blit(tile_anim.image, everything.relative_position(position))
+
+    for npc in scene.npcs + [scene.human_player]:
+        sprites.blit_draw_list(surface, npc.walkabout.draw_list(
+            clock, surface, everything.rect.topleft))
+
+    tilemap.blit_layer(everything, 1)
+    assert (pygame.image.tostring(viewport.surface, 'RGB') ==
+            pygame.image.tostring(surface, 'RGB'))
+
+    # an NPC which leaves the screen while the camera stays put is
+    # no longer tracked, and where it was gets redrawn
+    dirty = render.DirtyRects(view.size)
+    scene.track_changes(viewport, clock, dirty)
+    dirty.regions()
+    npc_walkabout = on_screen[0]
+    rect = npc_walkabout.rect.move(-view.left, -view.top)
+    npc = [n for n in scene.npcs if n.walkabout is npc_walkabout][0]
+    npc_walkabout.topleft_float = (-1000.0, -1000.0)
+    npc_walkabout.rect.topleft = (-1000, -1000)
+    scene.collision_world.update_actor(npc)
+    scene.track_changes(viewport, clock, dirty)
+    assert npc_walkabout not in scene.tracked_walkabouts
+    assert dirty.regions()[0].contains(rect.clip(dirty.viewport_rect))
+    assert rect.clip(dirty.viewport_rect)
+
+    animatedsprite.set_time(None)
@@ -9,6 +9,8 @@ is completely functional.
 """
 
 import os
+import shutil
+import zipfile
 
 try:
     import ConfigParser as configparser
@@ -18,6 +20,7 @@ except ImportError:
 import pygame
 import pytest
 
+from hypatia import sprites
 from hypatia import resources
 from hypatia import animatedsprite
 
@@ -45,3 +48,122 @@ def test_resource():
 
     # Assure INI files are loading as ConfigParser objects
     assert isinstance(resource['only.ini'], configparser.ConfigParser)
+
+
+def test_resource_lazy_decoding():
+    """Test that resources.Resource only decodes files as they're
+    accessed, and only once.
+
+    """
+
+    resource = resources.Resource('walkabouts', 'debug')
+    assert resource.decoded_files == {}
+    assert resource.extensions['.gif'] == ['only.gif']
+
+    # only the requested file is decoded, and it is memoized
+    config = resource['only.ini']
+    assert list(resource.decoded_files) == ['only.ini']
+    assert resource['only.ini'] is config
+
+    # get_type() decodes only the files of the requested type
+    gifs = resource.get_type('.gif')
+    assert sorted(resource.decoded_files) == ['only.gif', 'only.ini']
+    assert gifs['only.gif'] is resource['only.gif']
+    assert resource.get_type('.png') is None
+
+
+def test_resource_directory_lazy_reading():
+    """Test that the files of an unpacked resource directory are
+    only read from disk once they're accessed.
+
+    """
+
+    path = os.path.join('resources', 'walkabouts', 'test-unpacked')
+    zip_path = os.path.join('resources', 'walkabouts', 'debug.zip')
+
+    with zipfile.ZipFile(zip_path) as zip_file:
+        zip_file.extractall(path)
+
+    try:
+        resource = resources.Resource('walkabouts', 'test-unpacked')
+        assert resource.is_directory
+        assert sorted(resource.raw_files) == ['only.gif', 'only.ini']
+        assert 'only.gif' in resource
+        assert resource.raw_files.loaded == {}
+        assert resources.asset_bytes(resource) == 0
+        assert resource.file_path('only.gif') == os.path.join(path,
+                                                              'only.gif')
+        assert resource.raw_files.loaded == {}
+
+        assert isinstance(resource['only.ini'], configparser.ConfigParser)
+        assert list(resource.raw_files.loaded) == ['only.ini']
+
+        # the GIF's handler reads its anchor INI through raw_files
+        assert resource['only.gif'].frames
+        assert sorted(resource.raw_files.loaded) == ['only.gif', 'only.ini']
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def test_asset_cache():
+    """Test resources.AssetCache reference counting, least
+    recently used eviction, and statistics.
+
+    """
+
+    cache = resources.AssetCache(budget=10)
+    loads = []
+
+    def loader(value):
+        loads.append(value)
+
+        return value
+
+    first = cache.acquire('misc', 'first', lambda: loader(b'12345'))
+    assert cache.acquire('misc', 'first', lambda: loader(b'')) is first
+    assert cache.references('misc', 'first') == 2
+    assert loads == [b'12345']
+
+    # referenced assets are never evicted, no matter the budget
+    cache.acquire('misc', 'second', lambda: loader(b'123456789'))
+    assert len(cache) == 2
+    assert cache.bytes_used == 14
+
+    # once unreferenced, the least recently used go first
+    cache.release('misc', 'first')
+    cache.release('misc', 'first')
+    assert ('misc', 'first') in cache
+    cache.release('misc', 'second')
+    assert ('misc', 'first') not in cache
+    assert ('misc', 'second') in cache
+
+    with pytest.raises(KeyError):
+        cache.release('misc', 'second')
+
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'evictions': 1,
+                             'bytes_used': 9, 'entries': 1}
+
+
+def test_load_resource():
+    """Test that Walkabouts share their resource (and its decoded
+    frames) through the process-wide asset cache, but not their
+    animation state.
+
+    """
+
+    resources.assets.clear()
+    walkabout = sprites.Walkabout('debug')
+    another = sprites.Walkabout('debug')
+    assert resources.assets.stats()['misses'] == 1
+    assert resources.assets.stats()['hits'] == 1
+    assert walkabout.resource is another.resource
+    assert resources.assets.references('walkabouts', 'debug') == 2
+
+    animation = walkabout.current_animation()
+    another_animation = another.current_animation()
+    assert animation is not another_animation
+    assert animation.frames[0].surface is another_animation.frames[0].surface
+
+    walkabout.release()
+    another.release()
+    assert resources.assets.references('walkabouts', 'debug') == 0
@@ -0,0 +1,89 @@
+# This module is part of Hypatia and is released under the
+# MIT license: http://opensource.org/licenses/MIT
+
+"""py.test unit testing for hypatia/scenegen.py
+
+Run py.test on this module to assert hypatia.scenegen
+is completely functional.
+
+"""
+
+import os
+import shutil
+
+import numpy
+import pytest
+
+from hypatia import game
+from hypatia import scenegen
+from hypatia import resources
+
+try:
+    os.chdir('demo')
+except OSError:
+    pass
+
+
+def test_generate():
+    """Test that scenegen.generate() is repeatable, honors its
+    densities, and keeps the player's and NPCs' cells passable.
+
+    """
+
+    scene = scenegen.generate(40, 30, layers=3, animated_density=0.05,
+                              impassable_density=0.2, npc_count=50)
+    again = scenegen.generate(40, 30, layers=3, animated_density=0.05,
+                              impassable_density=0.2, npc_count=50)
+    assert numpy.array_equal(scene.tile_ids, again.tile_ids)
+    assert scene.npcs == again.npcs
+
+    # the ground is complete, obstacles are only on layer 1
+    assert (scene.tile_ids[0] != -1).all()
+    obstacles = (scene.tile_ids[1] != -1).mean()
+    assert 0.1 < obstacles < 0.3
+
+    occupied = [scene.player_start_position]
+    occupied.extend(position for __, position in scene.npcs)
+    assert len(set(occupied)) == 51
+
+    for x, y in occupied:
+        assert scene.tile_ids[1, y // 10, x // 10] == -1
+
+    with pytest.raises(scenegen.NotEnoughRoom):
+        scenegen.generate(2, 2, npc_count=4)
+
+
+def test_generated_scene_loads():
+    """Test that generated TMX files and native scene resources
+    load as the same scene.
+
+    """
+
+    name = 'test-scenegen'
+    path = os.path.join('resources', 'scenes', name)
+    scene = scenegen.generate(20, 20, npc_count=3, walkabouts=('debug',
+                                                               'slime'))
+
+    try:
+        scene.write_resource(path)
+        native = game.Scene.from_resource(name)
+
+        # tilemap.bin is memory-mapped, not copied into the resource
+        resource = resources.load_resource('scenes', name)
+        assert 'tilemap.bin' in resource
+        assert 'tilemap.bin' not in resource.raw_files.loaded
+        resources.release_resource('scenes', name)
+
+        scene.write_tmx(path + '.tmx')
+        tmx = game.Scene.from_tmx_resource(name)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+        if os.path.exists(path + '.tmx'):
+            os.remove(path + '.tmx')
+
+    for loaded in (native, tmx):
+        assert numpy.array_equal(loaded.tilemap.tile_ids, scene.tile_ids)
+        assert loaded.player_start_position == scene.player_start_position
+        assert ([npc.walkabout.rect.topleft for npc in loaded.npcs] ==
+                [position for __, position in scene.npcs])
@@ -20,10 +20,12 @@ import os
 import zipfile
 from io import BytesIO
 
+import numpy
 import pygame
 import pytest
 
 from hypatia import tiles
+from hypatia import render
 from hypatia import resources
 
 try:
@@ -144,8 +146,10 @@ def test_tilemap():
     map_string = resource['tilemap.txt'].strip()
     tilemap = tiles.TileMap.from_string(map_string)
 
-    # there are 208 impassable rects in the debug tilemap
-    assert len(tilemap.impassable_rects) == 208
+    # there are 207 impassable tiles in the debug tilemap; one
+    # of them is impassable on two layers, which is only counted
+    # once by the passability grid.
+    assert len(tilemap.impassable_rects) == 207
 
     # make sure from string/to string works reproducibly
     assert map_string == tilemap.to_string()
@@ -154,3 +158,323 @@ def test_tilemap():
     assert tilemap[(2, 4)] is tilemap.tilesheet[11]
     assert tilemap.get_info((2 * 10, 4 * 10)) is tilemap.tilesheet[11]
     assert tilemap.get_info((2 * 10, 4 * 10)) is tilemap[(2, 4)]
+
+
+def test_tilemap_chunks():
+    """Test that TileMap only stitches the layer chunks
+    which a viewport can see, within the chunk budget.
+
+    """
+
+    chunk_width_tiles, chunk_height_tiles = tiles.TileMap.CHUNK_SIZE
+
+    # a map four chunks wide and three chunks high
+    width = chunk_width_tiles * 4
+    height = chunk_height_tiles * 3
+    layer = [[12 for x in range(width)] for y in range(height)]
+    tilemap = tiles.TileMap('debug', [layer])
+    assert tilemap.dimensions_in_chunks == (4, 3)
+    assert tilemap.rect.size == (width * 10, height * 10)
+
+    # a viewport which straddles the first two chunks of the top row
+    viewport = render.Viewport((chunk_width_tiles * 10,
+                                chunk_height_tiles * 5))
+    viewport.rect.topleft = (chunk_width_tiles * 5, 0)
+    tilemap.blit_layer(viewport, 0)
+    assert len(tilemap.chunks) == 2
+    assert (0, 0, 0) in tilemap.chunks and (0, 1, 0) in tilemap.chunks
+
+    # the stitched chunk looks exactly like the tiles it contains;
+    # it's opaque, so it's stored without alpha
+    chunk = tilemap.chunk(0, 1, 0)
+    tile_surface = tilemap.tilesheet[12].subsurface
+    assert not chunk.get_flags() & pygame.SRCALPHA
+    assert (pygame.image.tostring(chunk.subsurface((0, 0, 10, 10)), 'RGB')
+            == pygame.image.tostring(tile_surface, 'RGB'))
+
+    # a budget of one chunk keeps only the most recently used chunk
+    chunk_bytes = tiles.surface_bytes(chunk)
+    tilemap = tiles.TileMap('debug', [layer], chunk_budget=chunk_bytes)
+    tilemap.blit_layer(viewport, 0)
+    assert len(tilemap.chunks) == 1
+    assert tilemap.chunks.bytes_used == chunk_bytes
+
+
+def test_tilemap_from_array():
+    """Test building a TileMap from a (depth, height, width)
+    numpy array of tile IDs.
+
+    """
+
+    tile_ids = numpy.full((2, 3, 4), -1, dtype=numpy.int32)
+    tile_ids[0] = 12
+    tile_ids[1, 1, 2] = 99  # impassable
+    tile_ids[1, 2, 3] = 29  # animated water
+    tilemap = tiles.TileMap('debug', tile_ids)
+
+    assert tilemap.dimensions_in_tiles == (4, 3, 2)
+    assert tilemap.passability[(2, 1)]
+    assert not tilemap.passability[(1, 1)]
+    assert len(tilemap.impassable_rects) == 1
+
+    # air on the top layer has no animations
+    assert len(tilemap.animated_tile_stack[0]) == 0
+    assert ([position for __, position in tilemap.animated_tile_stack[1]] ==
+            [(30, 20)])
+
+    # flags of upper layers don't leak onto the shared tiles
+    assert tilemap.flags_at((2, 1)) == set(['impass_all'])
+    assert tilemap[(2, 1)] is tilemap.tilesheet[12]
+    assert tilemap.tilesheet[12].flags == set()
+
+    with pytest.raises(tiles.BadTileID):
+        tile_ids[0, 0, 0] = 999
+        tiles.TileMap('debug', tile_ids)
+
+
+def test_tilemap_flags():
+    """Test the per-cell flag bitmask grids of TileMap, and the
+    interned flag bits of Tilesheet.
+
+    """
+
+    tile_ids = numpy.full((2, 4, 4), 12, dtype=numpy.int32)
+    tile_ids[1] = -1
+    tile_ids[1, 0, 3] = 99  # impassable on the upper layer
+    tile_ids[0, 3, 0] = 0  # impassable on the bottom layer
+    tilemap = tiles.TileMap('debug', tile_ids)
+    tilesheet = tilemap.tilesheet
+    impass_all = tilesheet.flag_bits['impass_all']
+
+    assert tilemap.layer_flags.shape == (2, 4, 4)
+    assert tilemap.layer_flags.dtype == numpy.uint32
+    assert tilemap.flags.shape == (4, 4)
+    assert tilemap.flags[0, 3] == impass_all
+    assert tilemap.layer_flags[0, 0, 3] == 0
+
+    mask = tilemap.mask('impass_all')
+    assert mask.sum() == 2 and mask[0, 3] and mask[3, 0]
+    assert tilemap.mask('impass_all', layer=1).sum() == 1
+    assert not tilemap.mask('no_such_flag').any()
+
+    # a region is a view of the merged flags, clipped to the map
+    region = tilemap.flags_in_region(pygame.Rect(25, -5, 100, 10))
+    assert region.shape == (1, 2)
+    assert region.base is not None
+    assert region.tolist() == [[0, impass_all]]
+
+    # rects entirely off the map, on each side, overlap nothing
+    for rect in [pygame.Rect(0, -40, 10, 5), pygame.Rect(-40, 0, 5, 10),
+                 pygame.Rect(0, 45, 10, 5), pygame.Rect(45, 0, 5, 10),
+                 pygame.Rect(-40, -40, 5, 5)]:
+        assert tilemap.flags_in_region(rect).shape == (0, 0)
+        assert tilemap.flags_in_region(rect, layer=1).shape == (0, 0)
+
+    # the grids are read-only, and so are the shared tiles' flags
+    with pytest.raises(ValueError):
+        tilemap.flags[0, 0] = impass_all
+
+    assert tilesheet[12].flags == frozenset()
+    assert tilemap.flags_at((3, 0)) == set(['impass_all'])
+
+
+def test_tilemap_binary(tmpdir):
+    """Test the binary tilemap format, both plain (and memory-mapped
+    from a file) and zlib compressed.
+
+    """
+
+    resource = resources.Resource('scenes', 'debug')
+    map_string = resource['tilemap.txt'].strip()
+    tilemap = tiles.TileMap.from_string(map_string)
+
+    for compress in (False, True):
+        data = tilemap.to_binary(compress=compress, chunk_rows=7)
+        from_binary = tiles.TileMap.from_binary(data)
+        assert from_binary.tilesheet.name == 'debug'
+        assert (from_binary.tile_ids == tilemap.tile_ids).all()
+        assert from_binary.to_string() == map_string
+
+    # uncompressed tile IDs are used from the buffer, not copied
+    binary_path = tmpdir.join('tilemap.bin')
+    binary_path.write_binary(tilemap.to_binary())
+    mapped = tiles.TileMap.from_binary_file(str(binary_path))
+    assert not mapped.tile_ids.flags.owndata
+    assert (mapped.tile_ids == tilemap.tile_ids).all()
+    assert len(mapped.impassable_rects) == len(tilemap.impassable_rects)
+
+    with pytest.raises(tiles.BadTileMapBinary):
+        tiles.TileMap.from_binary(b'not a tilemap at all, no sir')
+
+
+def test_tilemap_bands():
+    """Test that drawing the two bands of flattened layers, and the
+    animated tiles between them, looks the same as drawing every
+    layer on its own, with at most two blits covering the viewport.
+
+    """
+
+    from hypatia import profiling
+    from hypatia import animatedsprite
+
+    tilesheet = tiles.Tilesheet.from_resources('debug')
+    animated_ids = sorted(tilesheet.animated_tiles)
+    random = numpy.random.RandomState(0)
+    tile_ids = random.randint(-1, len(tilesheet.tiles), (6, 20, 24))
+    tile_ids[tile_ids % 3 == 0] = -1
+    tile_ids[random.random_sample(tile_ids.shape) < 0.05] = animated_ids[0]
+    tilemap = tiles.TileMap('debug', tile_ids)
+    assert tilemap.bands == ((0,), (1, 2, 3, 4, 5))
+    assert tilemap.animated_columns
+
+    # a moment when the animated tiles don't look like their tiles
+    animatedsprite.set_time(800)
+    viewport = render.Viewport((160, 120))
+    viewport.rect.topleft = (35, 45)
+    tilemap.tilesheet.animated_tiles_group.update(None, viewport.surface,
+                                                  viewport.rect.topleft)
+    layer_by_layer = render.Viewport((160, 120))
+    layer_by_layer.rect.topleft = viewport.rect.topleft
+
+    for layer in range(6):
+        tilemap.blit_layer(layer_by_layer, layer)
+        tilemap.blit_layer_animated_tiles(layer_by_layer, layer)
+
+    tilemap.blit_band(viewport, tiles.TileMap.BELOW)
+    tilemap.blit_band(viewport, tiles.TileMap.ABOVE)
+    assert (pygame.image.tostring(viewport.surface, 'RGBA') ==
+            pygame.image.tostring(layer_by_layer.surface, 'RGBA'))
+
+    # without animated tiles, a viewport the size of a chunk is
+    # covered by one chunk of each band
+    tile_ids[numpy.isin(tile_ids, animated_ids)] = 12
+    tilemap = tiles.TileMap('debug', tile_ids[:, :16, :16])
+    viewport = render.Viewport((160, 160))
+    profiler = profiling.profiler
+    profiler.enabled = True
+
+    try:
+        profiler.begin_frame()
+        tilemap.blit_band(viewport, tiles.TileMap.BELOW)
+        tilemap.blit_band(viewport, tiles.TileMap.ABOVE)
+        profiler.end_frame()
+    finally:
+        profiler.enabled = False
+        frame = profiler.last_frame
+        profiler.reset()
+
+    assert frame['counters']['blits'] == 2
+    animatedsprite.set_time(None)
+
+
+def test_chunk_formats():
+    """Test that stitched chunks are stored in the cheapest format
+    which blits the same pixels, and that the savings are reported
+    per layer.
+
+    """
+
+    tile_ids = numpy.full((3, 16, 16), -1, dtype=numpy.int32)
+    tile_ids[0] = 12
+    tile_ids[1, 2:4, 5:9] = 12
+    tile_ids[2, 0, 0] = 18  # partly transparent
+    tile_ids[2, 15, 15] = 18
+    tilemap = tiles.TileMap('debug', tile_ids)
+
+    # translucent pixels need per-pixel alpha
+    translucent = pygame.Surface((160, 160), pygame.SRCALPHA, 32)
+    translucent.fill((255, 0, 0, 128), (3, 4, 5, 6))
+    surfaces = [tilemap.stitch_chunk(layer, 0, 0) for layer in range(3)]
+
+    for surface in surfaces + [translucent]:
+        compact, offset, chunk_format = tiles.compact_surface(surface)
+        expected = pygame.Surface(surface.get_size(), 0, 32)
+        expected.fill((1, 2, 3))
+        expected.blit(surface, (0, 0))
+        blitted = pygame.Surface(surface.get_size(), 0, 32)
+        blitted.fill((1, 2, 3))
+        blitted.blit(compact, offset)
+        assert (pygame.image.tostring(blitted, 'RGB') ==
+                pygame.image.tostring(expected, 'RGB'))
+
+    assert chunk_format == 'alpha' and offset == (3, 4)
+
+    # the ground is opaque; the sparse layer is cropped to its tiles
+    viewport = render.Viewport((160, 160))
+
+    for layer in range(3):
+        tilemap.blit_layer(viewport, layer)
+
+    assert tilemap.chunk(0, 0, 0).get_size() == (160, 160)
+    assert tilemap.chunk(1, 0, 0).get_size() == (40, 20)
+    assert tilemap.chunks.offsets[(1, 0, 0)] == (50, 20)
+
+    stats = tilemap.chunk_formats.layers
+    assert stats['layer 0']['opaque'] == 1
+    assert stats['layer 1']['cropped'] == 1
+    assert stats['layer 1']['bytes_after'] < stats['layer 1']['bytes_before']
+    assert stats['layer 2']['colorkey'] == 1
+    assert tilemap.chunk(2, 0, 0).get_flags() & pygame.RLEACCEL
+    assert 'layer 1: ' in tilemap.chunk_formats.report()
+
+    # blits are only timed when measuring
+    assert stats['layer 1']['blit_seconds_before'] == 0
+    assert 'blitting' not in tilemap.chunk_formats.report()
+    tilemap.chunk_formats.measure = True
+    tilemap.chunks.clear()
+    tilemap.blit_layer(viewport, 1)
+    assert stats['layer 1']['blit_seconds_before'] > 0
+    assert 'blitting' in tilemap.chunk_formats.report()
+
+    # chunks are compacted into the formats they're told, e.g., a
+    # 16-bit display's
+    opaque_format = pygame.Surface((1, 1), 0, 16)
+    tilemap.chunk_formats.use_formats(
+        opaque_format, pygame.Surface((1, 1), pygame.SRCALPHA, 32))
+    tilemap.chunks.clear()
+
+    for layer in range(3):
+        tilemap.blit_layer(viewport, layer)
+
+    for layer in range(3):
+        assert render.ConversionPass.same_format(tilemap.chunk(layer, 0, 0),
+                                                 opaque_format)
+
+    assert tilemap.chunk(2, 0, 0).get_colorkey() is not None
+
+    # chunks with no tiles are never stitched, which saves the most
+    tile_ids[1] = -1
+    tilemap = tiles.TileMap('debug', tile_ids)
+    assert tilemap.chunk(1, 0, 0) is None
+    stats = tilemap.chunk_formats.layers
+    assert stats['layer 1']['air'] == 1
+    assert stats['layer 1']['bytes_before'] == 160 * 160 * 4
+    assert stats['layer 1']['bytes_after'] == 0
+
+
+def test_chunk_offsets_evicted():
+    """Test that the offsets of cropped chunks are forgotten
+    along with the chunks, when they're evicted or cleared.
+
+    """
+
+    surface = pygame.Surface((8, 8), 0, 32)
+    cache = tiles.ChunkCache(tiles.surface_bytes(surface) * 2)
+    cache.put((0, 0, 0), surface, (1, 2))
+    cache.put((0, 1, 0), surface, (3, 4))
+    cache.put((0, 2, 0), surface)
+    assert cache.offsets == {(0, 1, 0): (3, 4)}
+
+    cache.put((0, 1, 0), surface)
+    assert cache.offsets == {}
+
+    cache.put((0, 3, 0), surface, (5, 6))
+    cache.clear()
+    assert cache.offsets == {}
+
+    # a budget of nothing keeps only the chunk just stitched
+    cache = tiles.ChunkCache(0)
+    assert cache.budget == 0
+    cache.put((0, 0, 0), surface)
+    cache.put((0, 1, 0), surface)
+    assert (0, 0, 0) not in cache and (0, 1, 0) in cache